@@ -0,0 +1,672 @@
+"""
+Geração de código Assembly AVR (ATmega328P) para as expressões RPN, usada por
+RPNCalculator.generate_arduino_assembly e pelo subcomando compile de main.py.
+"""
+
+from rpn_calculator import (
+    OP_PUSH, OP_ADD, OP_SUB, OP_MUL, OP_REAL_DIV, OP_INT_DIV, OP_MOD, OP_POW, OP_RES,
+    OP_MEM_STORE, OP_MEM_LOAD, OP_RAISE, OP_GROUP, OP_GROUP_END, OP_TEMP_STORE, OP_TEMP_LOAD,
+    _MISSING, ErrorValue, RPNCalculator, encode_half,
+)
+
+
+# Pares de registradores (byte baixo no registrador par) que guardam os
+# valores intermediários no código AVR gerado
+AVR_REGISTER_PAIRS = (16, 18, 20, 26, 28, 30)
+
+# Rotinas de apoio (meia precisão e inteiros de 16 bits) do código AVR gerado
+AVR_RUNTIME_FILENAME = 'avr_runtime.asm'
+
+# Rotinas AVR de cada operador, para operandos reais e inteiros
+AVR_FLOAT_ROUTINES = {OP_ADD: 'h_add', OP_SUB: 'h_sub', OP_MUL: 'h_mul', OP_REAL_DIV: 'h_div'}
+AVR_INT_ROUTINES = {OP_MUL: 'i_mul', OP_INT_DIV: 'i_div', OP_MOD: 'i_mod'}
+
+# SRAM do ATmega328P e espaço reservado para a pilha (rotinas de apoio e
+# valores intermediários que não couberam nos registradores)
+AVR_SRAM_SIZE = 2048
+AVR_STACK_RESERVE = 128
+
+# Rotinas que podem falhar (ligam a flag T)
+AVR_FALLIBLE_ROUTINES = frozenset(('h_div', 'i_div', 'i_mod', 'h_to_int', 'h_exp_check', 'i_exp_check'))
+
+
+class AVRCodeGenerator:
+    """
+    Gera código Assembly AVR (ATmega328P) para as expressões de um arquivo.
+    
+    Cada linha é compilada para o programa pós-fixo de compile_tokens,
+    otimizado pelo ExpressionOptimizer (constantes, identidades e
+    sub-expressões comuns, guardadas no buffer temps), e traduzida em uma
+    única passada, sobre uma pilha virtual de operandos:
+    - operações cujos operandos são constantes são calculadas em tempo de
+      compilação, pela própria calculadora (mesmo resultado da avaliação);
+    - os valores intermediários ficam nos pares de registradores de
+      AVR_REGISTER_PAIRS e só vão para a pilha do hardware quando todos os
+      pares estão ocupados;
+    - operações em meia precisão, multiplicação, divisão e potência de
+      inteiros chamam as rotinas de avr_runtime.asm; soma e subtração de
+      inteiros são feitas em linha.
+    
+    Os tipos são estáticos: resultados de / e % (e operações só entre eles)
+    são inteiros de 16 bits com sinal; os demais valores, meia precisão. Cada
+    resultado ocupa 2 bytes no buffer results; quando a avaliação falha o
+    resultado é 0 e o byte correspondente do buffer errors vale 1. Um (N RES)
+    que lê um resultado com erro também falha, como na RPNCalculator.
+    """
+    
+    def __init__(self, calculator, fold_constants=True):
+        """
+        Parâmetros:
+            calculator: RPNCalculator usada para compilar as expressões
+            fold_constants: Se verdadeiro, operações entre constantes são
+                            calculadas em tempo de compilação e o programa
+                            passa pelo ExpressionOptimizer
+        """
+        self.calculator = calculator
+        self.fold_constants = fold_constants
+        # Calculadora auxiliar para as operações entre constantes; sem o cache
+        # de sub-expressões, o otimizador também elimina as sub-expressões comuns
+        self.folder = RPNCalculator(program_cache_size=0, cache_size=0)
+        # Tipo ('int' ou 'float') de cada resultado
+        self.result_types = []
+        # Valor de cada resultado conhecido em tempo de compilação (ou None)
+        self.constants = []
+        # Se cada resultado pode ser um erro: 'never', 'maybe' ou 'always'
+        self.result_errors = []
+        # Valor conhecido da memória (ou _MISSING)
+        self.memory = 0.0
+        # Rotinas de apoio usadas pelo código gerado
+        self.routines = set()
+        # Quantidade de instruções do código principal
+        self.instruction_count = 0
+        # Maior quantidade de valores em temps usada por uma expressão
+        self.temp_count = 0
+        # Código principal das linhas já compiladas por add_line
+        self.code = []
+    
+    def add_line(self, line_no, line, program=None):
+        """
+        Compila uma expressão para o código principal. Permite gerar o Assembly
+        durante a avaliação do arquivo (ver RPNCalculator.stream_file), com as
+        linhas já lidas, em vez de ler o arquivo de novo.
+        
+        Parâmetros:
+            line_no: Número da linha no arquivo
+            line: Expressão, sem espaços nas pontas (linhas vazias são ignoradas)
+            program: Programa da linha já compilado por self.calculator na
+                     avaliação (de calculator.programs); se None, a linha é
+                     compilada aqui
+        """
+        if not line:
+            return
+        folder = self.folder
+        if program is not None and self.fold_constants:
+            # O otimizador remove os marcadores do cache de sub-expressões e
+            # chega ao mesmo programa, otimizado ou não pela calculadora
+            program = folder.optimizer.optimize(program, keep_groups=False, cse=True)
+        elif program is not None and line not in self.calculator.optimized:
+            program = tuple(instruction for instruction in program
+                            if instruction[0] != OP_GROUP and instruction[0] != OP_GROUP_END)
+        else:
+            program = folder.compile_tokens(folder.tokenize_expression(line), optimize=self.fold_constants)
+        body = self.compile_line(program, line_no)
+        kind = 'inteiro' if self.result_types[-1] == 'int' else 'meia precisão'
+        code = self.code
+        code.append(f"    ; Expressão da linha {line_no}: {line} (resultado {len(self.result_types) - 1}, {kind})")
+        code.append(f"expression_{line_no}:")
+        code.extend(body)
+    
+    def generate(self, lines=()):
+        """
+        Gera o programa Assembly completo para as linhas de expressões, depois
+        das já recebidas por add_line.
+        
+        Parâmetros:
+            lines: Iterável com as linhas de expressões RPN
+            
+        Retorna:
+            Lista com as linhas do código Assembly
+        """
+        for line_no, line in enumerate(lines, 1):
+            self.add_line(line_no, line.strip())
+        code = self.code
+        
+        runtime = self.runtime_code()
+        self.instruction_count = sum(1 for line in code if avr_words(line))
+        if sum(map(avr_words, code)) + sum(map(avr_words, runtime)) > 2000:
+            # Programa grande demais para o alcance de rcall (2K palavras)
+            code = [line.replace('    rcall ', '    call ', 1) for line in code]
+        count = max(len(self.result_types), 1)
+        
+        assembly_code = [
+            "; Código Assembly gerado para Arduino UNO",
+            "; Este código implementa as expressões RPN do arquivo de entrada",
+            ";",
+            "; Cada resultado ocupa 2 bytes em results: meia precisão (IEEE 754 binary16)",
+            "; ou inteiro de 16 bits com sinal, conforme indicado em cada expressão.",
+            "; errors[i] = 1 indica que a expressão i falhou (o resultado fica 0).",
+            f"; Código principal: {self.instruction_count} instruções",
+            "",
+            ".include \"m328pdef.inc\"",
+            "",
+            "; Memória para comando (MEM), resultados e marcadores de erro",
+            "    .dseg",
+            "memory: .byte 2    ; 2 bytes para half-precision float",
+            f"results: .byte {2 * count}    ; 2 bytes por resultado",
+            f"errors: .byte {count}    ; 1 byte por resultado",
+        ]
+        if self.temp_count:
+            assembly_code.append(f"temps: .byte {2 * self.temp_count}    ; sub-expressões comuns da expressão atual")
+        assembly_code += [
+            "    .cseg",
+            "",
+            "; Inicialização",
+            "setup:",
+            "    ldi r24, low(RAMEND)    ; Pilha no fim da SRAM",
+            "    out SPL, r24",
+            "    ldi r24, high(RAMEND)",
+            "    out SPH, r24",
+            "    clt                     ; Flag T: erro na expressão atual",
+            "    clr r24                 ; Memória começa em 0.0",
+            "    sts memory, r24",
+            "    sts memory+1, r24",
+            "    ldi r26, low(errors)    ; Zera os marcadores de erro",
+            "    ldi r27, high(errors)",
+            f"    ldi r24, low({count})",
+            f"    ldi r25, high({count})",
+            "    clr r23",
+            "clear_errors:",
+            "    st X+, r23",
+            "    sbiw r24, 1",
+            "    brne clear_errors",
+            "",
+            "main:",
+            "    ; Código principal",
+        ]
+        assembly_code.extend(code)
+        assembly_code.append("")
+        assembly_code.append("end:")
+        assembly_code.append("    rjmp end    ; Loop infinito")
+        if runtime:
+            assembly_code.append("")
+            assembly_code.extend(runtime)
+        return assembly_code
+    
+    def compile_line(self, program, line_no):
+        """
+        Traduz o programa de uma linha para instruções AVR.
+        
+        Parâmetros:
+            program: Programa compilado por compile_tokens
+            line_no: Número da linha no arquivo (usado nos rótulos)
+            
+        Retorna:
+            Lista com as linhas de Assembly da expressão
+        """
+        index = len(self.result_types)
+        self.output = []
+        self.stack = []
+        self.free = list(reversed(AVR_REGISTER_PAIRS))
+        # Operando cujo valor ainda está em r24:r25 (resultado da última rotina)
+        self.acc = None
+        self.fallible = False
+        self.spilled = False
+        # Entradas (constantes) ou tipos (valores em temps) das sub-expressões comuns
+        temps = {}
+        store_after_fallible = False
+        failed = False
+        
+        for code, arg in program:
+            if code == OP_PUSH:
+                self.stack.append(['const', arg, isinstance(arg, int)])
+            elif code <= OP_POW:
+                b = self.stack.pop()
+                a = self.stack.pop()
+                if not self.binary(code, a, b):
+                    failed = True
+                    break
+            elif code == OP_RES:
+                # Posição do resultado referenciado (índices negativos contam do início)
+                slot = index - arg - 1 if arg >= 0 else -arg - 1
+                if not 0 <= slot < index or self.result_errors[slot] == 'always':
+                    # Resultado inexistente ou que sempre falha: o erro se propaga
+                    failed = True
+                    break
+                if self.constants[slot] is not None:
+                    self.stack.append(['const', self.constants[slot], self.result_types[slot] == 'int'])
+                else:
+                    pair = self.allocate()
+                    self.emit(f"lds r{pair}, results+{2 * slot}")
+                    self.emit(f"lds r{pair + 1}, results+{2 * slot + 1}")
+                    if self.result_errors[slot] == 'maybe':
+                        # Propaga o erro do resultado lido: errors[slot] vai para a flag T
+                        self.emit(f"lds r23, errors+{slot}")
+                        self.emit("bst r23, 0")
+                        self.output.append(None)
+                        self.fallible = True
+                    self.stack.append(['reg', pair, self.result_types[slot] == 'int'])
+            elif code == OP_MEM_STORE:
+                self.flush()
+                self.load_constant(24, arg)
+                self.emit("sts memory, r24")
+                self.emit("sts memory+1, r25")
+                self.memory = arg
+                store_after_fallible = store_after_fallible or self.fallible
+                self.stack.append(['const', arg, False])
+            elif code == OP_MEM_LOAD:
+                if self.memory is not _MISSING:
+                    self.stack.append(['const', self.memory, False])
+                else:
+                    pair = self.allocate()
+                    self.emit(f"lds r{pair}, memory")
+                    self.emit(f"lds r{pair + 1}, memory+1")
+                    self.stack.append(['reg', pair, False])
+            elif code == OP_TEMP_STORE:
+                entry = self.stack[-1]
+                if entry[0] == 'const':
+                    temps[arg] = list(entry)
+                else:
+                    # O valor fica em um par de registradores e é copiado para temps
+                    pair = self.materialize(entry)
+                    entry[0] = 'reg'
+                    entry[1] = pair
+                    self.emit(f"sts temps+{2 * arg}, r{pair}")
+                    self.emit(f"sts temps+{2 * arg + 1}, r{pair + 1}")
+                    temps[arg] = entry[2]
+                    self.temp_count = max(self.temp_count, arg + 1)
+            elif code == OP_TEMP_LOAD:
+                value = temps[arg]
+                if value.__class__ is list:
+                    self.stack.append(list(value))
+                else:
+                    pair = self.allocate()
+                    self.emit(f"lds r{pair}, temps+{2 * arg}")
+                    self.emit(f"lds r{pair + 1}, temps+{2 * arg + 1}")
+                    self.stack.append(['reg', pair, value])
+            elif code == OP_GROUP or code == OP_GROUP_END:
+                # Marcadores do cache de sub-expressões não geram código
+                continue
+            else:
+                # OP_RAISE: erro detectado na compilação
+                failed = True
+                break
+        
+        if store_after_fallible:
+            # Uma falha pode impedir a gravação: o valor passa a ser desconhecido
+            self.memory = _MISSING
+        
+        if failed:
+            self.result_types.append('float')
+            self.constants.append(None)
+            self.result_errors.append('always')
+        else:
+            kind, value, is_int = self.stack.pop()
+            self.result_types.append('int' if is_int else 'float')
+            self.constants.append(value if kind == 'const' and not self.fallible else None)
+            self.result_errors.append('maybe' if self.fallible else 'never')
+            if kind == 'const':
+                self.load_constant(24, value)
+                pair = 24
+            elif kind == 'acc':
+                pair = 24
+            elif kind == 'reg':
+                pair = value
+            else:
+                self.emit("pop r25")
+                self.emit("pop r24")
+                pair = 24
+            self.emit(f"sts results+{2 * index}, r{pair}")
+            self.emit(f"sts results+{2 * index + 1}, r{pair + 1}")
+            if not self.fallible:
+                return self.output
+            self.emit(f"rjmp expression_{line_no}_end")
+        
+        body = self.link_error_branches(line_no)
+        body.append(f"expression_{line_no}_error:")
+        body.append("    clt")
+        if self.spilled:
+            # Descarta os valores guardados na pilha
+            body.append("    ldi r24, low(RAMEND)")
+            body.append("    out SPL, r24")
+            body.append("    ldi r24, high(RAMEND)")
+            body.append("    out SPH, r24")
+        body.append("    clr r24")
+        body.append(f"    sts results+{2 * index}, r24")
+        body.append(f"    sts results+{2 * index + 1}, r24")
+        body.append("    ldi r24, 1")
+        body.append(f"    sts errors+{index}, r24")
+        if not failed:
+            body.append(f"expression_{line_no}_end:")
+        return body
+    
+    def link_error_branches(self, line_no):
+        """
+        Resolve os desvios para o tratamento de erro da linha. brts alcança
+        apenas 63 palavras; desvios mais distantes usam brtc + rjmp.
+        
+        Retorna:
+            Lista com as linhas de Assembly da expressão, sem o bloco de erro
+        """
+        output = self.output
+        branches = [i for i, line in enumerate(output) if line is None]
+        long_branches = set()
+        while True:
+            offsets = []
+            position = 0
+            for i, line in enumerate(output):
+                offsets.append(position)
+                if line is None:
+                    position += 2 if i in long_branches else 1
+                else:
+                    # rcall pode virar call (2 palavras) em programas grandes
+                    position += 2 if line.startswith('    rcall ') else avr_words(line)
+            changed = False
+            for i in branches:
+                if i not in long_branches and position - offsets[i] - 1 > 63:
+                    long_branches.add(i)
+                    changed = True
+            if not changed:
+                break
+        
+        body = []
+        for i, line in enumerate(output):
+            if line is not None:
+                body.append(line)
+            elif i in long_branches:
+                body.append(f"    brtc expression_{line_no}_ok_{i}")
+                body.append(f"    rjmp expression_{line_no}_error")
+                body.append(f"expression_{line_no}_ok_{i}:")
+            else:
+                body.append(f"    brts expression_{line_no}_error")
+        return body
+    
+    def emit(self, instruction):
+        """Acrescenta uma instrução ao código da linha atual."""
+        self.output.append("    " + instruction)
+    
+    def call(self, routine):
+        """
+        Chama uma rotina de apoio; após rotinas que podem falhar, desvia para
+        o tratamento de erro se a flag T estiver ligada.
+        """
+        self.routines.add(routine)
+        self.emit(f"rcall {routine}")
+        if routine in AVR_FALLIBLE_ROUTINES:
+            # Desvio resolvido em link_error_branches
+            self.output.append(None)
+            self.fallible = True
+    
+    def allocate(self):
+        """
+        Reserva um par de registradores. Sem pares livres, o valor mais
+        profundo da pilha virtual que está em registradores vai para a pilha
+        do hardware (os valores voltam na ordem inversa, quando consumidos).
+        
+        Retorna:
+            Número do registrador baixo do par
+        """
+        if self.free:
+            return self.free.pop()
+        for entry in self.stack:
+            if entry[0] == 'reg':
+                pair = entry[1]
+                self.emit(f"push r{pair}")
+                self.emit(f"push r{pair + 1}")
+                entry[0] = 'stack'
+                entry[1] = None
+                self.spilled = True
+                return pair
+        raise ValueError("Erro: Não há registradores livres.")
+    
+    def push_result(self, result_int):
+        """Empilha o resultado de uma rotina, que fica em r24:r25 até ser usado."""
+        self.acc = ['acc', None, result_int]
+        self.stack.append(self.acc)
+    
+    def flush(self):
+        """Move para um par de registradores o valor que ainda está em r24:r25."""
+        entry = self.acc
+        if entry is not None:
+            self.acc = None
+            pair = self.allocate()
+            self.emit(f"movw r{pair}, r24")
+            entry[0] = 'reg'
+            entry[1] = pair
+    
+    def materialize(self, entry):
+        """
+        Garante que um operando esteja em um par de registradores, que passa
+        a pertencer ao chamador.
+        
+        Retorna:
+            Número do registrador baixo do par
+        """
+        if entry[0] == 'acc':
+            self.flush()
+        if entry[0] == 'reg':
+            return entry[1]
+        pair = self.allocate()
+        if entry[0] == 'const':
+            # Só acontece sem o cálculo de constantes em tempo de compilação
+            self.load_constant(pair, entry[1])
+            return pair
+        self.emit(f"pop r{pair + 1}")
+        self.emit(f"pop r{pair}")
+        return pair
+    
+    def load_constant(self, register, value):
+        """Carrega uma constante (inteiro de 16 bits ou meia precisão) em um par de registradores."""
+        bits = value & 0xFFFF if isinstance(value, int) else encode_half(value)
+        self.emit(f"ldi r{register}, 0x{bits & 0xFF:02X}    ; {value}")
+        self.emit(f"ldi r{register + 1}, 0x{bits >> 8:02X}")
+    
+    def load(self, entry, register, conversion=None):
+        """
+        Carrega um operando em r24:r25 ou r22:r23, convertendo-o se preciso.
+        
+        Parâmetros:
+            entry: Operando da pilha virtual
+            register: 24 ou 22
+            conversion: 'float' (inteiro para meia precisão), 'int' (meia
+                        precisão para inteiro) ou None
+            
+        Retorna:
+            False se a conversão de uma constante falhar
+        """
+        kind, value, is_int = entry
+        convert = (conversion == 'float' and is_int) or (conversion == 'int' and not is_int)
+        if kind == 'acc':
+            # O valor já está em r24:r25
+            self.acc = None
+            if convert:
+                self.call('h_from_int' if conversion == 'float' else 'h_to_int')
+            if register != 24:
+                self.emit(f"movw r{register}, r24")
+            return True
+        if register == 24 or convert:
+            self.flush()
+        if kind == 'const':
+            if convert:
+                try:
+                    if conversion == 'float':
+                        value = self.folder.to_half_precision(float(value))
+                    else:
+                        value = int(value)
+                except (ValueError, OverflowError):
+                    return False
+            self.load_constant(register, value)
+            return True
+        
+        target = 24 if convert else register
+        if kind == 'reg':
+            self.emit(f"movw r{target}, r{value}")
+            self.free.append(value)
+        else:
+            self.emit(f"pop r{target + 1}")
+            self.emit(f"pop r{target}")
+        if convert:
+            self.call('h_from_int' if conversion == 'float' else 'h_to_int')
+            if register != 24:
+                self.emit(f"movw r{register}, r24")
+        return True
+    
+    def binary(self, code, a, b):
+        """
+        Gera o código de um operador binário e empilha o resultado.
+        
+        Retorna:
+            False se a operação certamente falha (erro conhecido na compilação)
+        """
+        if self.fold_constants and a[0] == 'const' and b[0] == 'const':
+            try:
+                value = self.folder.execute_program(((OP_PUSH, a[1]), (OP_PUSH, b[1]), (code, None)))
+            except Exception:
+                return False
+            if value.__class__ is ErrorValue:
+                return False
+            self.stack.append(['const', value, isinstance(value, int)])
+            return True
+        if code == OP_POW:
+            return self.power(a, b)
+        if code == OP_INT_DIV or code == OP_MOD:
+            return self.routine_call(AVR_INT_ROUTINES[code], a, b, 'int', True)
+        if a[2] and b[2] and code != OP_REAL_DIV:
+            if code == OP_MUL:
+                return self.routine_call('i_mul', a, b, None, True)
+            self.integer_add_sub(code, a, b)
+            return True
+        return self.routine_call(AVR_FLOAT_ROUTINES[code], a, b, 'float', False)
+    
+    def routine_call(self, routine, a, b, conversion, result_int):
+        """
+        Chama a rotina de um operador com A em r24:r25 e B em r22:r23.
+        
+        Retorna:
+            False se a conversão de um operando constante falhar
+        """
+        if not self.load(b, 22, conversion) or not self.load(a, 24, conversion):
+            return False
+        self.call(routine)
+        self.push_result(result_int)
+        return True
+    
+    def integer_add_sub(self, code, a, b):
+        """Soma ou subtração de inteiros de 16 bits, em linha."""
+        if a[0] == 'const' and code == OP_ADD:
+            # Soma é comutativa: a constante fica como segundo operando
+            a, b = b, a
+        if b[0] == 'const':
+            pair = self.materialize(a)
+            bits = (b[1] if code == OP_SUB else -b[1]) & 0xFFFF
+            if bits:
+                self.emit(f"subi r{pair}, 0x{bits & 0xFF:02X}")
+                self.emit(f"sbci r{pair + 1}, 0x{bits >> 8:02X}")
+        elif a[0] == 'const':
+            pair = self.materialize(b)
+            self.flush()
+            self.load_constant(24, a[1])
+            self.emit(f"sub r24, r{pair}")
+            self.emit(f"sbc r25, r{pair + 1}")
+            self.emit(f"movw r{pair}, r24")
+        else:
+            other = self.materialize(b)
+            pair = self.materialize(a)
+            if code == OP_ADD:
+                self.emit(f"add r{pair}, r{other}")
+                self.emit(f"adc r{pair + 1}, r{other + 1}")
+            else:
+                self.emit(f"sub r{pair}, r{other}")
+                self.emit(f"sbc r{pair + 1}, r{other + 1}")
+            self.free.append(other)
+        self.stack.append(['reg', pair, True])
+    
+    def power(self, a, b):
+        """
+        Potência: o expoente precisa ser um inteiro não negativo (verificado
+        em compilação para constantes e por h_exp_check/i_exp_check nos demais
+        casos) e é passado como inteiro sem sinal de 16 bits em r22:r23.
+        
+        Retorna:
+            False se a operação certamente falha
+        """
+        if b[0] == 'const':
+            n = b[1]
+            try:
+                if not float(n).is_integer() or n < 0:
+                    return False
+            except OverflowError:
+                return False
+            n = int(n)
+            if n > 0xFFFF:
+                # Só a paridade importa: a magnitude já leva a 0, 1 ou infinito
+                n = 0xFFFE | (n & 1)
+            self.load_constant(22, n)
+        else:
+            self.load(b, 24)
+            self.call('i_exp_check' if b[2] else 'h_exp_check')
+            self.emit("movw r22, r24")
+        if a[2] and b[2]:
+            self.load(a, 24)
+            self.call('i_pow')
+            result_int = True
+        else:
+            if not self.load(a, 24, 'float'):
+                return False
+            self.call('h_pow')
+            result_int = False
+        self.push_result(result_int)
+        return True
+    
+    def runtime_code(self):
+        """
+        Lê avr_runtime.asm e seleciona as rotinas usadas, com as rotinas de que
+        elas dependem, na ordem do arquivo.
+        
+        Retorna:
+            Lista com as linhas de Assembly das rotinas
+        """
+        if not self.routines:
+            return []
+        import os
+        path = os.path.join(os.path.dirname(os.path.abspath(__file__)), AVR_RUNTIME_FILENAME)
+        blocks = []
+        dependencies = {}
+        with open(path, 'r') as file:
+            for line in file:
+                line = line.rstrip('\n')
+                if line.startswith('; @rotina '):
+                    name, _, uses = line[len('; @rotina '):].partition(':')
+                    blocks.append((name.strip(), []))
+                    dependencies[name.strip()] = uses.split()
+                if blocks:
+                    blocks[-1][1].append(line)
+        
+        # Rotinas usadas e suas dependências, transitivamente
+        needed = set()
+        pending = list(self.routines)
+        while pending:
+            name = pending.pop()
+            if name not in needed:
+                needed.add(name)
+                pending.extend(dependencies[name])
+        
+        runtime = ["; Rotinas de apoio (avr_runtime.asm)"]
+        for name, lines in blocks:
+            if name in needed:
+                runtime.extend(lines)
+        return runtime
+
+
+def avr_words(line):
+    """
+    Tamanho, em palavras de 16 bits, de uma linha de Assembly AVR.
+    
+    Retorna:
+        0 para rótulos, comentários e linhas vazias; 2 para lds, sts, call e
+        jmp; 1 para as demais instruções
+    """
+    instruction = line.split(';', 1)[0].strip()
+    if not instruction or instruction.endswith(':') or instruction.startswith('.'):
+        return 0
+    mnemonic = instruction.split(None, 1)[0].lower()
+    return 2 if mnemonic in ('lds', 'sts', 'call', 'jmp') else 1
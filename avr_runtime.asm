@@ -0,0 +1,1172 @@
+; Rotinas de apoio para o código Assembly gerado pela calculadora RPN
+; Aritmética em meia precisão (IEEE754 binary16) e inteiros de 16 bits para AVR
+;
+; Convenção de chamada:
+;   - Primeiro operando (A) em r24:r25 e segundo operando (B) em r22:r23
+;     (byte menos significativo no registrador par)
+;   - Resultado em r24:r25
+;   - Todos os outros registradores são preservados, exceto r0 e r1
+;   - Em caso de erro (divisão por zero, expoente inválido, conversão de
+;     infinito/NaN para inteiro) a flag T é ligada; ela nunca é desligada aqui
+;
+; Cada rotina começa com um comentário "@rotina nome: dependências", usado pelo
+; gerador de código para incluir apenas as rotinas necessárias.
+
+; @rotina h_class:
+; Classifica um valor em meia precisão: r16 = 0 (zero), 1 (finito),
+; 2 (infinito) ou 3 (NaN). h_class_a lê r24:r25 e h_class_b lê r22:r23.
+h_class_a:
+    mov r16, r25
+    andi r16, 0x7C
+    cpi r16, 0x7C
+    breq h_class_a_special
+    mov r16, r25
+    andi r16, 0x7F
+    or r16, r24
+    breq h_class_done       ; r16 = 0: zero
+    ldi r16, 1
+    ret
+h_class_a_special:
+    mov r16, r25
+    andi r16, 0x03
+    or r16, r24
+    ldi r16, 2              ; ldi não altera as flags
+    breq h_class_done
+    ldi r16, 3
+    ret
+h_class_b:
+    mov r16, r23
+    andi r16, 0x7C
+    cpi r16, 0x7C
+    breq h_class_b_special
+    mov r16, r23
+    andi r16, 0x7F
+    or r16, r22
+    breq h_class_done
+    ldi r16, 1
+    ret
+h_class_b_special:
+    mov r16, r23
+    andi r16, 0x03
+    or r16, r22
+    ldi r16, 2
+    breq h_class_done
+    ldi r16, 3
+h_class_done:
+    ret
+
+; @rotina h_unpack:
+; Decompõe o valor finito em r24:r25 em mantissa inteira r18:r19 (11 bits,
+; com o bit implícito) e expoente r26:r27 (com sinal): valor = M * 2^E.
+; Usa r16.
+h_unpack:
+    mov r18, r24
+    mov r19, r25
+    andi r19, 0x03
+    mov r16, r25
+    lsr r16
+    lsr r16
+    andi r16, 0x1F
+    brne h_unpack_normal
+    ldi r26, low(-24)       ; subnormal ou zero: E = -24
+    ldi r27, high(-24)
+    ret
+h_unpack_normal:
+    ori r19, 0x04           ; bit implícito
+    mov r26, r16
+    clr r27
+    sbiw r26, 25            ; E = expoente - 25
+    ret
+
+; @rotina h_pack:
+; Arredonda M * 2^E para meia precisão (para o mais próximo, empates para o
+; par), tratando subnormais e overflow para infinito.
+; Entrada: M em r18:r19:r20:r21 (diferente de zero), E em r26:r27 (com sinal),
+; sinal no bit 7 de r17, bits descartados diferentes de zero em r16 (sticky).
+; Saída em r24:r25. Altera r16, r18-r21, r26, r27.
+h_pack:
+    sbrc r21, 7
+    rjmp h_pack_normalized
+    lsl r18
+    rol r19
+    rol r20
+    rol r21
+    sbiw r26, 1
+    rjmp h_pack
+h_pack_normalized:
+    adiw r26, 46            ; expoente com viés (bit 31 de M = bit implícito)
+    clr r24
+    cpi r26, 31
+    cpc r27, r24
+    brge h_pack_inf
+    cpi r26, 1
+    cpc r27, r24
+    brge h_pack_round
+h_pack_subnormal:
+    ; Desloca a mantissa até o expoente mínimo, acumulando os bits perdidos
+    lsr r21
+    ror r20
+    ror r19
+    ror r18
+    brcc h_pack_subnormal_next
+    ori r16, 1
+h_pack_subnormal_next:
+    mov r25, r18
+    or r25, r19
+    or r25, r20
+    or r25, r21
+    breq h_pack_zero        ; mantissa esgotada: o valor arredonda para zero
+    adiw r26, 1
+    cpi r26, 1
+    cpc r27, r24
+    brlt h_pack_subnormal
+h_pack_round:
+    ; sticky |= bits 19..0 de M
+    mov r25, r20
+    andi r25, 0x0F
+    or r16, r25
+    or r16, r19
+    or r16, r18
+    ; Mantissa de 11 bits = M >> 21
+    mov r24, r20
+    mov r25, r21
+    lsr r25
+    ror r24
+    lsr r25
+    ror r24
+    lsr r25
+    ror r24
+    lsr r25
+    ror r24
+    lsr r25
+    ror r24
+    sbrs r20, 4             ; bit de arredondamento
+    rjmp h_pack_exponent
+    tst r16
+    brne h_pack_up
+    sbrs r24, 0
+    rjmp h_pack_exponent
+h_pack_up:
+    adiw r24, 1
+h_pack_exponent:
+    ; Soma (expoente - 1) << 10; o bit implícito completa o expoente
+    dec r26
+    lsl r26
+    lsl r26
+    add r25, r26
+    andi r17, 0x80
+    or r25, r17
+    ret
+h_pack_inf:
+    ldi r24, 0x00
+    ldi r25, 0x7C
+    andi r17, 0x80
+    or r25, r17
+    ret
+h_pack_zero:
+    clr r24
+    clr r25
+    andi r17, 0x80
+    or r25, r17
+    ret
+
+; @rotina h_add: h_class h_unpack h_pack
+; r24:r25 = A + B (meia precisão)
+h_add:
+    push r2
+    push r3
+    push r8
+    push r9
+    push r10
+    push r11
+    push r12
+    push r13
+    push r16
+    push r17
+    push r18
+    push r19
+    push r20
+    push r21
+    push r22
+    push r23
+    push r26
+    push r27
+    rcall h_class_b
+    mov r20, r16
+    rcall h_class_a
+    cpi r16, 3
+    breq h_add_nan
+    cpi r20, 3
+    breq h_add_nan
+    cpi r16, 2
+    brne h_add_a_finite
+    cpi r20, 2
+    brne h_add_exit         ; inf + finito = inf
+    mov r16, r25
+    eor r16, r23
+    brpl h_add_exit         ; inf + inf de mesmo sinal = inf
+h_add_nan:
+    ldi r24, 0x00
+    ldi r25, 0x7E
+h_add_exit:
+    rjmp h_add_done
+h_add_a_finite:
+    cpi r20, 2
+    brne h_add_finite
+    movw r24, r22           ; finito + inf = inf
+    rjmp h_add_done
+h_add_finite:
+    mov r17, r25            ; sinal de A
+    mov r9, r23             ; sinal de B
+    ; Decompõe B e depois A
+    push r24
+    push r25
+    movw r24, r22
+    rcall h_unpack
+    movw r22, r18           ; mantissa de B
+    movw r2, r26            ; expoente de B
+    pop r25
+    pop r24
+    rcall h_unpack          ; mantissa de A em r18:r19, expoente em r26:r27
+    ; Garante que A tenha o maior expoente
+    cp r26, r2
+    cpc r27, r3
+    brge h_add_ordered
+    movw r10, r18
+    movw r18, r22
+    movw r22, r10
+    movw r10, r26
+    movw r26, r2
+    movw r2, r10
+    mov r10, r17
+    mov r17, r9
+    mov r9, r10
+h_add_ordered:
+    ; Diferença de expoentes em r2:r3
+    movw r10, r26
+    sub r10, r2
+    sbc r11, r3
+    movw r2, r10
+    ; X = MA << 16 em r10:r11:r12:r13 e Y = MB << 16 em r20:r21:r22:r23
+    clr r10
+    clr r11
+    movw r12, r18
+    clr r20
+    clr r21
+    clr r16                 ; sticky
+    tst r3
+    brne h_add_far
+    mov r8, r2
+    mov r18, r2
+    cpi r18, 32
+    brsh h_add_far
+h_add_align:
+    tst r8
+    breq h_add_aligned
+    lsr r23
+    ror r22
+    ror r21
+    ror r20
+    brcc h_add_align_next
+    ldi r16, 1
+h_add_align_next:
+    dec r8
+    rjmp h_add_align
+h_add_far:
+    ; B é pequeno demais: sobra apenas o sticky
+    mov r16, r22
+    or r16, r23
+    clr r22
+    clr r23
+h_add_aligned:
+    tst r16
+    breq h_add_signs
+    ori r20, 1              ; o sticky entra no bit menos significativo de Y
+h_add_signs:
+    mov r16, r17
+    eor r16, r9
+    brmi h_add_subtract
+    add r10, r20
+    adc r11, r21
+    adc r12, r22
+    adc r13, r23
+    rjmp h_add_result
+h_add_subtract:
+    sub r10, r20
+    sbc r11, r21
+    sbc r12, r22
+    sbc r13, r23
+    brcc h_add_result
+    ; |B| > |A|: inverte o resultado e assume o sinal de B
+    com r10
+    com r11
+    com r12
+    com r13
+    ldi r16, 1
+    add r10, r16
+    clr r16
+    adc r11, r16
+    adc r12, r16
+    adc r13, r16
+    mov r17, r9
+h_add_result:
+    mov r16, r10
+    or r16, r11
+    or r16, r12
+    or r16, r13
+    brne h_add_pack
+    ; Resultado exatamente zero: -0 apenas se os dois operandos forem -0
+    and r17, r9
+    clr r24
+    mov r25, r17
+    andi r25, 0x80
+    rjmp h_add_done
+h_add_pack:
+    movw r18, r10
+    movw r20, r12
+    sbiw r26, 16
+    clr r16
+    rcall h_pack
+h_add_done:
+    pop r27
+    pop r26
+    pop r23
+    pop r22
+    pop r21
+    pop r20
+    pop r19
+    pop r18
+    pop r17
+    pop r16
+    pop r13
+    pop r12
+    pop r11
+    pop r10
+    pop r9
+    pop r8
+    pop r3
+    pop r2
+    ret
+
+; @rotina h_sub: h_add
+; r24:r25 = A - B (meia precisão)
+h_sub:
+    push r23
+    subi r23, 0x80          ; inverte o sinal de B
+    rcall h_add
+    pop r23
+    ret
+
+; @rotina h_mul: h_class h_unpack h_pack
+; r24:r25 = A * B (meia precisão)
+h_mul:
+    push r2
+    push r3
+    push r4
+    push r5
+    push r6
+    push r7
+    push r8
+    push r16
+    push r17
+    push r18
+    push r19
+    push r20
+    push r21
+    push r26
+    push r27
+    mov r17, r25
+    eor r17, r23            ; sinal do resultado no bit 7
+    rcall h_class_b
+    mov r20, r16
+    rcall h_class_a
+    cpi r16, 3
+    breq h_mul_nan
+    cpi r20, 3
+    breq h_mul_nan
+    cpi r16, 2
+    brne h_mul_a_not_inf
+    tst r20
+    breq h_mul_nan          ; inf * 0
+    rjmp h_mul_inf
+h_mul_a_not_inf:
+    cpi r20, 2
+    brne h_mul_finite
+    tst r16
+    breq h_mul_nan          ; 0 * inf
+h_mul_inf:
+    ldi r24, 0x00
+    ldi r25, 0x7C
+    andi r17, 0x80
+    or r25, r17
+    rjmp h_mul_done
+h_mul_nan:
+    ldi r24, 0x00
+    ldi r25, 0x7E
+    rjmp h_mul_done
+h_mul_finite:
+    tst r16
+    breq h_mul_zero
+    tst r20
+    breq h_mul_zero
+    push r24
+    push r25
+    movw r24, r22
+    rcall h_unpack
+    movw r20, r18           ; mantissa de B
+    movw r2, r26            ; expoente de B
+    pop r25
+    pop r24
+    rcall h_unpack
+    add r26, r2
+    adc r27, r3
+    ; Produto exato das mantissas (até 22 bits) em r4:r5:r6:r7
+    clr r8
+    mul r18, r20
+    movw r4, r0
+    mul r19, r21
+    movw r6, r0
+    mul r18, r21
+    add r5, r0
+    adc r6, r1
+    adc r7, r8
+    mul r19, r20
+    add r5, r0
+    adc r6, r1
+    adc r7, r8
+    movw r18, r4
+    movw r20, r6
+    clr r16
+    rcall h_pack
+    rjmp h_mul_done
+h_mul_zero:
+    clr r24
+    mov r25, r17
+    andi r25, 0x80
+h_mul_done:
+    pop r27
+    pop r26
+    pop r21
+    pop r20
+    pop r19
+    pop r18
+    pop r17
+    pop r16
+    pop r8
+    pop r7
+    pop r6
+    pop r5
+    pop r4
+    pop r3
+    pop r2
+    ret
+
+; @rotina h_div: h_class h_unpack h_pack
+; r24:r25 = A / B (divisão real em meia precisão); B = 0 liga a flag T
+h_div:
+    push r2
+    push r3
+    push r4
+    push r5
+    push r16
+    push r17
+    push r18
+    push r19
+    push r20
+    push r21
+    push r22
+    push r23
+    push r26
+    push r27
+    mov r17, r25
+    eor r17, r23            ; sinal do resultado no bit 7
+    rcall h_class_b
+    mov r20, r16
+    tst r20
+    brne h_div_b_not_zero
+    set                     ; divisão por zero
+    rjmp h_div_done
+h_div_b_not_zero:
+    rcall h_class_a
+    cpi r16, 3
+    breq h_div_nan
+    cpi r20, 3
+    breq h_div_nan
+    cpi r16, 2
+    brne h_div_a_finite
+    cpi r20, 2
+    breq h_div_nan          ; inf / inf
+    ldi r24, 0x00           ; inf / finito
+    ldi r25, 0x7C
+    andi r17, 0x80
+    or r25, r17
+    rjmp h_div_done
+h_div_nan:
+    ldi r24, 0x00
+    ldi r25, 0x7E
+    rjmp h_div_done
+h_div_a_finite:
+    cpi r20, 2
+    breq h_div_zero         ; finito / inf
+    tst r16
+    breq h_div_zero         ; 0 / finito
+    push r24
+    push r25
+    movw r24, r22
+    rcall h_unpack
+    movw r22, r18           ; mantissa de B (divisor)
+    movw r2, r26            ; expoente de B
+    pop r25
+    pop r24
+    rcall h_unpack          ; mantissa de A (dividendo) em r18:r19
+    sub r26, r2
+    sbc r27, r3
+    sbiw r26, 23            ; quociente com 24 bits: E = EA - EB - 23
+    ; Normaliza as mantissas para o bit 10 (subnormais)
+h_div_norm_a:
+    sbrc r19, 2
+    rjmp h_div_norm_b
+    lsl r18
+    rol r19
+    sbiw r26, 1
+    rjmp h_div_norm_a
+h_div_norm_b:
+    sbrc r23, 2
+    rjmp h_div_long
+    lsl r22
+    rol r23
+    adiw r26, 1
+    rjmp h_div_norm_b
+h_div_long:
+    ; Divisão longa: 24 bits de quociente em r2:r3:r4, resto em r18:r19
+    clr r2
+    clr r3
+    clr r4
+    ldi r16, 24
+h_div_loop:
+    lsl r2
+    rol r3
+    rol r4
+    cp r18, r22
+    cpc r19, r23
+    brlo h_div_next
+    sub r18, r22
+    sbc r19, r23
+    inc r2
+h_div_next:
+    lsl r18
+    rol r19
+    dec r16
+    brne h_div_loop
+    mov r16, r18            ; resto diferente de zero: sticky
+    or r16, r19
+    mov r18, r2
+    mov r19, r3
+    mov r20, r4
+    clr r21
+    rcall h_pack
+    rjmp h_div_done
+h_div_zero:
+    clr r24
+    mov r25, r17
+    andi r25, 0x80
+h_div_done:
+    pop r27
+    pop r26
+    pop r23
+    pop r22
+    pop r21
+    pop r20
+    pop r19
+    pop r18
+    pop r17
+    pop r16
+    pop r5
+    pop r4
+    pop r3
+    pop r2
+    ret
+
+; @rotina h_from_int: h_pack
+; Converte o inteiro de 16 bits com sinal em r24:r25 para meia precisão
+h_from_int:
+    mov r0, r24
+    or r0, r25
+    breq h_from_int_ret     ; 0 -> +0.0 (mesmo padrão de bits)
+    push r16
+    push r17
+    push r18
+    push r19
+    push r20
+    push r21
+    push r26
+    push r27
+    mov r17, r25            ; sinal
+    sbrs r25, 7
+    rjmp h_from_int_abs
+    com r25
+    neg r24
+    sbci r25, 0xFF
+h_from_int_abs:
+    movw r18, r24
+    clr r20
+    clr r21
+    clr r26
+    clr r27
+    clr r16
+    rcall h_pack
+    pop r27
+    pop r26
+    pop r21
+    pop r20
+    pop r19
+    pop r18
+    pop r17
+    pop r16
+h_from_int_ret:
+    ret
+
+; @rotina h_to_int:
+; Converte o valor em meia precisão em r24:r25 para inteiro de 16 bits,
+; truncando em direção a zero; infinito ou NaN ligam a flag T
+h_to_int:
+    push r16
+    push r17
+    mov r17, r25            ; sinal
+    mov r16, r25
+    lsr r16
+    lsr r16
+    andi r16, 0x1F          ; expoente
+    cpi r16, 31
+    brne h_to_int_finite
+    set
+    rjmp h_to_int_zero
+h_to_int_finite:
+    cpi r16, 15
+    brlo h_to_int_zero      ; |valor| < 1
+    andi r25, 0x03
+    ori r25, 0x04           ; mantissa com o bit implícito
+    subi r16, 25
+    brmi h_to_int_right
+h_to_int_left:
+    tst r16
+    breq h_to_int_sign
+    lsl r24
+    rol r25
+    dec r16
+    rjmp h_to_int_left
+h_to_int_right:
+    lsr r25
+    ror r24
+    inc r16
+    brne h_to_int_right
+h_to_int_sign:
+    sbrs r17, 7
+    rjmp h_to_int_done
+    com r25
+    neg r24
+    sbci r25, 0xFF
+    rjmp h_to_int_done
+h_to_int_zero:
+    clr r24
+    clr r25
+h_to_int_done:
+    pop r17
+    pop r16
+    ret
+
+; @rotina h_exp_check:
+; Valida o expoente em meia precisão em r24:r25 (inteiro não negativo) e o
+; converte para inteiro sem sinal de 16 bits; caso contrário liga a flag T
+h_exp_check:
+    push r16
+    push r17
+    mov r16, r25
+    andi r16, 0x7F
+    or r16, r24
+    breq h_exp_check_zero   ; +0 ou -0
+    sbrc r25, 7
+    rjmp h_exp_check_error  ; negativo
+    mov r16, r25
+    lsr r16
+    lsr r16
+    andi r16, 0x1F
+    cpi r16, 31
+    breq h_exp_check_error  ; infinito ou NaN
+    cpi r16, 15
+    brlo h_exp_check_error  ; fração entre 0 e 1
+    andi r25, 0x03
+    ori r25, 0x04
+    subi r16, 25
+    brmi h_exp_check_right
+h_exp_check_left:
+    tst r16
+    breq h_exp_check_done
+    lsl r24
+    rol r25
+    dec r16
+    rjmp h_exp_check_left
+h_exp_check_right:
+    lsr r25
+    ror r24
+    brcs h_exp_check_error  ; bit fracionário descartado
+    inc r16
+    brne h_exp_check_right
+    rjmp h_exp_check_done
+h_exp_check_error:
+    set
+h_exp_check_zero:
+    clr r24
+    clr r25
+h_exp_check_done:
+    pop r17
+    pop r16
+    ret
+
+; @rotina i_exp_check:
+; Valida o expoente inteiro em r24:r25 (não negativo); caso contrário liga a flag T
+i_exp_check:
+    sbrc r25, 7
+    set
+    ret
+
+; @rotina mul24:
+; Multiplica as mantissas de 24 bits r18:r19:r20 e r4:r5:r6, mantendo em
+; r18:r19:r20 os 24 bits mais significativos do produto normalizado. Bits
+; descartados diferentes de zero vão para o bit menos significativo. r16 = 1
+; se o produto ocupou 48 bits (o expoente soma 24) ou 0 (soma 23).
+; Altera r0, r1, r7-r13.
+mul24:
+    clr r13                 ; zero para a propagação do carry
+    mul r18, r4             ; offset 0
+    mov r7, r0
+    mov r8, r1
+    mul r20, r6             ; offset 4
+    mov r11, r0
+    mov r12, r1
+    clr r9
+    clr r10
+    mul r19, r5             ; offset 2
+    add r9, r0
+    adc r10, r1
+    adc r11, r13
+    adc r12, r13
+    mul r18, r5             ; offset 1
+    add r8, r0
+    adc r9, r1
+    adc r10, r13
+    adc r11, r13
+    adc r12, r13
+    mul r19, r4             ; offset 1
+    add r8, r0
+    adc r9, r1
+    adc r10, r13
+    adc r11, r13
+    adc r12, r13
+    mul r18, r6             ; offset 2
+    add r9, r0
+    adc r10, r1
+    adc r11, r13
+    adc r12, r13
+    mul r20, r4             ; offset 2
+    add r9, r0
+    adc r10, r1
+    adc r11, r13
+    adc r12, r13
+    mul r19, r6             ; offset 3
+    add r10, r0
+    adc r11, r1
+    adc r12, r13
+    mul r20, r5             ; offset 3
+    add r10, r0
+    adc r11, r1
+    adc r12, r13
+    ldi r16, 1
+    sbrc r12, 7
+    rjmp mul24_take
+    clr r16
+    lsl r7
+    rol r8
+    rol r9
+    rol r10
+    rol r11
+    rol r12
+mul24_take:
+    mov r18, r10
+    mov r19, r11
+    mov r20, r12
+    or r7, r8
+    or r7, r9
+    breq mul24_done
+    ori r18, 1
+mul24_done:
+    ret
+
+; @rotina h_clamp:
+; Limita o expoente em r26:r27 a -2000..2000 (evita overflow de 16 bits;
+; valores nesses extremos já viram infinito ou zero). Usa r16.
+h_clamp:
+    ldi r16, high(2000)
+    cpi r26, low(2000)
+    cpc r27, r16
+    brlt h_clamp_low
+    ldi r26, low(2000)
+    ldi r27, high(2000)
+    ret
+h_clamp_low:
+    ldi r16, high(-2000)
+    cpi r26, low(-2000)
+    cpc r27, r16
+    brge h_clamp_done
+    ldi r26, low(-2000)
+    ldi r27, high(-2000)
+h_clamp_done:
+    ret
+
+; @rotina h_pow: h_class h_unpack h_pack mul24 h_clamp
+; r24:r25 = A ^ n, com A em meia precisão e n inteiro sem sinal em r22:r23.
+; As potências são acumuladas com mantissas de 24 bits e arredondadas uma
+; única vez no final.
+h_pow:
+    mov r0, r22
+    or r0, r23
+    brne h_pow_start
+    ldi r24, 0x00           ; A ^ 0 = 1
+    ldi r25, 0x3C
+    ret
+h_pow_start:
+    push r2
+    push r3
+    push r4
+    push r5
+    push r6
+    push r7
+    push r8
+    push r9
+    push r10
+    push r11
+    push r12
+    push r13
+    push r14
+    push r15
+    push r16
+    push r17
+    push r18
+    push r19
+    push r20
+    push r21
+    push r22
+    push r23
+    push r26
+    push r27
+    ; Resultado negativo apenas com base negativa e expoente ímpar
+    clr r17
+    sbrc r22, 0
+    mov r17, r25
+    rcall h_class_a
+    cpi r16, 3
+    brne h_pow_number
+    rjmp h_pow_done         ; NaN ^ n = NaN
+h_pow_number:
+    cpi r16, 2
+    brne h_pow_not_inf
+    ldi r24, 0x00
+    ldi r25, 0x7C
+    rjmp h_pow_sign
+h_pow_not_inf:
+    tst r16
+    brne h_pow_finite
+    clr r24
+    clr r25
+h_pow_sign:
+    andi r17, 0x80
+    or r25, r17
+    rjmp h_pow_done
+h_pow_finite:
+    rcall h_unpack
+    ; Normaliza a base para 24 bits: X em r4:r5:r6, expoente em r2:r3
+h_pow_norm:
+    sbrc r19, 2
+    rjmp h_pow_normalized
+    lsl r18
+    rol r19
+    sbiw r26, 1
+    rjmp h_pow_norm
+h_pow_normalized:
+    clr r4
+    mov r5, r18
+    mov r6, r19
+    lsl r5
+    rol r6
+    lsl r5
+    rol r6
+    lsl r5
+    rol r6
+    lsl r5
+    rol r6
+    lsl r5
+    rol r6
+    sbiw r26, 13
+    movw r2, r26
+    ; Resultado R = 1.0 em r18:r19:r20, expoente em r14:r15
+    clr r18
+    clr r19
+    ldi r20, 0x80
+    ldi r26, low(-23)
+    ldi r27, high(-23)
+    movw r14, r26
+    movw r24, r22           ; expoente n em r24:r25
+h_pow_loop:
+    sbrs r24, 0
+    rjmp h_pow_square
+    ; R = R * X
+    rcall mul24
+    movw r26, r14
+    add r26, r2
+    adc r27, r3
+    adiw r26, 23
+    add r26, r16
+    clr r16
+    adc r27, r16
+    rcall h_clamp
+    movw r14, r26
+h_pow_square:
+    lsr r25
+    ror r24
+    mov r0, r24
+    or r0, r25
+    breq h_pow_pack
+    ; X = X * X (R é guardado em r21:r22:r23)
+    mov r21, r18
+    mov r22, r19
+    mov r23, r20
+    mov r18, r4
+    mov r19, r5
+    mov r20, r6
+    rcall mul24
+    mov r4, r18
+    mov r5, r19
+    mov r6, r20
+    mov r18, r21
+    mov r19, r22
+    mov r20, r23
+    movw r26, r2
+    add r26, r2
+    adc r27, r3
+    adiw r26, 23
+    add r26, r16
+    clr r16
+    adc r27, r16
+    rcall h_clamp
+    movw r2, r26
+    rjmp h_pow_loop
+h_pow_pack:
+    clr r21
+    movw r26, r14
+    clr r16
+    rcall h_pack
+h_pow_done:
+    pop r27
+    pop r26
+    pop r23
+    pop r22
+    pop r21
+    pop r20
+    pop r19
+    pop r18
+    pop r17
+    pop r16
+    pop r15
+    pop r14
+    pop r13
+    pop r12
+    pop r11
+    pop r10
+    pop r9
+    pop r8
+    pop r7
+    pop r6
+    pop r5
+    pop r4
+    pop r3
+    pop r2
+    ret
+
+; @rotina i_mul:
+; r24:r25 = A * B (inteiros de 16 bits, 16 bits menos significativos)
+i_mul:
+    push r16
+    push r17
+    mul r24, r22
+    movw r16, r0
+    mul r24, r23
+    add r17, r0
+    mul r25, r22
+    add r17, r0
+    movw r24, r16
+    pop r17
+    pop r16
+    ret
+
+; @rotina i_divmod:
+; Divisão inteira com arredondamento para baixo (como // e % do Python).
+; Entrada: A em r24:r25, B em r22:r23 (B diferente de zero).
+; Saída: quociente em r18:r19 e resto (com o sinal de B) em r26:r27.
+; Altera r16, r17, r20, r21.
+i_divmod:
+    mov r17, r25            ; sinal de A
+    movw r18, r24
+    sbrs r19, 7
+    rjmp i_divmod_b
+    com r19
+    neg r18
+    sbci r19, 0xFF
+i_divmod_b:
+    movw r20, r22
+    sbrs r21, 7
+    rjmp i_divmod_start
+    com r21
+    neg r20
+    sbci r21, 0xFF
+i_divmod_start:
+    ; Divisão sem sinal de |A| por |B|
+    clr r26
+    clr r27
+    ldi r16, 16
+i_divmod_loop:
+    lsl r18
+    rol r19
+    rol r26
+    rol r27
+    cp r26, r20
+    cpc r27, r21
+    brlo i_divmod_next
+    sub r26, r20
+    sbc r27, r21
+    inc r18
+i_divmod_next:
+    dec r16
+    brne i_divmod_loop
+    ; Sinais diferentes: quociente negativo, arredondado para baixo
+    eor r17, r23
+    brpl i_divmod_mod
+    com r19
+    neg r18
+    sbci r19, 0xFF
+    mov r16, r26
+    or r16, r27
+    breq i_divmod_mod
+    subi r18, 1
+    sbci r19, 0
+    ; Resto = |B| - resto
+    sub r20, r26
+    sbc r21, r27
+    movw r26, r20
+i_divmod_mod:
+    ; O resto tem o sinal de B
+    sbrs r23, 7
+    ret
+    com r27
+    neg r26
+    sbci r27, 0xFF
+    ret
+
+; @rotina i_div: i_divmod
+; r24:r25 = A // B (inteiros); B = 0 liga a flag T
+i_div:
+    mov r0, r22
+    or r0, r23
+    brne i_div_start
+    set
+    ret
+i_div_start:
+    push r16
+    push r17
+    push r18
+    push r19
+    push r20
+    push r21
+    push r26
+    push r27
+    rcall i_divmod
+    movw r24, r18
+    pop r27
+    pop r26
+    pop r21
+    pop r20
+    pop r19
+    pop r18
+    pop r17
+    pop r16
+    ret
+
+; @rotina i_mod: i_divmod
+; r24:r25 = A % B (inteiros); B = 0 liga a flag T
+i_mod:
+    mov r0, r22
+    or r0, r23
+    brne i_mod_start
+    set
+    ret
+i_mod_start:
+    push r16
+    push r17
+    push r18
+    push r19
+    push r20
+    push r21
+    push r26
+    push r27
+    rcall i_divmod
+    movw r24, r26
+    pop r27
+    pop r26
+    pop r21
+    pop r20
+    pop r19
+    pop r18
+    pop r17
+    pop r16
+    ret
+
+; @rotina i_pow: i_mul
+; r24:r25 = A ^ n (inteiros), com n sem sinal em r22:r23
+i_pow:
+    push r18
+    push r19
+    push r20
+    push r21
+    push r22
+    push r23
+    movw r20, r22           ; expoente
+    movw r18, r24           ; base
+    ldi r24, 1              ; resultado = 1
+    clr r25
+i_pow_loop:
+    mov r0, r20
+    or r0, r21
+    breq i_pow_done
+    sbrs r20, 0
+    rjmp i_pow_square
+    movw r22, r18
+    rcall i_mul             ; resultado *= base
+i_pow_square:
+    lsr r21
+    ror r20
+    push r24
+    push r25
+    movw r24, r18
+    movw r22, r18
+    rcall i_mul             ; base *= base
+    movw r18, r24
+    pop r25
+    pop r24
+    rjmp i_pow_loop
+i_pow_done:
+    pop r23
+    pop r22
+    pop r21
+    pop r20
+    pop r19
+    pop r18
+    ret
@@ -0,0 +1,532 @@
+#!/usr/bin/env python3
+"""
+Benchmark diferencial da calculadora RPN
+Gera expressões aleatórias (reprodutíveis pela semente), avalia-as com a
+RPNCalculator, compila-as com generate_arduino_assembly, executa o código no
+AVRSimulator (a partir da imagem montada em Intel HEX) e compara os
+valores. As métricas (expressões por segundo,
+latências p50/p99, pico de memória e ciclos simulados por expressão) são
+gravadas em JSON, para comparação com uma execução de referência.
+
+Os tempos da calculadora e do gerador são medidos em um conjunto maior de
+expressões, separado do conjunto de conformidade (limitado pela SRAM do
+Arduino), em várias repetições, das quais vale a melhor.
+"""
+
+import contextlib
+import io
+import json
+import math
+import os
+import platform
+import random
+import re
+import sys
+import tempfile
+import time
+import tracemalloc
+
+from avr_codegen import AVR_SRAM_SIZE, AVR_STACK_RESERVE
+from rpn_calculator import ErrorValue, RPNCalculator, decode_half
+from simulate_asm import AVRSimulator, FLASH_SIZE, TRACE_RECORD
+
+# Maior quantidade de expressões cujos buffers (2 bytes de memory, mais 3 bytes
+# por expressão em results e errors) cabem na SRAM junto com a pilha
+MAX_EXPRESSIONS = (AVR_SRAM_SIZE - AVR_STACK_RESERVE - 2) // 3
+
+# Expressões por programa simulado: o conjunto de conformidade é dividido em
+# programas deste tamanho, para que cada imagem caiba nos 32 KiB de memória de
+# programa (FLASH_SIZE) e seus resultados, na SRAM (no máximo MAX_EXPRESSIONS)
+PROGRAM_EXPRESSIONS = 200
+
+# Versão do formato do JSON de métricas
+METRICS_VERSION = 2
+
+# Quantidade de expressões do conjunto em que a calculadora e o gerador são
+# cronometrados e quantas vezes ele é avaliado e compilado (as métricas de
+# tempo são as da melhor repetição)
+EVALUATOR_COUNT = 10000
+EVALUATOR_REPEATS = 5
+
+# Operadores sorteados por padrão (o peso é a quantidade de repetições)
+DEFAULT_OPERATORS = '++--**|/%^'
+
+# Operandos numéricos sorteados nas folhas das expressões
+NUMBERS = ('0', '1', '2', '3', '5', '7', '10', '100', '-1', '-3', '0.5', '1.5',
+           '2.5', '0.1', '3.14', '-0.25')
+
+# Tolerância padrão (fração) na comparação com a execução de referência, para
+# as métricas determinísticas (instruções, bytes, ciclos) e para os tempos,
+# que variam com a carga da máquina
+DEFAULT_TOLERANCE = 0.10
+DEFAULT_TIMING_TOLERANCE = 0.25
+
+# Métricas comparadas com a referência: (seção, métrica, maior é melhor, é um tempo)
+TRACKED_METRICS = (
+    ('evaluator', 'expressions_per_second', True, True),
+    ('evaluator', 'latency_p50_us', False, True),
+    ('evaluator', 'latency_p99_us', False, True),
+    ('evaluator', 'peak_memory_bytes', False, False),
+    ('codegen', 'expressions_per_second', True, True),
+    ('codegen', 'instructions', False, False),
+    ('simulator', 'flash_bytes', False, False),
+    ('simulator', 'cycles_per_expression', False, False),
+    ('simulator', 'cycles_p99', False, False),
+)
+
+# Comentário que o gerador escreve antes de cada expressão
+_EXPRESSION_COMMENT = re.compile(r'; Expressão da linha (\d+): .* \(resultado (\d+), (inteiro|meia precisão)\)$')
+
+
+def generate_expressions(count, seed=0, max_depth=4, operators=DEFAULT_OPERATORS,
+                         res_ratio=0.2, mem_ratio=0.1):
+    """
+    Gera expressões RPN aleatórias.
+
+    Parâmetros:
+        count: Quantidade de expressões (uma por linha)
+        seed: Semente do gerador (mesma semente, mesmas expressões)
+        max_depth: Profundidade máxima da árvore de operadores
+        operators: Operadores sorteados; repetir um operador aumenta seu peso
+        res_ratio: Probabilidade de uma folha ser (N RES)
+        mem_ratio: Probabilidade de uma folha ser (MEM) ou (V MEM)
+
+    Retorna:
+        Lista de expressões
+    """
+    rng = random.Random(seed)
+
+    def leaf(line_index):
+        r = rng.random()
+        if r < res_ratio and line_index > 0:
+            return f"({rng.randrange(min(line_index, 8))} RES)"
+        r -= res_ratio
+        if r < mem_ratio / 2:
+            return "(MEM)"
+        if r < mem_ratio:
+            return f"({rng.choice(NUMBERS)} MEM)"
+        return rng.choice(NUMBERS)
+
+    def tree(depth, line_index):
+        if depth == 0 or rng.random() < 0.2:
+            return leaf(line_index)
+        return f"({tree(depth - 1, line_index)} {tree(depth - 1, line_index)} {rng.choice(operators)})"
+
+    return [tree(rng.randint(1, max_depth), i) for i in range(count)]
+
+
+def percentile(values, fraction):
+    """Percentil (pelo vizinho mais próximo) de uma lista já ordenada"""
+    if not values:
+        return 0.0
+    return values[min(len(values) - 1, int(math.ceil(fraction * len(values))) - 1)]
+
+
+def evaluate_file(filename):
+    """
+    Avalia o arquivo de expressões com RPNCalculator.process_file, sem medir tempo.
+
+    Retorna:
+        Lista de (resultado, erro) de cada expressão
+    """
+    with contextlib.redirect_stdout(io.StringIO()):
+        results = RPNCalculator().process_file(filename, verbose=False)
+    return [(result, result if result.__class__ is ErrorValue else None) for result in results]
+
+
+def run_evaluator(filename, repeats=EVALUATOR_REPEATS):
+    """
+    Avalia o arquivo com RPNCalculator.iter_file (o mesmo caminho de
+    stream_file, com o histórico completo para não incluir a passada que
+    calcula a janela) repeats vezes, cada uma em uma calculadora nova, medindo
+    o tempo de cada expressão. O tempo total e as latências são os mínimos entre
+    as repetições, que são os menos afetados por outros processos na máquina.
+
+    Retorna:
+        Dicionário de métricas
+    """
+    clock = time.perf_counter_ns
+    runs = []
+    for _ in range(max(repeats, 1)):
+        latencies = []
+        evaluations = RPNCalculator().iter_file(filename, full_history=True)
+        started = clock()
+        while True:
+            before = clock()
+            record = next(evaluations, None)
+            if record is None:
+                break
+            latencies.append(clock() - before)
+        elapsed = clock() - started
+        latencies.sort()
+        runs.append((elapsed, percentile(latencies, 0.50), percentile(latencies, 0.99),
+                     latencies[-1] if latencies else 0))
+    count = len(latencies)
+    elapsed = min(run[0] for run in runs) / 1e9
+
+    # Pico de memória em uma avaliação à parte (tracemalloc deixa a execução mais lenta)
+    tracemalloc.start()
+    try:
+        for _ in RPNCalculator().iter_file(filename, full_history=True):
+            pass
+        peak = tracemalloc.get_traced_memory()[1]
+    finally:
+        tracemalloc.stop()
+
+    return {
+        'expressions': count,
+        'repeats': len(runs),
+        'seconds': round(elapsed, 6),
+        'expressions_per_second': round(count / elapsed, 1) if elapsed else 0.0,
+        'latency_p50_us': round(min(run[1] for run in runs) / 1000, 3),
+        'latency_p99_us': round(min(run[2] for run in runs) / 1000, 3),
+        'latency_max_us': round(min(run[3] for run in runs) / 1000, 3),
+        'peak_memory_bytes': peak,
+    }
+
+
+def compile_file(input_filename, output_filename, fold_constants):
+    """Compila o arquivo com generate_arduino_assembly."""
+    with contextlib.redirect_stdout(io.StringIO()):
+        ok = RPNCalculator().generate_arduino_assembly(input_filename, output_filename, fold_constants)
+    if not ok:
+        raise RuntimeError("falha ao gerar o código Assembly")
+
+
+def time_codegen(input_filename, output_filename, fold_constants, count, repeats=EVALUATOR_REPEATS):
+    """
+    Compila o arquivo repeats vezes e mede a melhor repetição.
+
+    Retorna:
+        Dicionário de métricas de tempo
+    """
+    runs = []
+    for _ in range(max(repeats, 1)):
+        started = time.perf_counter()
+        compile_file(input_filename, output_filename, fold_constants)
+        runs.append(time.perf_counter() - started)
+    elapsed = min(runs)
+    return {
+        'expressions': count,
+        'repeats': len(runs),
+        'seconds': round(elapsed, 6),
+        'expressions_per_second': round(count / elapsed, 1) if elapsed else 0.0,
+    }
+
+
+def run_codegen(input_filename, output_filename, fold_constants):
+    """
+    Compila o arquivo do conjunto de conformidade (sem medir tempo).
+
+    Retorna:
+        Tupla (tipo de cada resultado, 'int' ou 'float'; métricas)
+    """
+    compile_file(input_filename, output_filename, fold_constants)
+
+    result_types = []
+    instructions = 0
+    with open(output_filename) as f:
+        for line in f:
+            match = _EXPRESSION_COMMENT.search(line.strip())
+            if match:
+                result_types.append('int' if match.group(3) == 'inteiro' else 'float')
+            elif line.startswith('; Código principal:'):
+                instructions = int(line.split(':')[1].split()[0])
+    return result_types, {
+        'instructions': instructions,
+        'fold_constants': fold_constants,
+    }
+
+
+def run_simulator(asm_filename, trace_filename):
+    """
+    Monta o código gerado em uma imagem Intel HEX e a executa no AVRSimulator,
+    registrando o rastreamento binário para atribuir os ciclos a cada expressão.
+    Uma imagem maior que a memória de programa (FLASH_SIZE) é um erro: o
+    código não rodaria no ATmega328P.
+
+    Retorna:
+        Tupla (simulador ao fim da execução, tamanho da imagem em bytes,
+        segundos de simulação, ciclos de cada expressão)
+    """
+    simulator = AVRSimulator(trace='off', max_steps=None, trace_file=trace_filename)
+    if not simulator.load_program(asm_filename, strict=True):
+        raise RuntimeError("falha ao montar o código Assembly")
+    image_filename = os.path.splitext(asm_filename)[0] + '.hex'
+    flash_bytes = simulator.save_image(image_filename)
+    if flash_bytes > FLASH_SIZE:
+        raise RuntimeError(f"a imagem tem {flash_bytes} bytes e não cabe nos {FLASH_SIZE} bytes "
+                           "de memória de programa do ATmega328P")
+    if not simulator.load_image(image_filename):
+        raise RuntimeError("falha ao carregar a imagem no simulador")
+    started = time.perf_counter()
+    simulator.execute()
+    elapsed = time.perf_counter() - started
+    if simulator.stop_reason != 'end':
+        raise RuntimeError(f"a simulação não chegou ao fim ({simulator.stop_reason})")
+
+    # Ciclos de cada expressão: da entrada no rótulo expression_N até o próximo
+    # rótulo de expressão (ou end)
+    boundaries = {address: label for label, address in simulator.labels.items()
+                  if label.startswith('expression_') and label[11:].isdigit() or label == 'end'}
+    entries = []
+    with open(trace_filename, 'rb') as f:
+        for cycles, pc, _ in TRACE_RECORD.iter_unpack(f.read()):
+            if pc in boundaries:
+                entries.append(cycles)
+    return simulator, flash_bytes, elapsed, [b - a for a, b in zip(entries, entries[1:])]
+
+
+def simulation_metrics(runs, count):
+    """
+    Junta as métricas das simulações dos programas do conjunto de conformidade.
+
+    Parâmetros:
+        runs: Lista de tuplas devolvidas por run_simulator
+        count: Quantidade total de expressões
+
+    Retorna:
+        Dicionário de métricas; flash_bytes é o tamanho da maior imagem
+    """
+    per_expression = sorted(cycles for run in runs for cycles in run[3])
+    steps = sum(run[0].steps for run in runs)
+    cycles = sum(run[0].cycles for run in runs)
+    elapsed = sum(run[2] for run in runs)
+    return {
+        'programs': len(runs),
+        'flash_bytes': max(run[1] for run in runs),
+        'flash_size': FLASH_SIZE,
+        'steps': steps,
+        'cycles': cycles,
+        'cycles_per_expression': round(cycles / count, 2) if count else 0.0,
+        'cycles_p50': percentile(per_expression, 0.50),
+        'cycles_p99': percentile(per_expression, 0.99),
+        'cycles_max': per_expression[-1] if per_expression else 0,
+        'bytes_loaded': sum(run[0].loads for run in runs),
+        'bytes_stored': sum(run[0].stores for run in runs),
+        'seconds': round(elapsed, 6),
+        'instructions_per_second': round(steps / elapsed, 1) if elapsed else 0.0,
+    }
+
+
+def same_value(expected, actual):
+    """Compara os valores, tratando NaN e o sinal do zero em meia precisão"""
+    if isinstance(expected, float) and math.isnan(expected):
+        return isinstance(actual, float) and math.isnan(actual)
+    if isinstance(expected, float) and isinstance(actual, float) and expected == 0:
+        return actual == 0 and math.copysign(1, expected) == math.copysign(1, actual)
+    return expected == actual
+
+
+def compare_results(lines, outputs, result_types, simulator, max_examples=10, first_line=1):
+    """
+    Compara os resultados da RPNCalculator com os valores em results/errors
+    ao fim da simulação.
+
+    Parâmetros:
+        first_line: Número, no conjunto de conformidade, da primeira linha do programa
+
+    Retorna:
+        Dicionário com as contagens e alguns exemplos de divergência
+    """
+    compared = skipped = mismatches = 0
+    examples = []
+    for index, ((expected, error), kind) in enumerate(zip(outputs, result_types)):
+        bits = simulator.read_symbol('results', index)
+        failed = simulator.read_symbol('errors', index, 1)
+        if error is None and isinstance(expected, int) and not -32768 <= expected <= 32767:
+            # Inteiros fora de 16 bits não cabem no resultado do Arduino
+            skipped += 1
+            continue
+        if kind == 'int':
+            actual = bits - 0x10000 if bits & 0x8000 else bits
+        else:
+            actual = decode_half(bits)
+        if error is not None:
+            ok = failed == 1
+        else:
+            ok = failed == 0 and same_value(expected, actual)
+        compared += 1
+        if not ok:
+            mismatches += 1
+            if len(examples) < max_examples:
+                examples.append({
+                    'line': index + first_line,
+                    'expression': lines[index],
+                    'expected': repr(expected) if error is None else str(error),
+                    'actual': repr(actual) if not failed else 'erro',
+                })
+    if len(result_types) != len(outputs):
+        mismatches += abs(len(result_types) - len(outputs))
+    return {'compared': compared, 'skipped': skipped, 'mismatches': mismatches, 'examples': examples}
+
+
+def run_benchmark(count=500, seed=0, max_depth=4, operators=DEFAULT_OPERATORS,
+                  res_ratio=0.2, mem_ratio=0.1, fold_constants=False,
+                  evaluator_count=EVALUATOR_COUNT, repeats=EVALUATOR_REPEATS):
+    """
+    Executa o benchmark completo.
+
+    Parâmetros:
+        count: Expressões do conjunto de conformidade (compilado e simulado)
+        evaluator_count: Expressões do conjunto em que a calculadora e o gerador
+                         são cronometrados
+        repeats: Avaliações e compilações desse conjunto
+        (demais parâmetros: ver generate_expressions e generate_arduino_assembly)
+
+    Retorna:
+        Dicionário de métricas (serializável em JSON)
+    """
+    if count <= 0:
+        raise ValueError("a quantidade de expressões deve ser positiva")
+    if evaluator_count <= 0:
+        raise ValueError("a quantidade de expressões da calculadora deve ser positiva")
+    lines = generate_expressions(count, seed, max_depth, operators, res_ratio, mem_ratio)
+
+    with tempfile.TemporaryDirectory() as directory:
+        timed_filename = os.path.join(directory, 'evaluator.txt')
+        with open(timed_filename, 'w') as f:
+            f.write('\n'.join(generate_expressions(evaluator_count, seed + 1, max_depth, operators,
+                                                   res_ratio, mem_ratio)) + '\n')
+        evaluator = run_evaluator(timed_filename, repeats)
+        codegen = time_codegen(timed_filename, os.path.join(directory, 'evaluator.asm'), fold_constants,
+                               evaluator['expressions'], repeats)
+
+        # Cada programa é avaliado, compilado e simulado por inteiro; um (N RES)
+        # no início de um programa não vê os resultados do anterior, nem na
+        # calculadora nem no Arduino
+        instructions = 0
+        runs = []
+        conformance = {'compared': 0, 'skipped': 0, 'mismatches': 0, 'examples': []}
+        for start in range(0, count, PROGRAM_EXPRESSIONS):
+            program = lines[start:start + PROGRAM_EXPRESSIONS]
+            input_filename = os.path.join(directory, 'expressions.txt')
+            asm_filename = os.path.join(directory, 'benchmark.asm')
+            with open(input_filename, 'w') as f:
+                f.write('\n'.join(program) + '\n')
+            outputs = evaluate_file(input_filename)
+            result_types, compiled = run_codegen(input_filename, asm_filename, fold_constants)
+            instructions += compiled['instructions']
+            runs.append(run_simulator(asm_filename, os.path.join(directory, 'trace.bin')))
+            checked = compare_results(program, outputs, result_types, runs[-1][0],
+                                      first_line=start + 1)
+            for key in ('compared', 'skipped', 'mismatches'):
+                conformance[key] += checked[key]
+            conformance['examples'].extend(checked['examples'])
+        del conformance['examples'][10:]
+        codegen.update(instructions=instructions, fold_constants=fold_constants)
+        simulation = simulation_metrics(runs, count)
+
+    return {
+        'version': METRICS_VERSION,
+        'python': platform.python_version(),
+        'config': {
+            'count': count, 'seed': seed, 'max_depth': max_depth, 'operators': operators,
+            'res_ratio': res_ratio, 'mem_ratio': mem_ratio, 'fold_constants': fold_constants,
+            'evaluator_count': evaluator_count, 'repeats': repeats,
+        },
+        'evaluator': evaluator,
+        'codegen': codegen,
+        'simulator': simulation,
+        'conformance': conformance,
+    }
+
+
+def compare_with_baseline(metrics, baseline, tolerance=DEFAULT_TOLERANCE,
+                          timing_tolerance=DEFAULT_TIMING_TOLERANCE):
+    """
+    Compara as métricas com as de uma execução de referência.
+
+    Parâmetros:
+        metrics: Métricas da execução atual
+        baseline: Métricas de referência (mesmo formato)
+        tolerance: Piora relativa aceita antes de apontar uma regressão
+        timing_tolerance: O mesmo, para as métricas de tempo
+
+    Retorna:
+        Lista de mensagens, uma por regressão encontrada
+    """
+    regressions = []
+    if baseline.get('config') != metrics['config']:
+        regressions.append("configuração diferente da referência; as métricas não são comparáveis")
+        return regressions
+    for section, name, higher_is_better, timed in TRACKED_METRICS:
+        old = baseline.get(section, {}).get(name)
+        new = metrics[section][name]
+        if not old:
+            continue
+        change = (new - old) / old
+        if (-change if higher_is_better else change) > (timing_tolerance if timed else tolerance):
+            regressions.append(f"{section}.{name}: {old} -> {new} ({change:+.1%})")
+    return regressions
+
+
+def main(argv=None, prog="benchmark.py"):
+    """
+    Executa o benchmark pela linha de comando e grava o JSON de métricas.
+
+    Retorna:
+        Código de saída (1 se houver divergências ou regressões)
+    """
+    import argparse
+
+    parser = argparse.ArgumentParser(
+        prog=prog,
+        description="Benchmark diferencial: RPNCalculator x Assembly gerado no AVRSimulator.")
+    parser.add_argument("--count", type=int, default=500,
+                        help=f"quantidade de expressões compiladas e simuladas, em programas de "
+                             f"{PROGRAM_EXPRESSIONS} (padrão: 500)")
+    parser.add_argument("--evaluator-count", type=int, default=EVALUATOR_COUNT,
+                        help=f"quantidade de expressões em que a calculadora é cronometrada "
+                             f"(padrão: {EVALUATOR_COUNT})")
+    parser.add_argument("--repeat", type=int, default=EVALUATOR_REPEATS,
+                        help=f"repetições da medição da calculadora e do gerador; vale a melhor "
+                             f"(padrão: {EVALUATOR_REPEATS})")
+    parser.add_argument("--seed", type=int, default=0, help="semente das expressões (padrão: 0)")
+    parser.add_argument("--depth", type=int, default=4, help="profundidade máxima (padrão: 4)")
+    parser.add_argument("--operators", default=DEFAULT_OPERATORS,
+                        help="operadores sorteados, com repetição como peso (padrão: '%(default)s')")
+    parser.add_argument("--res", type=float, default=0.2, help="proporção de folhas (N RES) (padrão: 0.2)")
+    parser.add_argument("--mem", type=float, default=0.1, help="proporção de folhas MEM (padrão: 0.1)")
+    parser.add_argument("--fold", action="store_true",
+                        help="calcula as operações entre constantes na compilação "
+                             "(por padrão, todo o cálculo é feito no código gerado)")
+    parser.add_argument("-o", "--output", help="grava as métricas neste arquivo JSON")
+    parser.add_argument("--baseline", help="JSON de referência para detectar regressões")
+    parser.add_argument("--tolerance", type=float, default=DEFAULT_TOLERANCE,
+                        help="piora relativa aceita em relação à referência, nas métricas "
+                             f"determinísticas (padrão: {DEFAULT_TOLERANCE})")
+    parser.add_argument("--timing-tolerance", type=float, default=DEFAULT_TIMING_TOLERANCE,
+                        help=f"piora relativa aceita nas métricas de tempo (padrão: {DEFAULT_TIMING_TOLERANCE})")
+    args = parser.parse_args(argv)
+
+    try:
+        metrics = run_benchmark(args.count, args.seed, args.depth, args.operators,
+                                args.res, args.mem, args.fold, args.evaluator_count, args.repeat)
+    except (ValueError, RuntimeError) as e:
+        print(f"Erro: {e}", file=sys.stderr)
+        return 2
+    text = json.dumps(metrics, indent=2, ensure_ascii=False)
+    if args.output:
+        with open(args.output, 'w') as f:
+            f.write(text + '\n')
+    print(text)
+
+    status = 0
+    if metrics['conformance']['mismatches']:
+        print(f"Erro: {metrics['conformance']['mismatches']} resultados diferentes entre a "
+              "calculadora e o código gerado.", file=sys.stderr)
+        status = 1
+    if args.baseline:
+        with open(args.baseline) as f:
+            regressions = compare_with_baseline(metrics, json.load(f), args.tolerance,
+                                                args.timing_tolerance)
+        for message in regressions:
+            print(f"Regressão: {message}", file=sys.stderr)
+        if regressions:
+            status = 1
+    return status
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -42,42 +42,50 @@ NC='\033[0m' # No Color
 
 echo -e "${YELLOW}Compilando $ASM_FILE para Arduino Uno...${NC}"
 
-# Verifique se as ferramentas necessárias estão instaladas
-if ! command -v avr-as &> /dev/null; then
-    echo -e "${RED}Erro: avr-as não encontrado. Por favor, instale o compilador AVR.${NC}"
-    echo "Em sistemas baseados em Debian/Ubuntu: sudo apt-get install gcc-avr binutils-avr avr-libc avrdude"
-    exit 1
-fi
+# Sem o avr-as/avr-objcopy, a imagem HEX é gerada pelo montador do simulador
+# (simulate_asm.py --assemble), que não depende de ferramentas externas
+if command -v avr-as &> /dev/null && command -v avr-objcopy &> /dev/null; then
+    # Passo 1: Montar o arquivo Assembly para um arquivo objeto
+    echo "Montando o arquivo ASM para arquivo objeto..."
+    avr-as -mmcu=atmega328p -o "$BASE_NAME.o" "$ASM_FILE"
 
-if ! command -v avr-objcopy &> /dev/null; then
-    echo -e "${RED}Erro: avr-objcopy não encontrado. Por favor, instale o compilador AVR.${NC}"
-    exit 1
-fi
+    if [ $? -ne 0 ]; then
+        echo -e "${RED}Erro ao montar o arquivo Assembly!${NC}"
+        exit 1
+    fi
+    echo -e "${GREEN}Montagem do arquivo ASM concluída com sucesso!${NC}"
 
-if ! command -v avrdude &> /dev/null; then
-    echo -e "${RED}Erro: avrdude não encontrado. Por favor, instale o AVRDUDE.${NC}"
-    exit 1
-fi
+    # Passo 2: Converter o arquivo objeto para um arquivo hexadecimal
+    echo "Convertendo para formato HEX..."
+    avr-objcopy -O ihex "$BASE_NAME.o" "$BASE_NAME.hex"
 
-# Passo 1: Montar o arquivo Assembly para um arquivo objeto
-echo "Montando o arquivo ASM para arquivo objeto..."
-avr-as -mmcu=atmega328p -o "$BASE_NAME.o" "$ASM_FILE"
+    if [ $? -ne 0 ]; then
+        echo -e "${RED}Erro ao converter para o formato HEX!${NC}"
+        exit 1
+    fi
+    echo -e "${GREEN}Conversão para formato HEX concluída com sucesso!${NC}"
+    GENERATED=" - $BASE_NAME.o (arquivo objeto)"
+else
+    echo -e "${YELLOW}avr-as não encontrado; usando o montador do simulador (simulate_asm.py).${NC}"
+    SCRIPT_DIR=$(dirname "$0")
+    python3 "$SCRIPT_DIR/simulate_asm.py" "$ASM_FILE" --trace off --assemble "$BASE_NAME.hex"
 
-if [ $? -ne 0 ]; then
-    echo -e "${RED}Erro ao montar o arquivo Assembly!${NC}"
-    exit 1
+    if [ $? -ne 0 ]; then
+        echo -e "${RED}Erro ao montar o arquivo Assembly!${NC}"
+        exit 1
+    fi
+    echo -e "${GREEN}Montagem do arquivo ASM concluída com sucesso!${NC}"
+    GENERATED=" - $BASE_NAME.sym (tabela de símbolos)"
 fi
-echo -e "${GREEN}Montagem do arquivo ASM concluída com sucesso!${NC}"
-
-# Passo 2: Converter o arquivo objeto para um arquivo hexadecimal
-echo "Convertendo para formato HEX..."
-avr-objcopy -O ihex "$BASE_NAME.o" "$BASE_NAME.hex"
 
-if [ $? -ne 0 ]; then
-    echo -e "${RED}Erro ao converter para o formato HEX!${NC}"
-    exit 1
+if ! command -v avrdude &> /dev/null; then
+    echo -e "${YELLOW}avrdude não encontrado: o código não será carregado no Arduino.${NC}"
+    echo "Em sistemas baseados em Debian/Ubuntu: sudo apt-get install avrdude"
+    echo -e "${GREEN}Compilação concluída! Arquivos gerados:${NC}"
+    echo "$GENERATED"
+    echo " - $BASE_NAME.hex (arquivo hexadecimal para o Arduino)"
+    exit 0
 fi
-echo -e "${GREEN}Conversão para formato HEX concluída com sucesso!${NC}"
 
 # Passo 3: Perguntar ao usuário se deseja carregar no Arduino
 echo -e "${YELLOW}Deseja carregar o código no Arduino conectado em $SERIAL_PORT? (s/n)${NC}"
@@ -99,5 +107,5 @@ else
 fi
 
 echo -e "${GREEN}Compilação concluída! Arquivos gerados:${NC}"
-echo " - $BASE_NAME.o (arquivo objeto)"
+echo "$GENERATED"
 echo " - $BASE_NAME.hex (arquivo hexadecimal para o Arduino)"
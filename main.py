@@ -9,407 +9,381 @@ Integrantes do grupo:
 - Matheus Conzatti De Souza
 
 Nome do grupo no Canvas: RA1 10
+
+Linha de comando. A calculadora fica em rpn_calculator.py, a geração de
+Assembly em avr_codegen.py e o simulador em simulate_asm.py; cada subcomando
+importa só os módulos de que precisa.
 """
 
 import sys
-import re
-import struct
-import math
 
-class RPNCalculator:
+# Subcomandos da linha de comando. Sem subcomando, os arquivos são avaliados e
+# o Assembly é gerado. Cada arquivo é lido uma única vez: a janela do histórico
+# cresce durante a avaliação (ver RPNCalculator.iter_file) e o Assembly é
+# gerado com os programas já compilados; só --resume lê de novo as linhas
+# anteriores ao checkpoint, para o Assembly
+COMMANDS = ('evaluate', 'compile', 'simulate', 'bench')
+
+
+def __getattr__(name):
     """
-    Implementa uma calculadora para avaliação de expressões na Notação Polonesa Reversa (RPN).
-    Suporta operações aritméticas básicas, comandos especiais de memória, e expressões aninhadas.
+    Compatibilidade com o código que importava a calculadora deste módulo
+    (from main import RPNCalculator): os nomes de rpn_calculator e
+    avr_codegen são carregados só quando usados.
     """
+    if not name.startswith('__'):
+        import rpn_calculator
+        if hasattr(rpn_calculator, name):
+            return getattr(rpn_calculator, name)
+        import avr_codegen
+        if hasattr(avr_codegen, name):
+            return getattr(avr_codegen, name)
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+
+
+def main(argv=None):
+    """
+    Função principal que coordena a execução do programa.
+    Encaminha os argumentos de linha de comando para o subcomando pedido (ver
+    COMMANDS); sem subcomando, avalia as expressões e gera o código Assembly
+    para Arduino.
     
-    def __init__(self):
-        """
-        Inicializa a calculadora RPN com valores padrão.
-        Configura a lista de resultados anteriores e a memória.
-        """
-        # Armazena resultados das expressões anteriores
-        self.results = []
-        # Memória para comando (V MEM)
-        self.memory = 0.0
-    
-    def to_half_precision(self, value):
-        """
-        Converte um número para formato de meia precisão (16 bits) conforme padrão IEEE754.
+    Parâmetros:
+        argv: Argumentos da linha de comando (padrão: sys.argv[1:])
         
-        Parâmetros:
-            value: Valor float a ser convertido
-            
-        Retorna:
-            Valor convertido para representação de meia precisão (16 bits)
-        """
-        # Se o valor for inteiro para divisão inteira e resto, não converte
-        if isinstance(value, int):
-            return value
-        
-        # Para valores reais, converte para half-precision (IEEE754)
-        try:
-            # Conversão para float32 e depois para float16
-            binary = struct.pack('!f', float(value))
-            float32 = struct.unpack('!f', binary)[0]
-            # Simulação da conversão para float16
-            # Na prática, isso é uma simplificação, pois Python não tem float16 nativo
-            # Um método mais preciso seria implementar a conversão conforme o padrão IEEE754
-            if float32 > 65504.0:  # Valor máximo para float16
-                return 65504.0
-            elif float32 < -65504.0:  # Valor mínimo para float16
-                return -65504.0
-            return float32
-        except:
-            return 0.0
+    Retorna:
+        Código de saída do programa
+    """
+    argv = sys.argv[1:] if argv is None else list(argv)
+    command = argv[0] if argv and argv[0] in COMMANDS else None
+    if command == 'simulate':
+        from simulate_asm import main as simulate
+        return simulate(argv[1:], prog="main.py simulate")
+    if command == 'bench':
+        from benchmark import main as bench
+        return bench(argv[1:], prog="main.py bench")
+    if command == 'compile':
+        return compile_files(argv[1:])
+    if command == 'evaluate':
+        return evaluate_files(argv[1:], prog="main.py evaluate", generate=False)
+    return evaluate_files(argv, prog="main.py", generate=True)
 
-    def evaluate_expression(self, expression):
-        """
-        Avalia uma expressão RPN e retorna o resultado final.
-        Suporta comandos especiais como (N RES), (V MEM) e (MEM).
-        
-        - Se você escrever (2 RES), ele vai buscar o resultado que calculou 2 linhas atrás
-        - Se você escrever (5 MEM), ele vai guardar o número 5 na memória da calculadora
-        - Se você escrever (MEM), ele vai pegar de volta o número que estava guardado na memória
-        
-        Parâmetros:
-            expression: String contendo a expressão RPN a ser avaliada
-            
-        Retorna:
-            Resultado da avaliação da expressão
-        """
-        try:
-            # Verifica se é o comando (N RES)
-            res_match = re.match(r'^\(\s*(\d+)\s+RES\s*\)$', expression.strip())
-            if res_match:
-                n = int(res_match.group(1))
-                if n < len(self.results):
-                    return self.results[-(n+1)]
-                else:
-                    raise ValueError(f"Erro: Não há {n} resultados anteriores.")
-            
-            # Verifica se é o comando (V MEM)
-            mem_store_match = re.match(r'^\(\s*([0-9.+-]+)\s+MEM\s*\)$', expression.strip())
-            if mem_store_match:
-                value = float(mem_store_match.group(1))
-                self.memory = self.to_half_precision(value)
-                return self.memory
-            
-            # Verifica se é o comando (MEM)
-            if re.match(r'^\(\s*MEM\s*\)$', expression.strip()):
-                return self.memory
-            
-            # Processamento normal da expressão RPN
-            return self.evaluate_tokens(self.tokenize_expression(expression))
-        except Exception as e:
-            print(f"Erro ao avaliar expressão '{expression}': {str(e)}")
-            return 0.0
+
+def assembly_filename(input_file, input_count):
+    """
+    Nome do arquivo Assembly gerado para um arquivo de entrada: com vários
+    arquivos, cada um gera o seu (<nome>.asm).
+    """
+    import os
+    if input_count == 1:
+        return "arduino_code.asm"
+    return os.path.splitext(os.path.basename(input_file))[0] + ".asm"
+
+
+def compile_files(argv):
+    """
+    Subcomando compile: gera o Assembly de cada arquivo sem avaliar as
+    expressões nem imprimir o relatório.
     
-    def evaluate_tokens(self, tokens):
-        """
-        Avalia uma lista de tokens em notação RPN e retorna o resultado.
-        Lida com a lógica de processamento de expressões, pilha de operandos,
-        e tratamento de sub-expressões aninhadas.
-        
-        Parâmetros:
-            tokens: Lista de tokens (operandos, operadores e parênteses)
-            
-        Retorna:
-            Resultado da avaliação dos tokens
-        """
-        # Pilha para armazenar os operandos durante a avaliação
-        stack = []
-        
-        # Índice para percorrer a lista de tokens
-        i = 0
-        while i < len(tokens):
-            token = tokens[i]
-            
-            if token == '(':
-                # CASO 1: INÍCIO DE SUB-EXPRESSÃO
-                # Quando encontramos um parêntese de abertura, precisamos localizar
-                # o parêntese de fechamento correspondente e processar o conteúdo entre eles
-                
-                # Contador para controlar o aninhamento de parênteses
-                j = i + 1
-                count = 1  # Começamos com 1 parêntese aberto
-                
-                # Busca o parêntese de fechamento correspondente
-                while j < len(tokens) and count > 0:
-                    if tokens[j] == '(':
-                        count += 1  # Encontrou outro parêntese de abertura, incrementa o contador
-                    elif tokens[j] == ')':
-                        count -= 1  # Encontrou um parêntese de fechamento, decrementa o contador
-                    j += 1
-                
-                # Verifica se os parênteses estão balanceados
-                if count != 0:
-                    raise ValueError("Erro: Parênteses não balanceados.")
-                
-                # Extrai a sub-expressão entre os parênteses (excluindo os parênteses)
-                subexpr = tokens[i+1:j-1]
-                
-                # PROCESSAMENTO DE COMANDOS ESPECIAIS E SUB-EXPRESSÕES
-                
-                if len(subexpr) == 2 and subexpr[1] == 'RES':
-                    # CASO 1.1: COMANDO (N RES)
-                    # Recupera o resultado de N linhas anteriores
-                    n = int(subexpr[0])
-                    if n < len(self.results):
-                        # Acessa o resultado N posições para trás no histórico (-1 para índice 0)
-                        stack.append(self.results[-(n+1)])
-                    else:
-                        raise ValueError(f"Erro: Não há {n} resultados anteriores.")
-                elif len(subexpr) == 2 and subexpr[1] == 'MEM':
-                    # CASO 1.2: COMANDO (V MEM)
-                    # Armazena um valor na memória
-                    value = float(subexpr[0])
-                    # Converte para meia precisão antes de armazenar
-                    self.memory = self.to_half_precision(value)
-                    # Empilha o valor armazenado para continuar o cálculo
-                    stack.append(self.memory)
-                elif len(subexpr) == 1 and subexpr[0] == 'MEM':
-                    # CASO 1.3: COMANDO (MEM)
-                    # Recupera o valor armazenado na memória
-                    stack.append(self.memory)
-                else:
-                    # CASO 1.4: SUB-EXPRESSÃO NORMAL
-                    # Avalia recursivamente a sub-expressão e empilha o resultado
-                    result = self.evaluate_tokens(subexpr)
-                    stack.append(result)
-                
-                # Avança o índice para depois do parêntese de fechamento
-                i = j
-            elif token == ')':
-                # CASO 2: FIM DE SUB-EXPRESSÃO
-                # Parênteses de fechamento são tratados implicitamente no 'CASO 1'
-                i += 1
-            elif token in ['+', '-', '*', '|', '/', '%', '^']:
-                # CASO 3: OPERADORES
-                # Todos os operadores requerem exatamente dois operandos
-                if len(stack) < 2:
-                    raise ValueError(f"Erro: Operador {token} requer dois operandos.")
-                
-                # Remove os dois operandos do topo da pilha (ordem é importante!)
-                b = stack.pop()  # Segundo operando (topo da pilha)
-                a = stack.pop()  # Primeiro operando (abaixo do topo)
-                
-                # Aplica o operador aos operandos e empilha o resultado
-                result = self.operate(a, b, token)
-                stack.append(result)
-                i += 1
-            else:
-                # CASO 4: OPERANDOS (NÚMEROS)
-                # Tenta converter o token para um número de ponto flutuante
-                try:
-                    num = float(token)
-                    # Converte para meia precisão antes de empilhar
-                    stack.append(self.to_half_precision(num))
-                except ValueError:
-                    # Se não for possível converter para float, o token é inválido
-                    raise ValueError(f"Token inválido: {token}")
-                i += 1
+    Parâmetros:
+        argv: Argumentos do subcomando
         
-        # VALIDAÇÃO FINAL
-        # Ao final da avaliação, a pilha deve conter exatamente um valor (o resultado final)
-        if len(stack) != 1:
-            raise ValueError("Erro: Expressão inválida ou incompleta.")
-        
-        # Retorna o único valor na pilha, que é o resultado da expressão
-        return stack[0]
+    Retorna:
+        Código de saída (1 se algum arquivo faltou ou não pôde ser compilado)
+    """
+    import argparse
+    import os
     
-    def tokenize_expression(self, expression):
-        """
-        Converte uma string de expressão RPN em uma lista de tokens.
-        Separa parênteses, operadores e operandos para processamento.
-        
-        Parâmetros:
-            expression: String contendo a expressão RPN
-            
-        Retorna:
-            Lista de tokens extraídos da expressão
-        """
-        # Substitui ( e ) por " ( " e " ) " para facilitar o split
-        expression = expression.replace('(', ' ( ').replace(')', ' ) ')
-        # Remove espaços extras e divide os tokens
-        tokens = [token for token in expression.split() if token]
-        return tokens
+    parser = argparse.ArgumentParser(
+        prog="main.py compile",
+        description="Gera o Assembly para Arduino de arquivos de expressões RPN, sem avaliá-las.")
+    parser.add_argument("input_files", metavar="arquivo_de_entrada", nargs="+",
+                        help="arquivo com uma expressão RPN por linha")
+    parser.add_argument("-o", "--output", metavar="ARQUIVO.asm",
+                        help="arquivo Assembly gerado, com um único arquivo de entrada "
+                             "(padrão: arduino_code.asm, ou <nome>.asm para cada arquivo)")
+    args = parser.parse_args(argv)
+    if args.output and len(args.input_files) != 1:
+        print("Erro: -o aceita um único arquivo de entrada.")
+        return 1
     
-    def operate(self, a, b, operator):
-        """
-        Realiza a operação especificada entre dois operandos.
-        Suporta +, -, *, |, /, %, ^ com tratamento adequado para cada tipo.
+    from rpn_calculator import RPNCalculator
+    status = 0
+    for input_file in args.input_files:
+        if not os.path.isfile(input_file):
+            print(f"Erro: Arquivo '{input_file}' não encontrado.")
+            status = 1
+            continue
+        output = args.output or assembly_filename(input_file, len(args.input_files))
+        if not RPNCalculator().generate_arduino_assembly(input_file, output):
+            status = 1
+    return status
+
+
+def evaluate_files(argv, prog="main.py", generate=True):
+    """
+    Avalia os arquivos de expressões (subcomando evaluate) e, com generate,
+    gera também o Assembly de cada um a partir das linhas já lidas na
+    avaliação.
+    
+    Parâmetros:
+        argv: Argumentos do subcomando
+        prog: Nome do programa nas mensagens de ajuda
+        generate: Se verdadeiro, gera o Assembly de cada arquivo
         
-        Parâmetros:
-            a: Primeiro operando
-            b: Segundo operando
-            operator: Operador a ser aplicado
-            
-        Retorna:
-            Resultado da operação entre a e b
-        """
-        if operator == '+':
-            return self.to_half_precision(a + b)
-        elif operator == '-':
-            return self.to_half_precision(a - b)
-        elif operator == '*':
-            return self.to_half_precision(a * b)
-        elif operator == '|':
-            if b == 0:
-                raise ValueError("Erro: Divisão por zero.")
-            return self.to_half_precision(a / b)  # Divisão real
-        elif operator == '/':
-            if b == 0:
-                raise ValueError("Erro: Divisão por zero.")
-            return int(a) // int(b)  # Divisão de inteiros
-        elif operator == '%':
-            if b == 0:
-                raise ValueError("Erro: Divisão por zero.")
-            return int(a) % int(b)  # Resto da divisão de inteiros
-        elif operator == '^':
-            if not float(b).is_integer() or b < 0:
-                raise ValueError("Erro: Expoente deve ser um inteiro positivo.")
-            return self.to_half_precision(a ** b)  # Potenciação
+    Retorna:
+        Código de saída do programa
+    """
+    import argparse
+    import os
+    from rpn_calculator import (
+        CHECKPOINT_INTERVAL, REPORT_FORMATS, RESULT_CACHE_DIR, RESULT_CACHE_MAX_BYTES,
+        CalculatorStats, ErrorSummary, IncrementalEvaluator, ParallelEvaluator, ResultCache,
+        RPNCalculator, open_report,
+    )
+    
+    if generate:
+        description = ("Calculadora RPN: avalia arquivos de expressões e gera Assembly para Arduino. "
+                       "Subcomandos: evaluate (só avalia), compile (só gera o Assembly), "
+                       "simulate (simulate_asm.py) e bench (benchmark.py).")
+    else:
+        description = "Avalia arquivos de expressões RPN, sem gerar o Assembly."
+    parser = argparse.ArgumentParser(prog=prog, description=description)
+    parser.add_argument("input_files", metavar="arquivo_de_entrada", nargs="+",
+                        help="arquivo com uma expressão RPN por linha")
+    parser.add_argument("--quiet", action="store_true",
+                        help="não imprime o relatório de cada linha")
+    parser.add_argument("-j", "--jobs", type=int, default=1,
+                        help="quantidade de processos; com um único arquivo, ele é dividido "
+                             "em trechos independentes (padrão: 1)")
+    parser.add_argument("--stats", nargs="?", const="-", metavar="ARQUIVO.json",
+                        help="coleta estatísticas da avaliação (tempos por fase, operadores, "
+                             "aninhamento, caches, erros); sem arquivo, imprime o relatório")
+    parser.add_argument("--incremental", metavar="ESTADO",
+                        help="reavalia só as linhas alteradas desde a execução que gravou o "
+                             "arquivo de estado (e as que dependem delas); aceita um único arquivo")
+    parser.add_argument("--cache", nargs="?", const=RESULT_CACHE_DIR, metavar="DIRETÓRIO",
+                        help="reaproveita resultados de execuções anteriores guardados em um "
+                             f"cache persistente (padrão: {RESULT_CACHE_DIR}); sem -j")
+    parser.add_argument("--cache-size", type=int, default=RESULT_CACHE_MAX_BYTES // (1024 * 1024),
+                        metavar="MB", help="tamanho máximo do cache persistente (padrão: %(default)s MB)")
+    parser.add_argument("--state", metavar="ARQUIVO",
+                        help="carrega o histórico de resultados e a memória deste arquivo (se existir) "
+                             "e os grava ao final; sem -j")
+    parser.add_argument("--fail-fast", action="store_true",
+                        help="para na primeira linha com erro (código de saída 1)")
+    parser.add_argument("--format", choices=REPORT_FORMATS, default="text",
+                        help="formato do relatório: texto ou binário com um registro de tamanho fixo "
+                             "por linha, legível com numpy.memmap (padrão: %(default)s)")
+    parser.add_argument("-o", "--output", metavar="ARQUIVO",
+                        help="grava o relatório neste arquivo em vez da saída padrão; no formato "
+                             "binário, o padrão é <nome>.bin para cada arquivo de entrada")
+    parser.add_argument("--checkpoint", metavar="ARQUIVO",
+                        help="grava periodicamente o estado da avaliação (histórico, memória e "
+                             "posição no arquivo) para retomá-la com --resume; aceita um único "
+                             "arquivo, sem -j nem --incremental")
+    parser.add_argument("--checkpoint-interval", type=int, default=CHECKPOINT_INTERVAL, metavar="N",
+                        help="linhas entre dois checkpoints (padrão: %(default)s)")
+    parser.add_argument("--resume", action="store_true",
+                        help="continua a avaliação do último checkpoint, se houver um válido "
+                             "para o arquivo de entrada")
+    args = parser.parse_args(argv)
+    stats = CalculatorStats() if args.stats else None
+    summary = ErrorSummary()
+    
+    # Arquivo de entrada inexistente: os demais são avaliados, com status de saída 1
+    status = 0
+    input_files = []
+    for input_file in args.input_files:
+        if os.path.isfile(input_file):
+            input_files.append(input_file)
         else:
-            raise ValueError(f"Operador desconhecido: {operator}")
+            print(f"Erro: Arquivo '{input_file}' não encontrado.")
+            status = 1
     
-    def process_file(self, filename):
-        """
-        Processa um arquivo contendo expressões RPN (uma por linha).
-        Avalia cada expressão e armazena o resultado.
-        
-        Parâmetros:
-            filename: Caminho do arquivo a ser processado
-            
-        Retorna:
-            Lista com os resultados de cada expressão no arquivo
-        """
-        try:
-            with open(filename, 'r') as file: lines = file.readlines()
-            
-            results = []
-            for i, line in enumerate(lines):
-                line = line.strip()
-                if line:
-                    print(f"Linha {i+1}: {line}")
-                    result = self.evaluate_expression(line)
-                    self.results.append(result)
-                    results.append(result)
-                    print(f"Resultado: {result}")
-                    print()
-            
-            return results
-        except FileNotFoundError:
-            print(f"Erro: Arquivo '{filename}' não encontrado.")
-            return []
-        except Exception as e:
-            print(f"Erro ao processar arquivo: {str(e)}")
-            return []
+    if args.checkpoint and (len(input_files) != 1 or args.jobs > 1 or args.incremental):
+        print("Erro: --checkpoint aceita um único arquivo de entrada, sem -j nem --incremental.")
+        return 1
+    # Ao retomar, o relatório existente é mantido até a posição do checkpoint
+    resuming = bool(args.checkpoint and args.resume and os.path.exists(args.checkpoint))
+    written = set()
     
-    def generate_arduino_assembly(self, filename, output_filename="arduino_code.asm"):
-        """
-        Gera código Assembly para Arduino a partir do arquivo de expressões RPN.
-        Cria um esqueleto básico do código Assembly que implementa as operações.
-        
-        Parâmetros:
-            filename: Caminho do arquivo de entrada com expressões RPN
-            output_filename: Caminho do arquivo de saída para o código Assembly
-            
-        Retorna:
-            Booleano indicando sucesso ou falha na geração do código
-        """
-        try:
-            with open(filename, 'r') as file:
-                lines = file.readlines()
-            
-            assembly_code = []
-            assembly_code.append("; Código Assembly gerado para Arduino UNO")
-            assembly_code.append("; Este código implementa as expressões RPN do arquivo de entrada")
-            assembly_code.append("")
-            assembly_code.append(".include \"m328pdef.inc\"")
-            assembly_code.append("")
-            assembly_code.append("; Inicialização")
-            assembly_code.append("setup:")
-            assembly_code.append("    ; Configuração inicial do Arduino")
-            assembly_code.append("    ; Seria implementado o código para inicializar registradores, etc.")
-            assembly_code.append("")
-            
-            # Espaço para memória
-            assembly_code.append("; Memória para comando (MEM)")
-            assembly_code.append("    .dseg")
-            assembly_code.append("memory: .byte 2    ; 2 bytes para half-precision float")
-            assembly_code.append("results: .byte 20   ; Espaço para armazenar 10 resultados (2 bytes cada)")
-            assembly_code.append("    .cseg")
-            assembly_code.append("")
-            
-            # Loop principal para implementar as expressões
-            assembly_code.append("main:")
-            assembly_code.append("    ; Código principal")
+    def report_output(input_file):
+        # Arquivo do relatório de um arquivo de entrada (None com --quiet)
+        import contextlib
+        if args.format == 'binary':
+            if args.output and len(args.input_files) == 1:
+                filename = args.output
+            else:
+                filename = os.path.splitext(os.path.basename(input_file))[0] + ".bin"
+            return open(filename, 'r+b' if resuming and os.path.exists(filename) else 'wb')
+        if args.output:
+            # Com vários arquivos de entrada, os relatórios são concatenados
+            mode = 'a' if args.output in written else 'w'
+            if resuming and os.path.exists(args.output):
+                mode = 'r+'
+            written.add(args.output)
+            return open(args.output, mode)
+        return contextlib.nullcontext(None if args.quiet else sys.stdout)
+    
+    if args.incremental:
+        if len(input_files) != 1:
+            print("Erro: --incremental aceita um único arquivo de entrada.")
+            return 1
+        input_file = input_files[0]
+        evaluator = IncrementalEvaluator()
+        if not evaluator.load(args.incremental) and os.path.exists(args.incremental):
+            print(f"Aviso: estado '{args.incremental}' inválido ou de outra versão; "
+                  "avaliando o arquivo inteiro.")
+        if stats is not None:
+            evaluator.calculator.enable_stats()
+        print(f"Processando arquivo: {input_file}")
+        count = evaluator.evaluate_file(input_file)
+        generator = evaluator.calculator.code_generator() if generate else None
+        programs = evaluator.calculator.programs
+        with report_output(input_file) as output:
+            report = open_report(output, args.format) if output is not None else None
+            for line_no, line, result, error in evaluator.records():
+                if report is not None:
+                    report.write(line_no, line, result, error)
+                if generator is not None:
+                    generator.add_line(line_no, line, programs.get(line))
+                if error is not None:
+                    summary.add(line_no, line, error)
+                    if args.fail_fast:
+                        break
+            if report is not None:
+                report.flush()
+        print(f"Expressões reavaliadas: {count} de {len(evaluator.expressions)}")
+        evaluator.save(args.incremental)
+        if stats is not None:
+            stats.merge(evaluator.calculator.disable_stats())
+        write_errors(summary)
+        if args.fail_fast and summary.errors:
+            return 1
+        if generate:
+            evaluator.calculator.generate_arduino_assembly(
+                input_file, assembly_filename(input_file, len(args.input_files)), generator=generator)
+        write_stats(stats, args.stats)
+        return status
+    
+    if args.jobs <= 1:
+        cache = ResultCache(args.cache, args.cache_size * 1024 * 1024) if args.cache else None
+        for input_file in input_files:
+            # Cria uma instância da calculadora para cada arquivo
+            calculator = RPNCalculator()
+            calculator.result_cache = cache
+            if args.state and os.path.exists(args.state) and not calculator.load_state(args.state):
+                print(f"Aviso: estado '{args.state}' inválido ou de outra versão; ignorado.")
+            if stats is not None:
+                calculator.enable_stats()
             
-            # Implementação das expressões
-            for i, line in enumerate(lines):
-                line = line.strip()
-                if not line:
-                    continue
-                
-                assembly_code.append(f"    ; Expressão da linha {i+1}: {line}")
-                assembly_code.append(f"expression_{i+1}:")
-                
-                # Implementação básica para gerar código assembly
-                # Na prática, este seria um compilador mais complexo
-                if "+" in line:
-                    assembly_code.append("    ; Operação de adição")
-                    assembly_code.append("    ld r16, X+    ; Carrega primeiro operando")
-                    assembly_code.append("    ld r17, X+    ; Carrega segundo operando")
-                    assembly_code.append("    add r16, r17  ; Soma")
-                    assembly_code.append("    st X+, r16    ; Armazena resultado")
-                elif "-" in line:
-                    assembly_code.append("    ; Operação de subtração")
-                    assembly_code.append("    ld r16, X+    ; Carrega primeiro operando")
-                    assembly_code.append("    ld r17, X+    ; Carrega segundo operando")
-                    assembly_code.append("    sub r16, r17  ; Subtrai")
-                    assembly_code.append("    st X+, r16    ; Armazena resultado")
-                # Outras operações seriam implementadas de forma similar
-                
-            # Fim do programa
-            assembly_code.append("")
-            assembly_code.append("end:")
-            assembly_code.append("    rjmp end    ; Loop infinito")
+            # O Assembly é gerado com as linhas lidas na avaliação; ao retomar um
+            # checkpoint, as linhas anteriores a ele não são lidas, e o arquivo
+            # é lido de novo para o Assembly
+            generator = calculator.code_generator() if generate and not resuming else None
             
-            # Escreve o código assembly no arquivo de saída
-            with open(output_filename, 'w') as out_file:
-                out_file.write('\n'.join(assembly_code))
+            # Processa o arquivo de entrada em modo streaming (memória constante)
+            print(f"Processando arquivo: {input_file}")
+            try:
+                with report_output(input_file) as output:
+                    calculator.stream_file(input_file, output=output, full_history=bool(args.state),
+                                           fail_fast=args.fail_fast, report_format=args.format,
+                                           checkpoint=args.checkpoint,
+                                           checkpoint_interval=args.checkpoint_interval,
+                                           resume=args.resume, generator=generator)
+            except OSError as e:
+                # Relatório que não pôde ser aberto ou fechado
+                if calculator.file_error is None:
+                    calculator.file_error = f"Erro ao escrever o relatório: {str(e)}"
+                    print(calculator.file_error)
+            summary.merge(calculator.error_summary)
+            if stats is not None:
+                stats.merge(calculator.disable_stats())
+            # Falha ao ler o arquivo ou ao escrever o relatório: status de saída 1
+            if calculator.file_error is not None or (args.fail_fast and summary.errors):
+                write_errors(summary)
+                if cache is not None:
+                    cache.close()
+                return 1
+            if args.state:
+                calculator.save_state(args.state)
             
-            print(f"Código Assembly gerado e salvo em '{output_filename}'.")
-            return True
-        except Exception as e:
-            print(f"Erro ao gerar código Assembly: {str(e)}")
-            return False
-
-
-def main():
-    """
-    Função principal que coordena a execução do programa.
-    Processa o arquivo de entrada especificado como argumento de linha de comando,
-    avalia as expressões e gera o código Assembly para Arduino.
-    """
-    # Verifica se foi fornecido um arquivo de entrada
-    if len(sys.argv) < 2:
-        print("Uso: python3 main.py <arquivo_de_entrada>")
-        sys.exit(1)
+            # Gera o código assembly para Arduino
+            if generate:
+                calculator.generate_arduino_assembly(
+                    input_file, assembly_filename(input_file, len(args.input_files)), generator=generator)
+        if cache is not None:
+            print(f"Cache de resultados: {cache.hits} trechos reaproveitados, {cache.misses} avaliados")
+            cache.close()
+        write_errors(summary)
+        write_stats(stats, args.stats)
+        return status
     
-    # Nome do arquivo de entrada
-    input_file = sys.argv[1]
+    if args.cache or args.state:
+        print("Aviso: --cache e --state são ignorados com -j.")
     
-    # Cria uma instância da calculadora
-    calculator = RPNCalculator()
+    # Avaliação paralela: vários arquivos ao mesmo tempo, ou trechos de um único arquivo
+    evaluator = ParallelEvaluator(jobs=args.jobs, collect_stats=stats is not None)
+    shards = args.jobs if len(input_files) == 1 else 1
+    failed = False
+    generators = {}
+    for input_file, records in evaluator.evaluate(input_files, shards):
+        print(f"Processando arquivo: {input_file}")
+        generator = generators[input_file] = RPNCalculator().code_generator() if generate else None
+        with report_output(input_file) as output:
+            report = open_report(output, args.format) if output is not None else None
+            for line_no, line, result, error in records:
+                if report is not None:
+                    report.write(line_no, line, result, error)
+                if generator is not None:
+                    generator.add_line(line_no, line)
+                if error is not None:
+                    summary.add(line_no, line, error)
+                    failed = args.fail_fast
+                    if failed:
+                        break
+            if report is not None:
+                report.flush()
+        if failed:
+            break
+    write_errors(summary)
+    if failed:
+        return 1
     
-    # Processa o arquivo de entrada
-    print(f"Processando arquivo: {input_file}")
-    calculator.process_file(input_file)
+    if generate:
+        for input_file in input_files:
+            RPNCalculator().generate_arduino_assembly(
+                input_file, assembly_filename(input_file, len(args.input_files)),
+                generator=generators.get(input_file))
+    write_stats(evaluator.stats, args.stats)
+    return status
+
+
+def write_errors(summary):
+    """Imprime o resumo de erros, se houve algum."""
+    if summary.errors:
+        print(summary.format_report())
+
+
+def write_stats(stats, destination):
+    """
+    Imprime o relatório de estatísticas ou o grava em JSON.
     
-    # Gera o código assembly para Arduino
-    calculator.generate_arduino_assembly(input_file)
+    Parâmetros:
+        stats: CalculatorStats (None se as estatísticas não foram pedidas)
+        destination: '-' para imprimir o relatório, ou o caminho do arquivo JSON
+    """
+    if stats is None:
+        return
+    if destination == "-":
+        print(stats.format_report())
+        return
+    import json
+    with open(destination, 'w') as file:
+        json.dump(stats.report(), file, indent=2, ensure_ascii=False)
+    print(f"Estatísticas salvas em '{destination}'.")
 
 
 if __name__ == "__main__":
-    main()
\ No newline at end of file
+    sys.exit(main())
@@ -0,0 +1,3225 @@
+"""
+Trabalho de Compiladores - Calculadora RPN
+Fase 1: Implementação de uma calculadora de expressões aritméticas em notação RPN
+
+Avaliação das expressões: RPNCalculator, histórico de resultados, relatórios,
+caches e avaliação paralela e incremental. A linha de comando fica em main.py
+e a geração de Assembly AVR, em avr_codegen.py (carregado só quando o Assembly
+é pedido).
+"""
+
+import sys
+import struct
+import math
+import time
+import heapq
+from array import array
+from collections import OrderedDict
+from itertools import islice
+from operator import length_hint
+
+
+# Códigos de operação do programa compilado (ver RPNCalculator.compile_tokens).
+# Os operadores binários ocupam a faixa OP_ADD..OP_POW.
+OP_PUSH = 0
+OP_ADD = 1
+OP_SUB = 2
+OP_MUL = 3
+OP_REAL_DIV = 4
+OP_INT_DIV = 5
+OP_MOD = 6
+OP_POW = 7
+OP_RES = 8
+OP_MEM_STORE = 9
+OP_MEM_LOAD = 10
+OP_RAISE = 11
+OP_VAR = 12
+OP_GROUP = 13
+OP_GROUP_END = 14
+# Eliminação de sub-expressões comuns (ver ExpressionOptimizer)
+OP_TEMP_STORE = 15
+OP_TEMP_LOAD = 16
+
+# Mapeamento entre o símbolo de cada operador e seu código de operação
+OPERATOR_CODES = {
+    '+': OP_ADD,
+    '-': OP_SUB,
+    '*': OP_MUL,
+    '|': OP_REAL_DIV,
+    '/': OP_INT_DIV,
+    '%': OP_MOD,
+    '^': OP_POW,
+}
+
+# Tipos dos tokens produzidos por scan_expression
+TOKEN_NUMBER = 0
+TOKEN_OPERATOR = 1
+TOKEN_LPAREN = 2
+TOKEN_RPAREN = 3
+TOKEN_RES = 4
+TOKEN_MEM = 5
+# Qualquer outra palavra: nome de variável ou token inválido
+TOKEN_NAME = 6
+
+# Tipo e valor dos tokens com texto fixo (operadores e comandos RES e MEM)
+_KEYWORD_TOKENS = {symbol: (TOKEN_OPERATOR, code) for symbol, code in OPERATOR_CODES.items()}
+_KEYWORD_TOKENS['RES'] = (TOKEN_RES, None)
+_KEYWORD_TOKENS['MEM'] = (TOKEN_MEM, None)
+
+# Caracteres que separam os tokens no scan_expression: parênteses e os mesmos
+# espaços de str.split() (TOKEN_SPACE não gera token)
+TOKEN_SPACE = -1
+_SEPARATORS = dict.fromkeys('\t\n\x0b\x0c\r\x1c\x1d\x1e\x1f \x85\xa0\u1680\u2000\u2001\u2002'
+                            '\u2003\u2004\u2005\u2006\u2007\u2008\u2009\u200a\u2028\u2029'
+                            '\u202f\u205f\u3000', TOKEN_SPACE)
+_SEPARATORS['('] = TOKEN_LPAREN
+_SEPARATORS[')'] = TOKEN_RPAREN
+
+# Códigos de erro das expressões (ver ErrorValue); 0 indica que não houve erro
+ERROR_NONE = 0
+ERROR_SYNTAX = 1
+ERROR_PARENTHESES = 2
+ERROR_OPERANDS = 3
+ERROR_TOKEN = 4
+ERROR_DIVISION_BY_ZERO = 5
+ERROR_EXPONENT = 6
+ERROR_MISSING_RESULT = 7
+# (N RES) leu o resultado de uma linha que falhou
+ERROR_PROPAGATED = 8
+# Demais falhas, como converter infinito ou NaN para inteiro
+ERROR_INVALID = 9
+
+# Descrição de cada código de erro no resumo de erros
+ERROR_NAMES = {
+    ERROR_SYNTAX: 'expressão inválida ou incompleta',
+    ERROR_PARENTHESES: 'parênteses não balanceados',
+    ERROR_OPERANDS: 'operador sem dois operandos',
+    ERROR_TOKEN: 'token inválido',
+    ERROR_DIVISION_BY_ZERO: 'divisão por zero',
+    ERROR_EXPONENT: 'expoente inválido',
+    ERROR_MISSING_RESULT: 'resultado anterior inexistente',
+    ERROR_PROPAGATED: 'resultado anterior com erro',
+    ERROR_INVALID: 'operação inválida',
+}
+
+# Quantidade de ocorrências mostradas para cada código no resumo de erros
+ERROR_SUMMARY_EXAMPLES = 3
+
+# Quantidade máxima de literais numéricos já convertidos mantidos por calculadora
+LITERAL_TABLE_SIZE = 65536
+
+# Quantidade máxima de expressões compiladas mantidas em cache
+PROGRAM_CACHE_SIZE = 4096
+
+# Quantidade de linhas do relatório acumuladas antes de cada escrita
+REPORT_BLOCK_SIZE = 1024
+
+# Relatório binário (BinaryReportWriter): cabeçalho com assinatura, versão e
+# tamanho do registro, seguido de um registro de tamanho fixo por linha
+# avaliada (número da linha, valor, tipo, código de erro). O valor é o padrão
+# binary16 do resultado real (nos 16 bits baixos) ou o inteiro de / e %.
+REPORT_FORMATS = ('text', 'binary')
+BINARY_REPORT_MAGIC = b'RPNR'
+BINARY_REPORT_VERSION = 1
+BINARY_REPORT_HEADER = struct.Struct('<4sHH8x')
+BINARY_REPORT_RECORD = struct.Struct('<IiBB2x')
+BINARY_REPORT_BLOCK_SIZE = 65536
+
+# Tipos do valor de cada registro do relatório binário
+RESULT_TYPE_FLOAT = 0
+RESULT_TYPE_INT = 1
+RESULT_TYPE_ERROR = 2
+# Inteiro fora da faixa de int32 (por exemplo, produtos de resultados de /):
+# o campo value guarda apenas o sinal (1 ou -1)
+RESULT_TYPE_LARGE_INT = 3
+
+# Quantidade máxima de valores de sub-expressões mantidos em cache
+SUBEXPRESSION_CACHE_SIZE = 4096
+
+# Tamanho inicial da janela do histórico em iter_file/stream_file; ela cresce
+# quando uma linha usa um (N RES) com N maior que a janela
+STREAM_HISTORY_SIZE = 65536
+
+# Resultados alocados de início em um ResultHistory com janela; o buffer dobra
+# de tamanho conforme os resultados chegam, até o tamanho da janela
+HISTORY_INITIAL_SIZE = 1024
+
+# Quantidade máxima de formatos de sub-expressão com identificador interno
+GROUP_ID_TABLE_SIZE = 65536
+
+# Estatísticas (CalculatorStats): faixas do histograma de latência, em
+# microssegundos (a faixa i conta as expressões abaixo de 2**i µs; a última,
+# as demais), e quantidade de expressões mais lentas guardadas no relatório
+LATENCY_BUCKETS = 18
+STATS_SLOWEST_COUNT = 10
+
+# Fases medidas pela instrumentação da calculadora
+STATS_PHASES = ('tokenize', 'compile', 'execute')
+
+# Versão do arquivo de estado da reavaliação incremental (IncrementalEvaluator);
+# estados de outra versão são descartados
+INCREMENTAL_STATE_VERSION = 3
+
+# Versão do arquivo de estado da calculadora (RPNCalculator.save_state)
+CALCULATOR_STATE_VERSION = 1
+
+# Checkpoints de process_file/stream_file (RPNCalculator.save_checkpoint):
+# versão do formato e quantidade padrão de linhas entre dois checkpoints
+CHECKPOINT_VERSION = 1
+CHECKPOINT_INTERVAL = 1_000_000
+
+# Máximo de linhas inseridas ou removidas que a reavaliação incremental casa
+# com a versão anterior (ver IncrementalEvaluator.match_lines)
+INCREMENTAL_MAX_EDITS = 1000
+
+# Cache persistente de resultados (ResultCache): diretório padrão, tamanho
+# máximo do banco em bytes e quantidade de linhas de cada trecho guardado.
+# RESULT_CACHE_VERSION deve ser incrementada quando a semântica da
+# calculadora mudar fora dos métodos cobertos por calculator_fingerprint.
+RESULT_CACHE_DIR = '.rpn_cache'
+RESULT_CACHE_MAX_BYTES = 256 * 1024 * 1024
+RESULT_CACHE_CHUNK_LINES = 4096
+RESULT_CACHE_VERSION = 2
+
+# Marcador de ausência no cache de sub-expressões
+_MISSING = object()
+
+# Formato IEEE 754 binary16 (meia precisão). O formato 'e' do módulo struct
+# arredonda para o mais próximo (empates para o par) e trata subnormais,
+# infinitos e NaN; OverflowError indica valores que arredondam para infinito.
+HALF_FORMAT = struct.Struct('<e')
+HALF_BITS_FORMAT = struct.Struct('<H')
+
+_half_pack = HALF_FORMAT.pack
+_half_round_trip = HALF_FORMAT.unpack
+
+# Valor de cada um dos 65536 padrões de 16 bits (decodificação por tabela)
+HALF_DECODE_TABLE = struct.unpack('<65536e', struct.pack('<65536H', *range(65536)))
+
+
+def encode_half(value):
+    """
+    Codifica um número real no padrão de 16 bits IEEE 754 binary16.
+    
+    Parâmetros:
+        value: Valor a ser codificado (float ou int)
+        
+    Retorna:
+        Inteiro de 0 a 65535 com os bits do valor em meia precisão
+    """
+    try:
+        return HALF_BITS_FORMAT.unpack(HALF_FORMAT.pack(float(value)))[0]
+    except OverflowError:
+        # Magnitude acima do maior valor representável: vira infinito
+        return 0xFC00 if value < 0 else 0x7C00
+
+
+def decode_half(bits):
+    """
+    Decodifica um padrão de 16 bits IEEE 754 binary16.
+    
+    Parâmetros:
+        bits: Inteiro de 0 a 65535
+        
+    Retorna:
+        Valor real correspondente
+    """
+    return HALF_DECODE_TABLE[bits]
+
+
+class ErrorValue(float):
+    """
+    Resultado de uma expressão que falhou. Como um NaN, não é igual a nenhum
+    valor, mas carrega o código do erro (ERROR_*), a mensagem e a posição no
+    texto da expressão onde o erro foi detectado.
+
+    Fica no histórico no lugar do resultado: um (N RES) que o lê também falha,
+    com ERROR_PROPAGATED, em vez de usar um valor inventado.
+    """
+
+    __slots__ = ('code', 'message', 'position', 'instruction')
+
+    def __new__(cls, code, message, position=None, instruction=None):
+        """
+        Parâmetros:
+            code: Código do erro (ERROR_*)
+            message: Mensagem de erro
+            position: Posição (em caracteres) do token onde o erro foi detectado,
+                      ou None se desconhecida
+            instruction: Índice da instrução do programa que falhou (ou None)
+        """
+        self = float.__new__(cls, math.nan)
+        self.code = code
+        self.message = message
+        self.position = position
+        self.instruction = instruction
+        return self
+
+    def __getnewargs__(self):
+        return self.code, self.message, self.position, self.instruction
+
+    def __str__(self):
+        return self.message
+
+    def __repr__(self):
+        return f"ErrorValue({self.code}, {self.message!r}, {self.position})"
+
+
+def _value_key(value):
+    """Chave que distingue 1 de 1.0, 0.0 de -0.0 e compara NaN pelo padrão de bits"""
+    if value.__class__ is ErrorValue:
+        return ('erro', value.code, value.message)
+    return value.hex() if isinstance(value, float) else value
+
+
+def scan_expression(source):
+    """
+    Analisa uma expressão RPN em uma única passada, produzindo tokens tipados
+    com a posição de cada um no texto (usada nas mensagens de erro).
+    Parênteses e espaços separam os tokens, como em "(3.14 2.0 +)".
+    
+    Parâmetros:
+        source: Texto da expressão
+        
+    Retorna:
+        Lista de tuplas (tipo, valor, posição, texto), onde tipo é uma das
+        constantes TOKEN_* e valor é o float lido (TOKEN_NUMBER), o código
+        de operação (TOKEN_OPERATOR) ou None
+    """
+    tokens = []
+    append = tokens.append
+    keywords = _KEYWORD_TOKENS
+    separators = _SEPARATORS
+    start = -1
+    for position, char in enumerate(source):
+        kind = separators.get(char)
+        if kind is None:
+            # Caractere de uma palavra
+            if start < 0:
+                start = position
+            continue
+        if start >= 0:
+            _append_word(append, keywords, source[start:position], start)
+            start = -1
+        if kind != TOKEN_SPACE:
+            append((kind, None, position, char))
+    if start >= 0:
+        _append_word(append, keywords, source[start:], start)
+    return tokens
+
+
+def _append_word(append, keywords, text, position):
+    """Acrescenta o token de uma palavra: operador, RES, MEM, número ou nome."""
+    keyword = keywords.get(text)
+    if keyword is not None:
+        append((keyword[0], keyword[1], position, text))
+        return
+    try:
+        append((TOKEN_NUMBER, float(text), position, text))
+    except ValueError:
+        append((TOKEN_NAME, None, position, text))
+
+
+class ResultHistory:
+    """
+    Histórico compacto de resultados, usado como self.results da calculadora.
+    
+    Cada resultado ocupa 2 bytes em um array de uint16, mais um bit em um mapa
+    de marcas: reais guardam os bits em meia precisão (binary16) e inteiros de
+    / e % (marcados no mapa) guardam os 16 bits em complemento de dois. Os
+    raros valores que não cabem nesse formato (inteiros fora de 16 bits ou
+    reais que não são exatamente binary16) ficam em um dicionário à parte,
+    então o histórico devolve exatamente o que recebeu.
+    
+    Com `window`, o histórico vira um buffer circular que guarda apenas os
+    últimos `window` resultados, mas len() continua contando todos os
+    resultados já adicionados, de modo que (N RES) se comporta como na lista
+    completa enquanto N estiver dentro da janela. O buffer começa com
+    HISTORY_INITIAL_SIZE posições e só chega a `window` quando há resultados
+    para ocupá-lo.
+    """
+    
+    def __init__(self, window=None, initial=(), start=0):
+        """
+        Parâmetros:
+            window: Quantidade de resultados mantidos (None para guardar todos)
+            initial: Resultados anteriores usados para preencher o histórico
+            start: Posição do primeiro resultado de initial (só com window),
+                   para que len() continue contando os resultados descartados
+        """
+        self.window = window
+        self.count = start if window is not None else 0
+        # Posição do primeiro resultado guardado; os anteriores foram descartados
+        self.start = self.count
+        if window is None:
+            self.bits = array('H')
+            self.tags = bytearray()
+        else:
+            size = min(window, HISTORY_INITIAL_SIZE)
+            self.bits = array('H', bytes(2 * size))
+            self.tags = bytearray((size + 7) // 8)
+        # Valores fora do formato compacto, indexados pela posição no buffer
+        self.spill = {}
+        for value in initial:
+            self.append(value)
+    
+    def append(self, value):
+        """Adiciona um resultado, descartando o mais antigo se a janela estiver cheia."""
+        index = self.count
+        self.count = index + 1
+        window = self.window
+        if window is not None:
+            if not window:
+                return
+            index %= window
+            if index >= len(self.bits):
+                self._grow(index)
+        
+        tag = 0
+        bits = None
+        if value.__class__ is float:
+            try:
+                bits = HALF_BITS_FORMAT.unpack(_half_pack(value))[0]
+            except OverflowError:
+                pass
+            else:
+                if HALF_DECODE_TABLE[bits] != value and value == value:
+                    bits = None
+        elif value.__class__ is int and -32768 <= value < 32768:
+            bits = value & 0xFFFF
+            tag = 1
+        
+        spill = self.spill
+        if window is None:
+            if not index & 7:
+                self.tags.append(0)
+            self.bits.append(0 if bits is None else bits)
+        else:
+            self.bits[index] = 0 if bits is None else bits
+            self.tags[index >> 3] &= ~(1 << (index & 7))
+            if spill:
+                spill.pop(index, None)
+        if bits is None:
+            spill[index] = value
+        elif tag:
+            self.tags[index >> 3] |= 1 << (index & 7)
+    
+    def _grow(self, index):
+        """Aumenta o buffer circular (sem passar da janela) para incluir a posição index."""
+        size = min(self.window, max(2 * len(self.bits), index + 1))
+        self.bits.frombytes(bytes(2 * (size - len(self.bits))))
+        self.tags.extend(bytes((size + 7) // 8 - len(self.tags)))
+    
+    def __len__(self):
+        return self.count
+    
+    def __getitem__(self, index):
+        count = self.count
+        if index < 0:
+            index += count
+        if index < 0 or index >= count:
+            raise IndexError("Resultado fora do histórico.")
+        window = self.window
+        if window is not None:
+            if index < count - window or index < self.start:
+                raise IndexError("Resultado fora da janela do histórico.")
+            index %= window
+        spill = self.spill
+        if spill and index in spill:
+            return spill[index]
+        bits = self.bits[index]
+        if self.tags[index >> 3] >> (index & 7) & 1:
+            return bits - 0x10000 if bits & 0x8000 else bits
+        return HALF_DECODE_TABLE[bits]
+    
+    def __iter__(self):
+        start = 0 if self.window is None else max(self.start, self.count - self.window)
+        for index in range(start, self.count):
+            yield self[index]
+    
+    def nbytes(self):
+        """Bytes ocupados pelos buffers (sem contar os valores fora do formato compacto)."""
+        return self.bits.itemsize * len(self.bits) + len(self.tags)
+
+
+class SubexpressionCache:
+    """
+    Cache LRU de tamanho limitado com os valores de sub-expressões já
+    avaliadas, com contadores de acertos e falhas.
+    """
+    
+    def __init__(self, size):
+        """
+        Parâmetros:
+            size: Quantidade máxima de valores guardados
+        """
+        self.size = size
+        self.entries = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+    
+    def lookup(self, key):
+        """Retorna o valor guardado para a chave, ou _MISSING se não houver."""
+        value = self.entries.get(key, _MISSING)
+        if value is _MISSING:
+            self.misses += 1
+        else:
+            self.hits += 1
+            self.entries.move_to_end(key)
+        return value
+    
+    def store(self, key, value):
+        """Guarda um valor, descartando o usado há mais tempo se o cache estiver cheio."""
+        self.entries[key] = value
+        if len(self.entries) > self.size:
+            self.entries.popitem(last=False)
+    
+    def clear(self):
+        """Esvazia o cache e zera os contadores."""
+        self.entries.clear()
+        self.hits = 0
+        self.misses = 0
+
+
+class ReportWriter:
+    """
+    Escreve o relatório de avaliação (Linha/Resultado) em blocos, evitando
+    uma chamada de escrita por linha avaliada.
+    """
+    
+    def __init__(self, stream, block_size=REPORT_BLOCK_SIZE):
+        """
+        Parâmetros:
+            stream: Arquivo de saída (por exemplo, sys.stdout)
+            block_size: Quantidade de linhas avaliadas acumuladas por escrita
+        """
+        self.stream = stream
+        self.block_size = block_size
+        self.pending = []
+    
+    def write(self, line_no, expression, result, error=None):
+        """Acrescenta ao relatório o resultado de uma linha."""
+        if error is None:
+            self.pending.append(f"Linha {line_no}: {expression}\nResultado: {result}\n\n")
+        else:
+            where = f" (posição {error.position})" if error.position is not None else ""
+            self.pending.append(f"Linha {line_no}: {expression}\n"
+                                f"Erro ao avaliar expressão '{expression}'{where}: {error}\n"
+                                f"Resultado: erro\n\n")
+        if len(self.pending) >= self.block_size:
+            self.flush()
+    
+    def flush(self):
+        """Escreve o bloco acumulado no arquivo de saída."""
+        if self.pending:
+            self.stream.write(''.join(self.pending))
+            self.pending.clear()
+        self.stream.flush()
+
+
+class BinaryReportWriter:
+    """
+    Escreve os resultados em um arquivo binário com registros de tamanho fixo
+    (BINARY_REPORT_RECORD), no lugar do relatório em texto. Cada campo pode
+    ser lido como uma coluna sem conversão de texto, por exemplo com
+    read_binary_report (numpy.memmap). Os registros são acumulados e escritos
+    em blocos de block_size linhas.
+    """
+    
+    def __init__(self, stream, block_size=BINARY_REPORT_BLOCK_SIZE, append=False):
+        """
+        Parâmetros:
+            stream: Arquivo de saída aberto em modo binário
+            block_size: Quantidade de registros acumulados por escrita
+            append: Se verdadeiro, continua um relatório já iniciado (sem cabeçalho)
+        """
+        self.stream = stream
+        self.block_size = block_size
+        self.pending = bytearray()
+        self.count = 0
+        if not append:
+            stream.write(BINARY_REPORT_HEADER.pack(BINARY_REPORT_MAGIC, BINARY_REPORT_VERSION,
+                                                   BINARY_REPORT_RECORD.size))
+    
+    def write(self, line_no, expression, result, error=None):
+        """Acrescenta ao arquivo o registro de uma linha (a expressão não é gravada)."""
+        if error is not None:
+            record = BINARY_REPORT_RECORD.pack(line_no, 0, RESULT_TYPE_ERROR, error.code)
+        elif result.__class__ is int:
+            if -0x80000000 <= result < 0x80000000:
+                record = BINARY_REPORT_RECORD.pack(line_no, result, RESULT_TYPE_INT, ERROR_NONE)
+            else:
+                record = BINARY_REPORT_RECORD.pack(line_no, 1 if result > 0 else -1,
+                                                   RESULT_TYPE_LARGE_INT, ERROR_NONE)
+        else:
+            record = BINARY_REPORT_RECORD.pack(line_no, encode_half(result), RESULT_TYPE_FLOAT,
+                                               ERROR_NONE)
+        self.pending += record
+        self.count += 1
+        if len(self.pending) >= self.block_size * BINARY_REPORT_RECORD.size:
+            self.flush()
+    
+    def flush(self):
+        """Escreve o bloco acumulado no arquivo de saída."""
+        if self.pending:
+            self.stream.write(self.pending)
+            self.pending.clear()
+        self.stream.flush()
+
+
+def read_binary_report(filename):
+    """
+    Abre um relatório gravado por BinaryReportWriter sem carregá-lo na memória.
+    Requer o pacote numpy.
+    
+    Parâmetros:
+        filename: Caminho do arquivo binário
+    
+    Retorna:
+        numpy.memmap estruturado com os campos 'line', 'value', 'type' e
+        'error' (o valor real de um registro RESULT_TYPE_FLOAT é
+        value.astype(numpy.uint16).view(numpy.float16))
+    """
+    try:
+        import numpy as np
+    except ImportError:
+        raise ImportError("read_binary_report requer o pacote numpy (pip install numpy).") from None
+    
+    with open(filename, 'rb') as file:
+        header = file.read(BINARY_REPORT_HEADER.size)
+    if len(header) < BINARY_REPORT_HEADER.size:
+        raise ValueError(f"Arquivo '{filename}' não é um relatório binário.")
+    magic, version, record_size = BINARY_REPORT_HEADER.unpack(header)
+    if magic != BINARY_REPORT_MAGIC or version != BINARY_REPORT_VERSION \
+            or record_size != BINARY_REPORT_RECORD.size:
+        raise ValueError(f"Arquivo '{filename}' não é um relatório binário desta versão.")
+    dtype = np.dtype({'names': ['line', 'value', 'type', 'error'],
+                      'formats': ['<u4', '<i4', 'u1', 'u1'],
+                      'offsets': [0, 4, 8, 9],
+                      'itemsize': record_size})
+    return np.memmap(filename, dtype=dtype, mode='r', offset=BINARY_REPORT_HEADER.size)
+
+
+def open_report(output, report_format='text', append=False):
+    """
+    Cria o escritor do relatório no formato pedido.
+    
+    Parâmetros:
+        output: Arquivo de saída (modo texto para 'text', binário para 'binary')
+        report_format: Um dos formatos de REPORT_FORMATS
+        append: Se verdadeiro, continua um relatório já iniciado (ao retomar
+                um checkpoint)
+    
+    Retorna:
+        ReportWriter ou BinaryReportWriter
+    """
+    if report_format == 'binary':
+        return BinaryReportWriter(output, append=append)
+    if report_format != 'text':
+        raise ValueError(f"Formato de relatório desconhecido: {report_format}")
+    return ReportWriter(output)
+
+
+class ErrorSummary:
+    """
+    Resumo dos erros de uma avaliação: quantidade de erros por código e as
+    primeiras ocorrências de cada código (linha, expressão, posição, mensagem).
+    """
+    
+    def __init__(self, examples=ERROR_SUMMARY_EXAMPLES):
+        """
+        Parâmetros:
+            examples: Quantidade de ocorrências guardadas por código
+        """
+        self.examples = examples
+        self.errors = 0
+        self.counts = {}
+        self.first = {}
+    
+    def add(self, line_no, expression, error):
+        """Registra o erro (ErrorValue) de uma linha."""
+        self.errors += 1
+        code = error.code
+        count = self.counts.get(code, 0)
+        self.counts[code] = count + 1
+        if count < self.examples:
+            self.first.setdefault(code, []).append((line_no, expression, error.position, error.message))
+    
+    def merge(self, other):
+        """Acumula o resumo de outra avaliação."""
+        self.errors += other.errors
+        for code, count in other.counts.items():
+            self.counts[code] = self.counts.get(code, 0) + count
+            examples = self.first.setdefault(code, [])
+            examples.extend(other.first.get(code, [])[:self.examples - len(examples)])
+    
+    def format_report(self):
+        """
+        Monta o resumo em texto.
+        
+        Retorna:
+            String com o resumo (vazia se não houve erros)
+        """
+        if not self.errors:
+            return ""
+        lines = [f"Resumo de erros: {self.errors} linha(s) com erro"]
+        for code, count in sorted(self.counts.items(), key=lambda item: (-item[1], item[0])):
+            lines.append(f"  [{code}] {ERROR_NAMES.get(code, 'erro')}: {count}")
+            for line_no, expression, position, message in self.first.get(code, []):
+                where = f", posição {position}" if position is not None else ""
+                lines.append(f"      linha {line_no}{where}: {expression}  ({message})")
+        return "\n".join(lines)
+
+
+class CalculatorStats:
+    """
+    Estatísticas de avaliação coletadas pela RPNCalculator quando a
+    instrumentação está ativa (ver RPNCalculator.enable_stats): tempo de cada
+    fase, histograma de latência por expressão, contagem de operadores e
+    comandos, profundidade de aninhamento, acertos dos caches, erros e as
+    expressões mais lentas.
+    """
+    
+    def __init__(self, slowest=STATS_SLOWEST_COUNT):
+        """
+        Parâmetros:
+            slowest: Quantidade de expressões mais lentas guardadas
+        """
+        self.expressions = 0
+        self.errors = 0
+        self.error_messages = {}
+        self.phase_ns = dict.fromkeys(STATS_PHASES, 0)
+        self.phase_counts = dict.fromkeys(STATS_PHASES, 0)
+        self.total_ns = 0
+        self.max_ns = 0
+        self.latency_histogram = [0] * LATENCY_BUCKETS
+        self.operators = dict.fromkeys(OPERATOR_CODES, 0)
+        self.commands = {'RES': 0, 'MEM_STORE': 0, 'MEM_LOAD': 0}
+        self.depth_histogram = {}
+        self.program_cache_hits = 0
+        self.program_cache_misses = 0
+        self.subexpression_cache_hits = 0
+        self.subexpression_cache_misses = 0
+        # Heap mínimo com as expressões mais lentas: (tempo, sequência, registro)
+        self.slowest_count = slowest
+        self.slowest = []
+        self.sequence = 0
+        # Número da linha em avaliação (preenchido por _evaluate_lines)
+        self.line_no = None
+    
+    def record(self, expression, program, phases, total_ns, error):
+        """
+        Registra a avaliação de uma expressão.
+        
+        Parâmetros:
+            expression: Texto da expressão
+            program: Programa compilado (None se a compilação falhou)
+            phases: Dicionário com o tempo (ns) de cada fase executada
+            total_ns: Tempo total da avaliação
+            error: ErrorValue ou mensagem de erro (None se não houve erro)
+        """
+        self.expressions += 1
+        if error is not None:
+            error = str(error)
+        for phase, ns in phases.items():
+            self.phase_ns[phase] += ns
+            self.phase_counts[phase] += 1
+        self.total_ns += total_ns
+        if total_ns > self.max_ns:
+            self.max_ns = total_ns
+        self.latency_histogram[min((total_ns // 1000).bit_length(), LATENCY_BUCKETS - 1)] += 1
+        if error is not None:
+            self.errors += 1
+            self.error_messages[error] = self.error_messages.get(error, 0) + 1
+        
+        operators = 0
+        if program is not None:
+            for code, arg in program:
+                if OP_ADD <= code <= OP_POW:
+                    self.operators[arg] += 1
+                    operators += 1
+                elif code == OP_RES:
+                    self.commands['RES'] += 1
+                elif code == OP_MEM_STORE:
+                    self.commands['MEM_STORE'] += 1
+                elif code == OP_MEM_LOAD:
+                    self.commands['MEM_LOAD'] += 1
+        
+        # Profundidade de aninhamento (parênteses abertos ao mesmo tempo)
+        depth = deepest = 0
+        for char in expression:
+            if char == '(':
+                depth += 1
+                if depth > deepest:
+                    deepest = depth
+            elif char == ')':
+                depth -= 1
+        self.depth_histogram[deepest] = self.depth_histogram.get(deepest, 0) + 1
+        
+        if len(self.slowest) < self.slowest_count or total_ns > self.slowest[0][0]:
+            entry = {
+                'line': self.line_no,
+                'expression': expression,
+                'total_us': total_ns / 1000,
+                'phases_us': {phase: ns / 1000 for phase, ns in phases.items()},
+                'depth': deepest,
+                'operators': operators,
+                'error': error,
+            }
+            self.sequence += 1
+            item = (total_ns, self.sequence, entry)
+            if len(self.slowest) < self.slowest_count:
+                heapq.heappush(self.slowest, item)
+            else:
+                heapq.heapreplace(self.slowest, item)
+    
+    def merge(self, other):
+        """Acumula as estatísticas de outra instância (por exemplo, de outro processo)."""
+        self.expressions += other.expressions
+        self.errors += other.errors
+        for message, count in other.error_messages.items():
+            self.error_messages[message] = self.error_messages.get(message, 0) + count
+        for phase in STATS_PHASES:
+            self.phase_ns[phase] += other.phase_ns[phase]
+            self.phase_counts[phase] += other.phase_counts[phase]
+        self.total_ns += other.total_ns
+        self.max_ns = max(self.max_ns, other.max_ns)
+        for i, count in enumerate(other.latency_histogram):
+            self.latency_histogram[i] += count
+        for operator, count in other.operators.items():
+            self.operators[operator] += count
+        for command, count in other.commands.items():
+            self.commands[command] += count
+        for depth, count in other.depth_histogram.items():
+            self.depth_histogram[depth] = self.depth_histogram.get(depth, 0) + count
+        self.program_cache_hits += other.program_cache_hits
+        self.program_cache_misses += other.program_cache_misses
+        self.subexpression_cache_hits += other.subexpression_cache_hits
+        self.subexpression_cache_misses += other.subexpression_cache_misses
+        for total_ns, _, entry in other.slowest:
+            self.sequence += 1
+            heapq.heappush(self.slowest, (total_ns, self.sequence, entry))
+            if len(self.slowest) > self.slowest_count:
+                heapq.heappop(self.slowest)
+    
+    def latency_percentile(self, fraction):
+        """Limite superior (µs) da faixa do histograma que contém o percentil pedido"""
+        target = fraction * self.expressions
+        seen = 0
+        for i, count in enumerate(self.latency_histogram):
+            seen += count
+            if count and seen >= target:
+                return 2 ** i
+        return 0
+    
+    def report(self):
+        """
+        Retorna:
+            Dicionário com todas as estatísticas (serializável em JSON)
+        """
+        expressions = self.expressions or 1
+        histogram = {}
+        for i, count in enumerate(self.latency_histogram):
+            label = f"<{2 ** i}" if i < LATENCY_BUCKETS - 1 else f">={2 ** (i - 1)}"
+            histogram[label] = count
+        depths = sum(depth * count for depth, count in self.depth_histogram.items())
+        return {
+            'expressions': self.expressions,
+            'errors': self.errors,
+            'error_messages': dict(sorted(self.error_messages.items(), key=lambda item: -item[1])),
+            'phases': {
+                phase: {
+                    'count': self.phase_counts[phase],
+                    'total_ms': round(self.phase_ns[phase] / 1e6, 3),
+                    'mean_us': round(self.phase_ns[phase] / 1000 / (self.phase_counts[phase] or 1), 3),
+                }
+                for phase in STATS_PHASES
+            },
+            'latency': {
+                'total_ms': round(self.total_ns / 1e6, 3),
+                'mean_us': round(self.total_ns / 1000 / expressions, 3),
+                'max_us': round(self.max_ns / 1000, 3),
+                'p50_us': self.latency_percentile(0.50),
+                'p99_us': self.latency_percentile(0.99),
+                'histogram_us': histogram,
+            },
+            'operators': dict(self.operators),
+            'commands': dict(self.commands),
+            'nesting_depth': {
+                'max': max(self.depth_histogram, default=0),
+                'mean': round(depths / expressions, 3),
+                'histogram': {str(depth): count for depth, count in sorted(self.depth_histogram.items())},
+            },
+            'program_cache': {'hits': self.program_cache_hits, 'misses': self.program_cache_misses},
+            'subexpression_cache': {'hits': self.subexpression_cache_hits,
+                                    'misses': self.subexpression_cache_misses},
+            'slowest': [entry for _, _, entry in sorted(self.slowest, reverse=True)],
+        }
+    
+    def format_report(self):
+        """Retorna o relatório das estatísticas em texto"""
+        report = self.report()
+        latency = report['latency']
+        lines = [
+            "--- Estatísticas da avaliação ---",
+            f"Expressões: {report['expressions']} ({report['errors']} com erro)",
+            f"Tempo total: {latency['total_ms']} ms, médio {latency['mean_us']} µs, "
+            f"máximo {latency['max_us']} µs (p50 < {latency['p50_us']} µs, p99 < {latency['p99_us']} µs)",
+            "Fases:",
+        ]
+        for phase, values in report['phases'].items():
+            lines.append(f"  {phase}: {values['count']} vezes, {values['total_ms']} ms "
+                         f"(médio {values['mean_us']} µs)")
+        lines.append("Operadores: " + ", ".join(f"{op} {n}" for op, n in report['operators'].items()))
+        lines.append("Comandos: " + ", ".join(f"{cmd} {n}" for cmd, n in report['commands'].items()))
+        depth = report['nesting_depth']
+        lines.append(f"Aninhamento: máximo {depth['max']}, médio {depth['mean']}")
+        cache = report['program_cache']
+        lines.append(f"Cache de programas: {cache['hits']} acertos, {cache['misses']} falhas")
+        cache = report['subexpression_cache']
+        lines.append(f"Cache de sub-expressões: {cache['hits']} acertos, {cache['misses']} falhas")
+        if report['error_messages']:
+            lines.append("Erros:")
+            for message, count in report['error_messages'].items():
+                lines.append(f"  {count}x {message}")
+        if report['slowest']:
+            lines.append("Expressões mais lentas:")
+            for entry in report['slowest']:
+                phases = ", ".join(f"{phase} {us:.1f}" for phase, us in entry['phases_us'].items())
+                lines.append(f"  {entry['total_us']:.1f} µs (linha {entry['line']}, profundidade "
+                             f"{entry['depth']}, {entry['operators']} operadores; {phases}): "
+                             f"{entry['expression']}")
+        return "\n".join(lines)
+
+
+def _code_fingerprint(code, digest):
+    """Acrescenta ao hash o bytecode, os nomes e as constantes de um código (recursivamente)"""
+    digest.update(code.co_code)
+    digest.update(repr(code.co_names).encode())
+    for const in code.co_consts:
+        if hasattr(const, 'co_code'):
+            _code_fingerprint(const, digest)
+        else:
+            digest.update(repr(const).encode())
+
+
+def calculator_fingerprint():
+    """
+    Identifica a semântica da calculadora: hash do bytecode dos métodos que
+    definem os resultados (operate, to_half_precision, análise léxica,
+    compilação e execução), da versão do Python e de RESULT_CACHE_VERSION.
+    Entradas do ResultCache gravadas com outra identificação são descartadas.
+    
+    Retorna:
+        String hexadecimal com a identificação
+    """
+    import hashlib
+    digest = hashlib.blake2b(digest_size=16)
+    digest.update(f"{RESULT_CACHE_VERSION} {sys.version_info[:2]}".encode())
+    for method in (scan_expression, RPNCalculator.to_half_precision, RPNCalculator.operate,
+                   RPNCalculator.tokenize_expression, RPNCalculator.compile_expression,
+                   RPNCalculator.compile_tokens, RPNCalculator.execute_program):
+        _code_fingerprint(method.__code__, digest)
+    return digest.hexdigest()
+
+
+class ResultCache:
+    """
+    Cache persistente (SQLite) dos resultados de trechos de arquivos de
+    expressões, compartilhado entre execuções.
+    
+    Cada entrada guarda os resultados, os erros e a memória final de um trecho
+    de até RESULT_CACHE_CHUNK_LINES linhas, indexada pelo hash do texto do
+    trecho e do estado de que ele depende (ver RPNCalculator._evaluate_lines).
+    Quando o banco passa de max_bytes, as entradas usadas há mais tempo são
+    removidas. Entradas de outra semântica (calculator_fingerprint) são
+    descartadas ao abrir o banco.
+    """
+    
+    def __init__(self, directory=RESULT_CACHE_DIR, max_bytes=RESULT_CACHE_MAX_BYTES):
+        """
+        Parâmetros:
+            directory: Diretório do banco (criado se não existir)
+            max_bytes: Tamanho máximo dos dados guardados
+        """
+        import os
+        import sqlite3
+        os.makedirs(directory, exist_ok=True)
+        self.max_bytes = max_bytes
+        self.connection = sqlite3.connect(os.path.join(directory, 'results.sqlite'))
+        self.connection.execute("PRAGMA journal_mode=WAL")
+        self.connection.execute("PRAGMA synchronous=NORMAL")
+        self.connection.execute("CREATE TABLE IF NOT EXISTS meta (name TEXT PRIMARY KEY, value TEXT)")
+        self.connection.execute("CREATE TABLE IF NOT EXISTS chunks (key BLOB PRIMARY KEY, "
+                                "data BLOB NOT NULL, size INTEGER NOT NULL, used INTEGER NOT NULL)")
+        version = calculator_fingerprint()
+        row = self.connection.execute("SELECT value FROM meta WHERE name = 'version'").fetchone()
+        if row is None or row[0] != version:
+            self.connection.execute("DELETE FROM chunks")
+            self.connection.execute("INSERT OR REPLACE INTO meta VALUES ('version', ?)", (version,))
+        self.size, clock = self.connection.execute(
+            "SELECT COALESCE(SUM(size), 0), COALESCE(MAX(used), 0) FROM chunks").fetchone()
+        # Relógio lógico para a ordem de uso das entradas (remoção LRU)
+        self.clock = clock
+        self.hits = 0
+        self.misses = 0
+        self.connection.commit()
+    
+    @staticmethod
+    def key(lines, state):
+        """
+        Chave de um trecho: hash das linhas e do estado de que elas dependem.
+        
+        Parâmetros:
+            lines: Expressões do trecho
+            state: Tupla com o estado de entrada (memória e resultados lidos por RES)
+        """
+        import hashlib
+        digest = hashlib.blake2b(digest_size=16)
+        digest.update('\n'.join(lines).encode())
+        digest.update(b'\0')
+        digest.update(repr(state).encode())
+        return digest.digest()
+    
+    def get(self, key):
+        """
+        Retorna:
+            Tupla (resultados, erros, memória final) guardada, ou None
+        """
+        import pickle
+        row = self.connection.execute("SELECT data FROM chunks WHERE key = ?", (key,)).fetchone()
+        if row is None:
+            self.misses += 1
+            return None
+        self.hits += 1
+        self.clock += 1
+        self.connection.execute("UPDATE chunks SET used = ? WHERE key = ?", (self.clock, key))
+        return pickle.loads(row[0])
+    
+    def put(self, key, value):
+        """Guarda a tupla (resultados, erros, memória final) de um trecho."""
+        import pickle
+        data = pickle.dumps(value, protocol=pickle.HIGHEST_PROTOCOL)
+        self.clock += 1
+        old = self.connection.execute("SELECT size FROM chunks WHERE key = ?", (key,)).fetchone()
+        if old is not None:
+            self.size -= old[0]
+        self.connection.execute("INSERT OR REPLACE INTO chunks VALUES (?, ?, ?, ?)",
+                                (key, data, len(data), self.clock))
+        self.size += len(data)
+        if self.size > self.max_bytes:
+            self.evict(self.max_bytes * 9 // 10)
+    
+    def evict(self, target):
+        """Remove as entradas usadas há mais tempo até o banco ocupar no máximo target bytes."""
+        removed = []
+        for key, size in self.connection.execute("SELECT key, size FROM chunks ORDER BY used"):
+            if self.size <= target:
+                break
+            removed.append((key,))
+            self.size -= size
+        self.connection.executemany("DELETE FROM chunks WHERE key = ?", removed)
+    
+    def close(self):
+        """Grava as alterações e fecha o banco."""
+        self.connection.commit()
+        self.connection.close()
+    
+    def __enter__(self):
+        return self
+    
+    def __exit__(self, *exc_info):
+        self.close()
+
+
+class ExpressionOptimizer:
+    """
+    Otimizador do programa pós-fixo de uma expressão, usado pela avaliação
+    (RPNCalculator.compile_tokens) e pelo gerador de Assembly.
+    
+    O programa é convertido em árvore (com uma pilha explícita, sem recursão)
+    e simplificado na mesma passada:
+    - cálculo de constantes: operações entre constantes são feitas pela
+      própria calculadora (meia precisão, / e % inteiros); operações que
+      falhariam, como divisão por zero, ficam para a execução, que gera o erro;
+    - eliminação de identidades, apenas quando o resultado é exatamente o
+      operando para o tipo dele (real ou inteiro, inferido na árvore):
+      x*1, 1*x, x|1, x^1, x-0 e x+(-0.0) para reais; x+0, x-0, x*1, x/1 e x^1
+      para inteiros. x+0 não é eliminado para reais, porque -0.0 + 0 = 0.0,
+      nem para inteiros quando o 0 é real, porque o resultado vira real;
+    - eliminação de sub-expressões comuns (opcional): a primeira ocorrência
+      guarda o valor (OP_TEMP_STORE) e as demais o leem (OP_TEMP_LOAD).
+    
+    A ordem dos efeitos colaterais é preservada: nada é reordenado, e
+    programas com erro de compilação ou variáveis não são alterados.
+    """
+    
+    def __init__(self, calculator):
+        """
+        Parâmetros:
+            calculator: RPNCalculator usada para calcular as constantes
+        """
+        self.calculator = calculator
+    
+    @staticmethod
+    def worth_optimizing(program):
+        """
+        Verificação rápida: o programa tem alguma operação entre constantes ou
+        alguma constante 0 ou 1 (candidata a identidade)?
+        """
+        previous = None
+        before = None
+        for instruction in program:
+            if instruction is None or instruction.__class__ is list:
+                continue
+            code = instruction[0]
+            if code == OP_PUSH:
+                if instruction[1] == 0 or instruction[1] == 1:
+                    return True
+            elif OP_ADD <= code <= OP_POW and previous == OP_PUSH and before == OP_PUSH:
+                return True
+            before = previous
+            previous = code
+        return False
+    
+    @staticmethod
+    def _identity(code, value, kind, right):
+        """Verifica se operar x (do tipo kind) com a constante value resulta exatamente em x."""
+        if value.__class__ is int:
+            if kind == 'i':
+                if code == OP_ADD or (right and code == OP_SUB):
+                    return value == 0
+                return value == 1 and (code == OP_MUL or (right and code in (OP_INT_DIV, OP_POW)))
+            if kind != 'f':
+                return False
+            # Real operado com inteiro: o resultado continua real (só 0 e 1
+            # são identidades; inteiros grandes não cabem em um float)
+            if value != 0 and value != 1:
+                return False
+            value = float(value)
+        elif kind == 'i':
+            # Inteiro operado com real vira real, exceto na divisão inteira
+            return right and code == OP_INT_DIV and value == 1
+        elif kind != 'f':
+            return False
+        if code == OP_MUL:
+            return value == 1
+        if not right:
+            return code == OP_ADD and value == 0 and math.copysign(1, value) < 0
+        if code == OP_ADD:
+            return value == 0 and math.copysign(1, value) < 0
+        if code == OP_SUB:
+            return value == 0 and math.copysign(1, value) > 0
+        return code in (OP_REAL_DIV, OP_POW) and value == 1
+    
+    def combine(self, code, symbol, a, b):
+        """Monta o nó de uma operação binária, já simplificado."""
+        if a[0] == 'c' and b[0] == 'c':
+            try:
+                value = self.calculator.execute_program(((OP_PUSH, a[1]), (OP_PUSH, b[1]), (code, symbol)))
+                if value.__class__ is not ErrorValue:
+                    return ('c', value, 'i' if value.__class__ is int else 'f')
+            except Exception:
+                pass
+        if b[0] == 'c' and self._identity(code, b[1], a[-1], True):
+            return a
+        if a[0] == 'c' and self._identity(code, a[1], b[-1], False):
+            return b
+        if code == OP_INT_DIV or code == OP_MOD:
+            kind = 'i'
+        elif code == OP_REAL_DIV:
+            kind = 'f'
+        elif a[-1] == 'f' or b[-1] == 'f':
+            kind = 'f'
+        elif a[-1] == 'i' and b[-1] == 'i':
+            kind = 'i'
+        else:
+            kind = None
+        return ('o', code, symbol, a, b, kind)
+    
+    def optimize(self, program, keep_groups=True, cse=False):
+        """
+        Otimiza um programa compilado.
+        
+        Parâmetros:
+            program: Programa de compile_tokens (com ou sem os marcadores de
+                     sub-expressão já ligados por _link_groups)
+            keep_groups: Mantém os marcadores do cache de sub-expressões (no
+                         formato ainda não ligado); se falso, eles são removidos
+            cse: Elimina sub-expressões comuns (só sem marcadores e sem (V MEM))
+            
+        Retorna:
+            Lista de instruções otimizada, ou o próprio programa se ele não
+            puder ser otimizado
+        """
+        stack = []
+        groups = []
+        has_store = False
+        for instruction in program:
+            if instruction is None:
+                continue
+            if instruction.__class__ is list:
+                groups.append(instruction)
+                continue
+            code, arg = instruction
+            if code == OP_PUSH:
+                stack.append(('c', arg, 'i' if arg.__class__ is int else 'f'))
+            elif OP_ADD <= code <= OP_POW:
+                b = stack.pop()
+                stack.append(self.combine(code, arg, stack.pop(), b))
+            elif code == OP_RES or code == OP_MEM_LOAD:
+                stack.append(('v', code, arg, None))
+            elif code == OP_MEM_STORE:
+                stack.append(('v', code, arg, 'f'))
+                has_store = True
+            elif code == OP_GROUP:
+                groups.append([arg[1], arg[2], arg[3]])
+            elif code == OP_GROUP_END:
+                marker = groups.pop()
+                if keep_groups and stack[-1][0] == 'o':
+                    # O cache só vale a pena para sub-expressões que ainda têm operações
+                    child = stack.pop()
+                    stack.append(('g', marker, child, child[-1]))
+            else:
+                # Erros de compilação, variáveis e temporários: sem otimização
+                return program
+        if len(stack) != 1:
+            return program
+        
+        counts = None
+        if cse and not keep_groups and not has_store:
+            counts = self._count_subtrees(stack[0])
+        
+        # Emissão em pós-ordem, com uma pilha explícita
+        output = []
+        temps = {}
+        work = [(stack[0], False)]
+        while work:
+            node, expanded = work.pop()
+            kind = node[0]
+            if kind == 'c':
+                output.append((OP_PUSH, node[1]))
+            elif kind == 'v':
+                output.append((node[1], node[2]))
+            elif kind == 'g':
+                if expanded:
+                    output.append((OP_GROUP_END, None))
+                else:
+                    output.append(node[1])
+                    work.append((node, True))
+                    work.append((node[2], False))
+            elif expanded:
+                output.append((node[1], node[2]))
+                if counts is not None and counts[id(node)][1] > 1:
+                    key = counts[id(node)][0]
+                    if key not in temps:
+                        temps[key] = len(temps)
+                        output.append((OP_TEMP_STORE, temps[key]))
+            else:
+                if counts is not None:
+                    key = counts[id(node)][0]
+                    if key in temps:
+                        output.append((OP_TEMP_LOAD, temps[key]))
+                        continue
+                work.append((node, True))
+                work.append((node[4], False))
+                work.append((node[3], False))
+        return output
+    
+    @staticmethod
+    def _count_subtrees(root):
+        """
+        Identifica as operações iguais da árvore.
+        
+        Retorna:
+            Dicionário {id do nó: [identificador da forma, quantidade de ocorrências]}
+        """
+        shapes = {}
+        info = {}
+        occurrences = {}
+        work = [(root, False)]
+        while work:
+            node, expanded = work.pop()
+            if node[0] != 'o':
+                # Folhas: a forma é o próprio conteúdo
+                shape = ('c', _value_key(node[1])) if node[0] == 'c' else node[1:3]
+            elif not expanded:
+                work.append((node, True))
+                work.append((node[4], False))
+                work.append((node[3], False))
+                continue
+            else:
+                shape = (node[1], info[id(node[3])][0], info[id(node[4])][0])
+            shape_id = shapes.setdefault(shape, len(shapes))
+            info[id(node)] = [shape_id, 0]
+            occurrences[shape_id] = occurrences.get(shape_id, 0) + 1
+        for entry in info.values():
+            entry[1] = occurrences[entry[0]]
+        return info
+
+
+class RPNCalculator:
+    """
+    Implementa uma calculadora para avaliação de expressões na Notação Polonesa Reversa (RPN).
+    Suporta operações aritméticas básicas, comandos especiais de memória, e expressões aninhadas.
+    """
+    
+    def __init__(self, program_cache_size=PROGRAM_CACHE_SIZE, cache_size=SUBEXPRESSION_CACHE_SIZE,
+                 optimize=True):
+        """
+        Inicializa a calculadora RPN com valores padrão.
+        Configura a lista de resultados anteriores e a memória.
+        
+        Parâmetros:
+            program_cache_size: Quantidade máxima de expressões compiladas em cache
+            cache_size: Quantidade máxima de valores de sub-expressões em cache
+                        (0 desativa o cache de sub-expressões)
+            optimize: Se verdadeiro, os programas reutilizados passam pelo
+                      ExpressionOptimizer (ver _optimize_cached)
+        """
+        # Armazena resultados das expressões anteriores (2 bytes por resultado)
+        self.results = ResultHistory()
+        # Memória para comando (V MEM)
+        self.memory = 0.0
+        # Mensagem de erro da última linha avaliada por iter_file (None se não houve erro)
+        self.last_error = None
+        # Programas já compilados, indexados pelo texto da expressão
+        self.programs = {}
+        self.program_cache_size = program_cache_size
+        # Valores de sub-expressões já avaliadas (None se desativado)
+        self.subexpression_cache = SubexpressionCache(cache_size) if cache_size > 0 else None
+        # Identificador interno de cada formato de sub-expressão já compilado
+        self.group_ids = {}
+        self.next_group_id = 0
+        # Estatísticas de avaliação (None quando a instrumentação está desativada)
+        self.stats = None
+        # Otimizador dos programas compilados (None se desativado) e expressões
+        # do cache de programas que já foram otimizadas
+        self.optimizer = ExpressionOptimizer(self) if optimize else None
+        self.optimized = set()
+        # Cache persistente de resultados usado por _evaluate_lines (ResultCache ou None)
+        self.result_cache = None
+        # Erros das linhas avaliadas por process_file e stream_file
+        self.error_summary = ErrorSummary()
+        # Posição dos erros de execução já localizados:
+        # (expressão, instrução) -> (programa, posição)
+        self.error_positions = {}
+        # Literais numéricos já convertidos: texto -> (valor em meia precisão, chave do valor)
+        self.literals = {}
+        # Mensagem da falha do último process_file ou stream_file (por exemplo,
+        # ao escrever o relatório), ou None se o arquivo foi processado
+        self.file_error = None
+        # Número e posição final (em bytes) da última linha lida do arquivo em
+        # avaliação com checkpoints (ver _read_lines)
+        self.file_position = (0, 0)
+    
+    def enable_stats(self, slowest=STATS_SLOWEST_COUNT):
+        """
+        Ativa a instrumentação: as próximas avaliações registram tempos e
+        contadores em um novo CalculatorStats.
+        
+        Parâmetros:
+            slowest: Quantidade de expressões mais lentas guardadas
+            
+        Retorna:
+            O CalculatorStats que recebe as estatísticas
+        """
+        self.stats = CalculatorStats(slowest)
+        return self.stats
+    
+    def disable_stats(self):
+        """
+        Desativa a instrumentação.
+        
+        Retorna:
+            O CalculatorStats com as estatísticas coletadas (ou None)
+        """
+        stats, self.stats = self.stats, None
+        return stats
+    
+    def save_state(self, filename):
+        """
+        Grava o estado da calculadora (histórico de resultados e memória) em
+        um arquivo, substituindo-o de forma atômica. O arquivo usa pickle:
+        carregue apenas estados gerados por você.
+        
+        Parâmetros:
+            filename: Caminho do arquivo de estado
+        """
+        import os
+        import pickle
+        results = self.results
+        if not isinstance(results, ResultHistory):
+            results = ResultHistory(None, results)
+        state = {'version': CALCULATOR_STATE_VERSION, 'results': results, 'memory': self.memory}
+        temporary = filename + '.tmp'
+        with open(temporary, 'wb') as file:
+            pickle.dump(state, file, protocol=pickle.HIGHEST_PROTOCOL)
+        os.replace(temporary, filename)
+    
+    def load_state(self, filename):
+        """
+        Restaura o estado gravado por save_state.
+        
+        Parâmetros:
+            filename: Caminho do arquivo de estado
+            
+        Retorna:
+            Booleano indicando se o estado foi restaurado
+        """
+        import pickle
+        try:
+            with open(filename, 'rb') as file:
+                state = pickle.load(file)
+        except (OSError, pickle.UnpicklingError, EOFError):
+            return False
+        if not isinstance(state, dict) or state.get('version') != CALCULATOR_STATE_VERSION:
+            return False
+        self.results = state['results']
+        self.memory = state['memory']
+        return True
+    
+    def save_checkpoint(self, filename, input_filename, output=None):
+        """
+        Grava um checkpoint da avaliação de um arquivo: histórico de resultados,
+        memória, resumo de erros, posição no arquivo de entrada (a última linha
+        lida, em self.file_position) e o tamanho já escrito do relatório. O
+        arquivo é substituído de forma atômica, depois de gravado em disco, então
+        uma interrupção a qualquer momento deixa o checkpoint anterior intacto.
+        O arquivo usa pickle: carregue apenas checkpoints gerados por você.
+        
+        Parâmetros:
+            filename: Caminho do arquivo de checkpoint
+            input_filename: Arquivo de expressões em avaliação
+            output: Arquivo do relatório (já com os blocos pendentes escritos),
+                    ou None
+        """
+        import os
+        import pickle
+        line_no, offset = self.file_position
+        position = None
+        if output is not None:
+            try:
+                output.flush()
+                position = output.tell()
+                os.fsync(output.fileno())
+            except (AttributeError, OSError, ValueError):
+                pass
+        info = os.stat(input_filename)
+        state = {
+            'version': CHECKPOINT_VERSION,
+            'input': (os.path.abspath(input_filename), info.st_size, info.st_mtime_ns),
+            'line_no': line_no,
+            'offset': offset,
+            'output': position,
+            'results': self.results,
+            'memory': self.memory,
+            'errors': self.error_summary,
+        }
+        temporary = filename + '.tmp'
+        with open(temporary, 'wb') as file:
+            pickle.dump(state, file, protocol=pickle.HIGHEST_PROTOCOL)
+            file.flush()
+            os.fsync(file.fileno())
+        os.replace(temporary, filename)
+    
+    def load_checkpoint(self, filename, input_filename):
+        """
+        Restaura o histórico, a memória e o resumo de erros de um checkpoint
+        gravado por save_checkpoint para o mesmo arquivo de entrada (que não
+        pode ter mudado desde então).
+        
+        Parâmetros:
+            filename: Caminho do arquivo de checkpoint
+            input_filename: Arquivo de expressões a ser retomado
+            
+        Retorna:
+            Dicionário do checkpoint (com 'line_no', 'offset' e 'output'), ou
+            None se não houver um checkpoint válido para esse arquivo
+        """
+        import os
+        import pickle
+        try:
+            with open(filename, 'rb') as file:
+                state = pickle.load(file)
+            info = os.stat(input_filename)
+        except (OSError, pickle.UnpicklingError, EOFError):
+            return None
+        if not isinstance(state, dict) or state.get('version') != CHECKPOINT_VERSION:
+            return None
+        if state['input'] != (os.path.abspath(input_filename), info.st_size, info.st_mtime_ns):
+            return None
+        self.results = state['results']
+        self.memory = state['memory']
+        self.error_summary = state['errors']
+        self.file_position = (state['line_no'], state['offset'])
+        return state
+    
+    def _read_lines(self, file, start=0, first_line_no=1):
+        """
+        Lê as linhas de um arquivo aberto em modo binário a partir do byte
+        start, registrando em self.file_position o número e a posição final da
+        última linha lida (usados por save_checkpoint).
+        
+        Retorna:
+            Gerador das linhas decodificadas
+        """
+        file.seek(start)
+        offset = start
+        line_no = first_line_no - 1
+        for raw in file:
+            offset += len(raw)
+            line_no += 1
+            self.file_position = (line_no, offset)
+            yield raw.decode()
+    
+    def _checkpointed(self, records, checkpoint, interval, input_filename, report, output):
+        """
+        Repassa os registros de avaliação (o primeiro campo é o número da
+        linha), gravando um checkpoint a cada interval linhas. O checkpoint é
+        gravado depois que o chamador trata o registro (relatório e resumo de
+        erros) e só quando nenhuma linha além dele foi lida, para que a
+        posição no arquivo corresponda exatamente ao estado salvo. Ao fim dos
+        registros, o checkpoint é apagado.
+        """
+        import os
+        next_checkpoint = self.file_position[0] + interval
+        for record in records:
+            yield record
+            line_no = record[0]
+            if line_no >= next_checkpoint and line_no == self.file_position[0]:
+                if report is not None:
+                    report.flush()
+                self.save_checkpoint(checkpoint, input_filename, output)
+                next_checkpoint = line_no + interval
+        # Arquivo avaliado até o fim: o checkpoint não é mais necessário
+        try:
+            os.remove(checkpoint)
+        except FileNotFoundError:
+            pass
+    
+    def _resume(self, checkpoint, input_filename, output):
+        """
+        Carrega o checkpoint de um arquivo e volta o relatório para o tamanho
+        que tinha quando o checkpoint foi gravado (ou o esvazia, se não houver
+        um checkpoint válido e a avaliação recomeçar do início).
+        
+        Retorna:
+            Dicionário do checkpoint, ou None se não houver um válido
+        """
+        state = self.load_checkpoint(checkpoint, input_filename)
+        if output is not None:
+            position = 0 if state is None else state['output']
+            try:
+                if position is not None:
+                    output.seek(position)
+                    output.truncate()
+            except (AttributeError, OSError, ValueError):
+                pass
+        return state
+    
+    def to_half_precision(self, value):
+        """
+        Converte um número para formato de meia precisão (16 bits) conforme padrão IEEE754.
+        
+        Parâmetros:
+            value: Valor float a ser convertido
+            
+        Retorna:
+            Valor convertido para representação de meia precisão (16 bits)
+        """
+        # Se o valor for inteiro para divisão inteira e resto, não converte
+        if isinstance(value, int):
+            return value
+        
+        # Para valores reais, arredonda para binary16 (IEEE754): arredondamento
+        # para o mais próximo com empates para o par, subnormais, infinito e NaN
+        try:
+            return _half_round_trip(_half_pack(value))[0]
+        except OverflowError:
+            # Acima de 65504 o arredondamento resulta em infinito
+            return math.copysign(math.inf, value)
+        except (struct.error, TypeError, ValueError):
+            return 0.0
+    
+    def evaluate_expression(self, expression):
+        """
+        Avalia uma expressão RPN e retorna o resultado final.
+        Suporta comandos especiais como (N RES), (V MEM) e (MEM).
+        
+        - Se você escrever (2 RES), ele vai buscar o resultado que calculou 2 linhas atrás
+        - Se você escrever (5 MEM), ele vai guardar o número 5 na memória da calculadora
+        - Se você escrever (MEM), ele vai pegar de volta o número que estava guardado na memória
+        
+        Parâmetros:
+            expression: String contendo a expressão RPN a ser avaliada
+            
+        Retorna:
+            Resultado da avaliação da expressão; se ela falhar, um ErrorValue
+            com o código, a mensagem e a posição do erro
+        """
+        return self._evaluate(expression)[0]
+    
+    def _evaluate(self, expression):
+        """
+        Avalia uma expressão sem imprimir nada.
+        
+        Retorna:
+            Par (resultado, erro); em caso de erro os dois são o mesmo ErrorValue
+        """
+        if self.stats is not None:
+            return self._evaluate_profiled(expression)
+        memory = self.memory
+        try:
+            program = self.programs.get(expression)
+            if program is None:
+                program = self.compile_expression(expression)
+            elif self.optimizer is not None and expression not in self.optimized:
+                program = self._optimize_cached(expression, program)
+            result = self.execute_program(program)
+        except Exception as e:
+            result = ErrorValue(ERROR_INVALID, str(e))
+            return result, result
+        if result.__class__ is ErrorValue:
+            self._locate_error(expression, program, result, memory)
+            return result, result
+        return result, None
+    
+    def _locate_error(self, expression, program, error, memory):
+        """
+        Preenche error.position com a posição do erro no texto da expressão.
+        
+        Erros de compilação guardam o índice do token na instrução OP_RAISE, e
+        a posição calculada fica no próprio ErrorValue do programa. Nos erros
+        de execução, a instrução que falhou é a k-ésima operação (ou o k-ésimo
+        (N RES)) do programa, que vem do k-ésimo token desse tipo, pois o
+        programa segue a ordem dos tokens, e a posição fica guardada para as
+        próximas falhas do mesmo programa. Se o otimizador removeu operações,
+        a expressão é compilada sem otimização e executada de novo, a partir
+        da memória anterior, só para achar o erro.
+        
+        Parâmetros:
+            expression: Texto da expressão
+            program: Programa executado
+            error: ErrorValue devolvido pela execução
+            memory: Valor da memória antes da avaliação
+        """
+        if error.position is not None or error.instruction is None:
+            return
+        code, arg = program[error.instruction]
+        if code != OP_RAISE:
+            known = self.error_positions.get((expression, error.instruction))
+            if known is not None and known[0] is program:
+                error.position = known[1]
+                return
+        tokens = self.tokenize_expression(expression)
+        if code == OP_RAISE:
+            index = arg[1]
+            error.position = tokens[index][2] if index < len(tokens) else len(expression)
+            return
+        
+        operators = [i for i, token in enumerate(tokens) if token[0] == TOKEN_OPERATOR]
+        commands = [i - 2 for i, token in enumerate(tokens) if token[0] == TOKEN_RES]
+        codes = [instruction[0] for instruction in program]
+        pc = error.instruction
+        replayed = (sum(1 for c in codes if OP_ADD <= c <= OP_POW) != len(operators)
+                    or codes.count(OP_RES) != len(commands) or OP_TEMP_STORE in codes)
+        if replayed:
+            # Programa otimizado: localiza o erro no programa sem otimização
+            program = self.compile_tokens(tokens, ())
+            current, self.memory = self.memory, memory
+            replay = self.execute_program(program)
+            self.memory = current
+            if replay.__class__ is not ErrorValue or replay.instruction is None:
+                return
+            codes = [instruction[0] for instruction in program]
+            pc = replay.instruction
+        
+        code = codes[pc]
+        if code == OP_RES:
+            # (N RES) é localizado pelo parêntese que o abre
+            ordinal = codes[:pc].count(OP_RES)
+            indices = commands
+        else:
+            ordinal = sum(1 for c in codes[:pc] if OP_ADD <= c <= OP_POW)
+            indices = operators
+        if ordinal < len(indices):
+            error.position = tokens[indices[ordinal]][2]
+        if not replayed:
+            positions = self.error_positions
+            if len(positions) >= PROGRAM_CACHE_SIZE:
+                positions.clear()
+            positions[(expression, error.instruction)] = (program, error.position)
+    
+    def _evaluate_profiled(self, expression):
+        """
+        Versão instrumentada de _evaluate: mede separadamente a análise léxica,
+        a compilação e a execução, e registra os contadores em self.stats.
+        """
+        stats = self.stats
+        cache = self.subexpression_cache
+        if cache is not None:
+            hits, misses = cache.hits, cache.misses
+        clock = time.perf_counter_ns
+        phases = {}
+        program = None
+        error = None
+        memory = self.memory
+        start = clock()
+        try:
+            program = self.programs.get(expression)
+            if program is None:
+                stats.program_cache_misses += 1
+                tokens = self.tokenize_expression(expression)
+                tokenized = clock()
+                phases['tokenize'] = tokenized - start
+                program = self.compile_tokens(tokens)
+                self._store_program(expression, program)
+                compiled = clock()
+                phases['compile'] = compiled - tokenized
+            else:
+                stats.program_cache_hits += 1
+                if self.optimizer is not None and expression not in self.optimized:
+                    program = self._optimize_cached(expression, program)
+                compiled = clock()
+                phases['compile'] = compiled - start
+            result = self.execute_program(program)
+        except Exception as e:
+            result = error = ErrorValue(ERROR_INVALID, str(e))
+            program = None
+        end = clock()
+        if program is not None:
+            phases['execute'] = end - compiled
+            if result.__class__ is ErrorValue:
+                error = result
+                self._locate_error(expression, program, error, memory)
+        if cache is not None:
+            stats.subexpression_cache_hits += cache.hits - hits
+            stats.subexpression_cache_misses += cache.misses - misses
+        stats.record(expression, program, phases, end - start, error)
+        return result, error
+    
+    def compile_expression(self, expression):
+        """
+        Compila uma expressão RPN para um programa e o guarda em cache.
+        Reavaliar a mesma expressão (por exemplo, com outro histórico de
+        resultados ou outro valor na memória) não precisa de nova análise.
+        
+        Parâmetros:
+            expression: String contendo a expressão RPN
+            
+        Retorna:
+            Programa compilado (tupla de instruções)
+        """
+        program = self.compile_tokens(self.tokenize_expression(expression))
+        self._store_program(expression, program)
+        return program
+    
+    def _store_program(self, expression, program):
+        """Guarda um programa compilado no cache de programas."""
+        if self.program_cache_size > 0:
+            if len(self.programs) >= self.program_cache_size:
+                # Descarta a expressão compilada há mais tempo
+                oldest = next(iter(self.programs))
+                del self.programs[oldest]
+                self.optimized.discard(oldest)
+            self.programs[expression] = program
+    
+    def _optimize_cached(self, expression, program):
+        """
+        Otimiza um programa do cache de programas na sua segunda execução.
+        
+        Calcular uma constante na compilação custa o mesmo que calculá-la na
+        execução, então a otimização só compensa para expressões avaliadas
+        mais de uma vez; as demais são executadas sem passar pelo otimizador.
+        
+        Retorna:
+            Programa otimizado (que substitui o original no cache)
+        """
+        optimizer = self.optimizer
+        if self.subexpression_cache is None:
+            # Sem o cache de sub-expressões, as repetições são eliminadas pelo otimizador
+            optimized = tuple(optimizer.optimize(program, keep_groups=False, cse=True))
+        elif optimizer.worth_optimizing(program):
+            optimized = optimizer.optimize(program)
+            optimized = program if optimized is program else self._link_groups(optimized)
+        else:
+            optimized = program
+        self.optimized.add(expression)
+        self.programs[expression] = optimized
+        return optimized
+    
+    def evaluate_tokens(self, tokens):
+        """
+        Avalia uma lista de tokens em notação RPN e retorna o resultado.
+        Os tokens são primeiro traduzidos (em uma única passada) para um programa
+        pós-fixo, que é então executado sobre uma única pilha de operandos.
+        
+        Parâmetros:
+            tokens: Lista de tokens tipados de tokenize_expression
+            
+        Retorna:
+            Resultado da avaliação dos tokens, ou um ErrorValue
+        """
+        return self.execute_program(self.compile_tokens(tokens))
+    
+    def compile_tokens(self, tokens, variables=None, optimize=False):
+        """
+        Traduz uma lista de tokens para um programa pós-fixo linear.
+        
+        A tradução é feita em uma única passada, usando uma pilha explícita de
+        sub-expressões abertas no lugar da recursão. Assim, qualquer profundidade
+        de aninhamento é tratada em tempo O(n), sem cópias da lista de tokens.
+        
+        Como a quantidade de operandos de cada sub-expressão é conhecida durante
+        a tradução, os erros de estrutura (operandos insuficientes, sub-expressão
+        incompleta, parênteses não balanceados, tokens inválidos) viram uma
+        instrução OP_RAISE posicionada exatamente onde a avaliação recursiva
+        original os detectaria. Isso preserva a ordem dos efeitos colaterais
+        (como (V MEM)) e a mensagem de erro reportada.
+        
+        Cada instrução é um par (código, argumento). Constantes já são
+        convertidas para meia precisão e os comandos RES/MEM já têm seus
+        argumentos resolvidos:
+            (OP_PUSH, valor)        empilha uma constante
+            (OP_ADD..OP_POW, símb.) desempilha dois operandos e empilha o resultado
+            (OP_RES, n)             empilha o resultado de N linhas anteriores
+            (OP_MEM_STORE, v)       armazena v na memória e o empilha
+            (OP_MEM_LOAD, None)     empilha o valor da memória
+            (OP_RAISE, (erro, i))   interrompe a avaliação com o ErrorValue do erro,
+                                    detectado no token de índice i
+            (OP_VAR, índice)        empilha o valor de uma variável nomeada
+        
+        Parâmetros:
+            tokens: Lista de tokens tipados de tokenize_expression
+            variables: Sequência opcional de nomes de variáveis aceitos como operandos
+            optimize: Aplica o ExpressionOptimizer (se ativo na calculadora)
+            
+        Retorna:
+            Tupla de instruções do programa pós-fixo
+        """
+        program = []
+        literals = self.literals
+        slots = {name: index for index, name in enumerate(variables or ())}
+        # Sub-expressões só são marcadas para o cache quando ele está ativo e
+        # a expressão não usa variáveis
+        cache_groups = self.subexpression_cache is not None and variables is None
+        # Cada sub-expressão aberta é um quadro:
+        # [início no programa, qtd. de valores, falhou, ignorada, qtd. de tokens, 1º token, 2º token,
+        #  informações para o cache: [itens, tem operador, tem (V MEM), N lidos por RES, lê MEM],
+        #  índice do token '(' que a abriu]
+        frames = [[0, 0, False, False, 0, None, None,
+                   [[], False, False, set(), False] if cache_groups else None, 0]]
+        
+        index = -1
+        for index, (kind, value, _, token) in enumerate(tokens):
+            frame = frames[-1]
+            
+            if kind == TOKEN_LPAREN:
+                # Conta o parêntese como token da sub-expressão atual
+                if frame[4] < 2:
+                    frame[5 + frame[4]] = token
+                frame[4] += 1
+                # Uma sub-expressão dentro de uma região que já falhou nunca é avaliada
+                skip = frame[2] or frame[3]
+                frames.append([len(program), 0, False, skip, 0, None, None,
+                               [[], False, False, set(), False] if cache_groups and not skip else None,
+                               index])
+                if frames[-1][7] is not None:
+                    # Reserva a posição do marcador de início da sub-expressão
+                    program.append(None)
+                continue
+            
+            if kind == TOKEN_RPAREN:
+                if len(frames) == 1:
+                    # Parêntese de fechamento excedente no nível mais externo: ignorado
+                    continue
+                frames.pop()
+                parent = frames[-1]
+                parent[4] += 1
+                if frame[3]:
+                    continue
+                
+                info = frame[7]
+                parent_info = parent[7]
+                count = frame[4]
+                if count == 2 and frame[6] == 'RES':
+                    # COMANDO (N RES): descarta o que foi gerado para os tokens
+                    del program[frame[0]:]
+                    try:
+                        n = int(frame[5])
+                        program.append((OP_RES, n))
+                    except ValueError as e:
+                        program.append((OP_RAISE, (ErrorValue(ERROR_TOKEN, str(e)), frame[8])))
+                        parent[2] = True
+                        continue
+                    if parent_info is not None:
+                        parent_info[0].append(('RES', n))
+                        parent_info[3].add(n)
+                elif count == 2 and frame[6] == 'MEM':
+                    # COMANDO (V MEM)
+                    del program[frame[0]:]
+                    try:
+                        program.append((OP_MEM_STORE, self.to_half_precision(float(frame[5]))))
+                    except ValueError as e:
+                        program.append((OP_RAISE, (ErrorValue(ERROR_TOKEN, str(e)), frame[8])))
+                        parent[2] = True
+                        continue
+                    if parent_info is not None:
+                        parent_info[2] = True
+                elif count == 1 and frame[5] == 'MEM':
+                    # COMANDO (MEM)
+                    del program[frame[0]:]
+                    program.append((OP_MEM_LOAD, None))
+                    if parent_info is not None:
+                        parent_info[0].append(('MEM',))
+                        parent_info[4] = True
+                elif frame[2]:
+                    # O erro já foi gerado dentro da sub-expressão
+                    parent[2] = True
+                    continue
+                elif frame[1] != 1:
+                    # A sub-expressão deve produzir exatamente um valor
+                    program.append((OP_RAISE, (ErrorValue(ERROR_SYNTAX, "Erro: Expressão inválida ou incompleta."), frame[8])))
+                    parent[2] = True
+                    continue
+                elif info is not None:
+                    items, has_op, has_store, res_reads, mem_read = info
+                    if has_op and not has_store:
+                        # Sub-expressão sem efeitos colaterais: marca para o cache
+                        group_id = self._group_id(tuple(items))
+                        program[frame[0]] = [group_id, tuple(sorted(res_reads)), mem_read]
+                        program.append((OP_GROUP_END, None))
+                        items = [('GROUP', group_id)]
+                    parent_info[0].extend(items)
+                    parent_info[1] = parent_info[1] or has_op
+                    parent_info[2] = parent_info[2] or has_store
+                    parent_info[3].update(res_reads)
+                    parent_info[4] = parent_info[4] or mem_read
+                
+                parent[1] += 1
+                continue
+            
+            # Token comum: operador ou operando
+            if frame[4] < 2:
+                frame[5 + frame[4]] = token
+            frame[4] += 1
+            if frame[2] or frame[3]:
+                continue
+            
+            if kind == TOKEN_OPERATOR:
+                code = value
+                # Todos os operadores requerem exatamente dois operandos
+                if frame[1] < 2:
+                    program.append((OP_RAISE, (ErrorValue(ERROR_OPERANDS, f"Erro: Operador {token} requer dois operandos."), index)))
+                    frame[2] = True
+                else:
+                    program.append((code, token))
+                    frame[1] -= 1
+                    if frame[7] is not None:
+                        frame[7][0].append(code)
+                        frame[7][1] = True
+            elif token in slots:
+                program.append((OP_VAR, slots[token]))
+                frame[1] += 1
+            elif kind != TOKEN_NUMBER:
+                program.append((OP_RAISE, (ErrorValue(ERROR_TOKEN, f"Token inválido: {token}"), index)))
+                frame[2] = True
+            else:
+                literal = literals.get(token)
+                if literal is None:
+                    # Converte para meia precisão antes de empilhar
+                    value = self.to_half_precision(value)
+                    # Constantes entram na chave pelo valor exato (distingue 0.0 de -0.0)
+                    literal = (value, value.hex())
+                    if len(literals) >= LITERAL_TABLE_SIZE:
+                        literals.clear()
+                    literals[token] = literal
+                program.append((OP_PUSH, literal[0]))
+                frame[1] += 1
+                if frame[7] is not None:
+                    frame[7][0].append(literal[1])
+        
+        top = frames[0]
+        if len(frames) > 1:
+            # A sub-expressão aberta mais externa nunca foi fechada
+            unclosed = frames[1]
+            if not unclosed[3]:
+                del program[unclosed[0]:]
+                program.append((OP_RAISE, (ErrorValue(ERROR_PARENTHESES, "Erro: Parênteses não balanceados."), unclosed[8])))
+                top[2] = True
+        
+        # VALIDAÇÃO FINAL
+        # Ao final da avaliação, a pilha deve conter exatamente um valor (o resultado final)
+        if not top[2] and top[1] != 1:
+            # Erro detectado no fim da expressão
+            program.append((OP_RAISE, (ErrorValue(ERROR_SYNTAX, "Erro: Expressão inválida ou incompleta."), index + 1)))
+        
+        optimizer = self.optimizer
+        if optimize and optimizer is not None and variables is None and not top[2]:
+            # Sem o cache de sub-expressões, as repetições são eliminadas pelo otimizador
+            if not cache_groups:
+                program = optimizer.optimize(program, keep_groups=False, cse=True)
+            elif optimizer.worth_optimizing(program):
+                program = optimizer.optimize(program)
+        
+        if not cache_groups:
+            return tuple(program)
+        return self._link_groups(program)
+    
+    def _group_id(self, items):
+        """
+        Retorna o identificador interno de um formato de sub-expressão (a sequência
+        normalizada de seus itens, com sub-expressões internas já identificadas).
+        Identificadores nunca são reutilizados, mesmo quando a tabela é esvaziada.
+        """
+        group_id = self.group_ids.get(items)
+        if group_id is None:
+            if len(self.group_ids) >= GROUP_ID_TABLE_SIZE:
+                self.group_ids.clear()
+            group_id = self.next_group_id
+            self.next_group_id += 1
+            self.group_ids[items] = group_id
+        return group_id
+    
+    def _link_groups(self, program):
+        """
+        Finaliza um programa com marcadores de sub-expressão: remove as posições
+        reservadas não usadas e grava em cada OP_GROUP quantas instruções devem
+        ser puladas quando o valor da sub-expressão vem do cache.
+        
+        Instruções de cache:
+            (OP_GROUP, (pulo, id, N lidos por RES, lê MEM))  início de sub-expressão
+            (OP_GROUP_END, None)                             guarda o valor no cache
+        """
+        linked = []
+        starts = []
+        for instruction in program:
+            if instruction is None:
+                continue
+            if instruction.__class__ is list:
+                starts.append((len(linked), instruction))
+                linked.append(None)
+                continue
+            if instruction[0] == OP_GROUP_END:
+                start, (group_id, res_reads, mem_read) = starts.pop()
+                linked[start] = (OP_GROUP, (len(linked) - start, group_id, res_reads, mem_read))
+            linked.append(instruction)
+        return tuple(linked)
+    
+    def execute_program(self, program, variables=()):
+        """
+        Executa um programa compilado por compile_tokens.
+        O despacho é feito diretamente sobre os códigos de operação inteiros,
+        sem comparações de strings nem chamadas de método por operador.
+        
+        Erros não geram exceções: a execução para e devolve um ErrorValue com
+        o código do erro e o índice da instrução que falhou.
+        
+        Parâmetros:
+            program: Sequência de instruções (código, argumento)
+            variables: Valores das variáveis nomeadas, na ordem usada na compilação
+            
+        Retorna:
+            Resultado da avaliação do programa, ou um ErrorValue
+        """
+        # Pilha para armazenar os operandos durante a avaliação
+        stack = []
+        push = stack.append
+        pop = stack.pop
+        half = self.to_half_precision
+        # Chaves das sub-expressões em avaliação cujo valor ainda vai para o cache
+        pending = []
+        # Valores das sub-expressões comuns (OP_TEMP_STORE)
+        temps = []
+        error = None
+        
+        instructions = iter(program)
+        try:
+            for code, arg in instructions:
+                if code == OP_PUSH:
+                    push(arg)
+                elif code <= OP_POW:
+                    # Remove o segundo operando; o primeiro é substituído pelo resultado
+                    b = pop()
+                    a = stack[-1]
+                    if code == OP_ADD:
+                        stack[-1] = half(a + b)
+                    elif code == OP_SUB:
+                        stack[-1] = half(a - b)
+                    elif code == OP_MUL:
+                        stack[-1] = half(a * b)
+                    elif code == OP_REAL_DIV:
+                        if b == 0:
+                            error = ErrorValue(ERROR_DIVISION_BY_ZERO, "Erro: Divisão por zero.")
+                            break
+                        stack[-1] = half(a / b)  # Divisão real
+                    elif code == OP_INT_DIV or code == OP_MOD:
+                        # Os operandos são truncados para inteiros; o divisor antes do
+                        # teste de zero: (3 0.5 /) também divide por zero
+                        try:
+                            b = int(b)
+                            if b:
+                                a = int(a)
+                        except OverflowError:
+                            error = ErrorValue(ERROR_INVALID, "Erro: Operando infinito em divisão inteira.")
+                            break
+                        except ValueError:
+                            error = ErrorValue(ERROR_INVALID, "Erro: Operando NaN em divisão inteira.")
+                            break
+                        if b == 0:
+                            error = ErrorValue(ERROR_DIVISION_BY_ZERO, "Erro: Divisão por zero.")
+                            break
+                        if code == OP_INT_DIV:
+                            stack[-1] = a // b  # Divisão de inteiros
+                        else:
+                            stack[-1] = a % b  # Resto da divisão de inteiros
+                    else:
+                        if not float(b).is_integer() or b < 0:
+                            error = ErrorValue(ERROR_EXPONENT, "Erro: Expoente deve ser um inteiro positivo.")
+                            break
+                        try:
+                            stack[-1] = half(a ** b)  # Potenciação
+                        except OverflowError:
+                            # Resultado além da faixa de float: infinito com o sinal de a ** b
+                            stack[-1] = -math.inf if a < 0 and b % 2 == 1 else math.inf
+                elif code == OP_RES:
+                    # Acessa o resultado N posições para trás no histórico (-1 para índice 0)
+                    if arg < len(self.results):
+                        value = self.results[-(arg+1)]
+                        if value.__class__ is ErrorValue:
+                            # O erro da linha referenciada se propaga
+                            error = ErrorValue(ERROR_PROPAGATED, f"Erro: O resultado de ({arg} RES) é um erro.")
+                            break
+                        push(value)
+                    else:
+                        error = ErrorValue(ERROR_MISSING_RESULT, f"Erro: Não há {arg} resultados anteriores.")
+                        break
+                elif code == OP_MEM_STORE:
+                    self.memory = arg
+                    push(arg)
+                elif code == OP_MEM_LOAD:
+                    push(self.memory)
+                elif code == OP_GROUP:
+                    skip, key, res_reads, mem_read = arg
+                    if res_reads or mem_read:
+                        # A chave inclui o estado lido pela sub-expressão
+                        key = self._group_state_key(key, res_reads, mem_read)
+                    if key is not None:
+                        value = self.subexpression_cache.lookup(key)
+                        if value is not _MISSING:
+                            # Valor já conhecido: pula a sub-expressão inteira
+                            push(value)
+                            next(islice(instructions, skip, skip), None)
+                            continue
+                    pending.append(key)
+                elif code == OP_GROUP_END:
+                    key = pending.pop()
+                    if key is not None:
+                        self.subexpression_cache.store(key, stack[-1])
+                elif code == OP_VAR:
+                    push(variables[arg])
+                elif code == OP_TEMP_STORE:
+                    # Valor de uma sub-expressão repetida, lido depois por OP_TEMP_LOAD
+                    temps.append(stack[-1])
+                elif code == OP_TEMP_LOAD:
+                    push(temps[arg])
+                else:
+                    # OP_RAISE: erro detectado na compilação (o mesmo ErrorValue a
+                    # cada execução do programa)
+                    error = arg[0]
+                    break
+        except IndexError as e:
+            # Resultado fora do histórico (N negativo ou fora da janela)
+            error = ErrorValue(ERROR_MISSING_RESULT, str(e))
+        except (ArithmeticError, ValueError, TypeError) as e:
+            error = ErrorValue(ERROR_INVALID, str(e))
+        
+        if error is not None:
+            error.instruction = len(program) - length_hint(instructions) - 1
+            return error
+        # Retorna o único valor na pilha, que é o resultado da expressão
+        return stack[0]
+    
+    def _group_state_key(self, group_id, res_reads, mem_read):
+        """
+        Monta a chave de cache de uma sub-expressão que lê (N RES) ou (MEM),
+        acrescentando ao identificador os valores lidos. Reais entram pelo valor
+        exato em hexadecimal, para distinguir 1 de 1.0 e 0.0 de -0.0.
+        
+        Retorna:
+            Tupla usada como chave, ou None se algum resultado não existir ou
+            for um erro (nesse caso a sub-expressão é avaliada e gera o erro
+            normalmente)
+        """
+        key = [group_id]
+        results = self.results
+        for n in res_reads:
+            if n < 0 or n >= len(results):
+                return None
+            value = results[-(n+1)]
+            if value.__class__ is ErrorValue:
+                return None
+            key.append(value.hex() if isinstance(value, float) else value)
+        if mem_read:
+            memory = self.memory
+            key.append(memory.hex() if isinstance(memory, float) else memory)
+        return tuple(key)
+    
+    def evaluate_batch(self, expression, columns):
+        """
+        Avalia a mesma expressão para muitas linhas de dados de uma só vez,
+        usando operações vetorizadas do NumPy (dependência opcional).
+        
+        A expressão pode usar variáveis nomeadas como operandos, por exemplo
+        ((A B -) (C D +) *), cujos valores vêm das colunas informadas. Cada
+        operador é aplicado ao vetor inteiro, com a mesma semântica de
+        execute_program: os valores das colunas são arredondados para
+        np.float16 (meia precisão), como os números escritos na expressão, e
+        só / e % truncam os operandos para inteiros de 64 bits.
+        Divisão por zero e expoentes inválidos não interrompem o lote; as
+        linhas afetadas são marcadas na máscara de erros e recebem 0.
+        
+        Parâmetros:
+            expression: String contendo a expressão RPN
+            columns: Dicionário {nome da variável: vetor de valores}
+            
+        Retorna:
+            Par (resultados, erros): vetor de resultados (np.float16 ou
+            np.int64) e vetor booleano indicando as linhas com erro
+        """
+        try:
+            import numpy as np
+        except ImportError:
+            raise ImportError("evaluate_batch requer o pacote numpy (pip install numpy).") from None
+        
+        names = tuple(columns)
+        key = (expression, names)
+        program = self.programs.get(key)
+        if program is None:
+            program = self.compile_tokens(self.tokenize_expression(expression), names)
+            self.programs[key] = program
+        
+        values = []
+        for name in names:
+            column = np.asarray(columns[name])
+            if column.ndim != 1:
+                raise ValueError(f"Erro: A coluna {name} deve ser um vetor.")
+            # Cada valor ocupa o lugar de um número na expressão, que é sempre
+            # lido como real: colunas inteiras também viram np.float16 (acima
+            # de 65504, infinito)
+            with np.errstate(over='ignore'):
+                values.append(column.astype(np.float16))
+        rows = len(values[0]) if values else 1
+        if any(len(column) != rows for column in values):
+            raise ValueError("Erro: Todas as colunas devem ter o mesmo tamanho.")
+        
+        errors = np.zeros(rows, dtype=bool)
+        stack = []
+        with np.errstate(all='ignore'):
+            for code, arg in program:
+                if code == OP_PUSH:
+                    stack.append(np.float16(arg))
+                elif code <= OP_POW:
+                    b = stack.pop()
+                    a = stack.pop()
+                    stack.append(self._operate_batch(np, code, a, b, errors))
+                elif code == OP_VAR:
+                    stack.append(values[arg])
+                elif code == OP_RES:
+                    if arg >= len(self.results):
+                        raise ValueError(f"Erro: Não há {arg} resultados anteriores.")
+                    value = self.results[-(arg+1)]
+                    stack.append(np.int64(value) if isinstance(value, int) else np.float16(value))
+                elif code == OP_MEM_STORE:
+                    self.memory = arg
+                    stack.append(np.float16(arg))
+                elif code == OP_MEM_LOAD:
+                    stack.append(np.float16(self.memory))
+                else:
+                    raise ValueError(arg)
+        
+        result = np.array(np.broadcast_to(stack[0], (rows,)))
+        result[errors] = 0
+        return result, errors
+    
+    def _operate_batch(self, np, code, a, b, errors):
+        """
+        Aplica um operador binário a vetores (ou escalares) do NumPy, com a
+        mesma semântica de execute_program, marcando em `errors` as linhas
+        em que a operação é inválida.
+        """
+        a_int = a.dtype.kind in 'iu'
+        b_int = b.dtype.kind in 'iu'
+        
+        if code == OP_INT_DIV or code == OP_MOD:
+            # Os operandos são truncados para inteiros, como int(a) e int(b)
+            ia = a if a_int else np.trunc(np.where(np.isfinite(a), a, 0)).astype(np.int64)
+            ib = b if b_int else np.trunc(np.where(np.isfinite(b), b, 0)).astype(np.int64)
+            invalid = ib == 0
+            if not a_int:
+                invalid = invalid | ~np.isfinite(a)
+            if not b_int:
+                invalid = invalid | ~np.isfinite(b)
+            errors |= invalid
+            ib = np.where(ib == 0, 1, ib)
+            return ia // ib if code == OP_INT_DIV else ia % ib
+        
+        if code == OP_POW:
+            if b_int:
+                invalid = b < 0
+            else:
+                invalid = ~(np.isfinite(b) & (b >= 0) & (np.floor(b) == b))
+            errors |= invalid
+            b = np.where(invalid, 0, b)
+            if a_int and b_int:
+                return a ** b
+            return (a.astype(np.float64) ** b.astype(np.float64)).astype(np.float16)
+        
+        if code == OP_REAL_DIV:
+            invalid = b == 0
+            errors |= invalid
+            b = np.where(invalid, 1, b)
+            return (a.astype(np.float64) / b.astype(np.float64)).astype(np.float16)
+        
+        if a_int and b_int:
+            # Inteiros só vêm de / e % (ou de (N RES)); como em execute_program,
+            # soma, subtração e multiplicação deles continuam inteiras
+            if code == OP_ADD:
+                return a + b
+            if code == OP_SUB:
+                return a - b
+            return a * b
+        
+        a = a.astype(np.float64)
+        b = b.astype(np.float64)
+        if code == OP_ADD:
+            result = a + b
+        elif code == OP_SUB:
+            result = a - b
+        else:
+            result = a * b
+        return result.astype(np.float16)
+    
+    def tokenize_expression(self, expression):
+        """
+        Converte uma string de expressão RPN em uma lista de tokens tipados
+        (ver scan_expression), na forma aceita por compile_tokens.
+        
+        Parâmetros:
+            expression: String contendo a expressão RPN
+            
+        Retorna:
+            Lista de tuplas (tipo, valor, posição, texto) extraídas da expressão
+        """
+        return scan_expression(expression)
+    
+    def operate(self, a, b, operator):
+        """
+        Realiza a operação especificada entre dois operandos.
+        Suporta +, -, *, |, /, %, ^ com tratamento adequado para cada tipo.
+        
+        Parâmetros:
+            a: Primeiro operando
+            b: Segundo operando
+            operator: Operador a ser aplicado
+            
+        Retorna:
+            Resultado da operação entre a e b
+        """
+        code = OPERATOR_CODES.get(operator)
+        if code is None:
+            raise ValueError(f"Operador desconhecido: {operator}")
+        result = self.execute_program(((OP_PUSH, a), (OP_PUSH, b), (code, operator)))
+        if result.__class__ is ErrorValue:
+            raise ValueError(result.message)
+        return result
+    
+    def process_file(self, filename, verbose=True, fail_fast=False, output=None, report_format='text',
+                     checkpoint=None, checkpoint_interval=CHECKPOINT_INTERVAL, resume=False):
+        """
+        Processa um arquivo contendo expressões RPN (uma por linha).
+        Avalia cada expressão e armazena o resultado. Os erros são
+        registrados em self.error_summary.
+        
+        Parâmetros:
+            filename: Caminho do arquivo a ser processado
+            verbose: Se verdadeiro, imprime o relatório de cada linha
+            fail_fast: Se verdadeiro, para na primeira linha com erro
+            output: Arquivo para o relatório (padrão: a saída padrão, se verbose)
+            report_format: 'text' ou 'binary' (ver BinaryReportWriter)
+            checkpoint: Arquivo de checkpoint, gravado a cada checkpoint_interval
+                        linhas (ver save_checkpoint) e apagado ao fim do arquivo
+            checkpoint_interval: Quantidade de linhas entre dois checkpoints
+            resume: Se verdadeiro, continua do checkpoint, se houver um válido
+            
+        Retorna:
+            Lista com os resultados de cada expressão avaliada (ErrorValue nas
+            linhas com erro); ao retomar um checkpoint, a partir da linha
+            seguinte a ele
+        """
+        if output is None and verbose:
+            output = sys.stdout if report_format == 'text' else sys.stdout.buffer
+        self.file_error = None
+        state = None
+        if checkpoint is not None:
+            state = self._resume(checkpoint, filename, output) if resume else None
+            if state is None:
+                self.file_position = (0, 0)
+        report = open_report(output, report_format, state is not None) if output is not None else None
+        summary = self.error_summary
+        try:
+            results = []
+            with open(filename, 'r' if checkpoint is None else 'rb') as file:
+                if checkpoint is None:
+                    records = self._evaluate_lines(file)
+                else:
+                    line_no, offset = self.file_position
+                    records = self._checkpointed(
+                        self._evaluate_lines(self._read_lines(file, offset, line_no + 1), line_no + 1),
+                        checkpoint, checkpoint_interval, filename, report, output)
+                for line_no, line, result, error in records:
+                    results.append(result)
+                    if report is not None:
+                        report.write(line_no, line, result, error)
+                    if error is not None:
+                        summary.add(line_no, line, error)
+                        if fail_fast:
+                            break
+            
+            return results
+        except FileNotFoundError:
+            self.file_error = f"Erro: Arquivo '{filename}' não encontrado."
+            print(self.file_error)
+            return []
+        except Exception as e:
+            self.file_error = f"Erro ao processar arquivo: {str(e)}"
+            print(self.file_error)
+            return []
+        finally:
+            if report is not None:
+                self._flush_report(report)
+    
+    def _flush_report(self, report):
+        """
+        Escreve o que restou do relatório ao final de process_file ou
+        stream_file; uma falha de escrita fica registrada em self.file_error.
+        """
+        try:
+            report.flush()
+        except OSError as e:
+            if self.file_error is None:
+                self.file_error = f"Erro ao escrever o relatório: {str(e)}"
+                print(self.file_error)
+    
+    def _evaluate_lines(self, lines, first_line_no=1):
+        """
+        Avalia as linhas não vazias de um iterável, acrescentando cada resultado
+        ao histórico.
+        
+        Parâmetros:
+            lines: Iterável de linhas (por exemplo, um arquivo aberto)
+            first_line_no: Número da primeira linha do iterável no arquivo
+            
+        Retorna:
+            Gerador de tuplas (número da linha, expressão, resultado, erro)
+        """
+        if self.result_cache is not None:
+            yield from self._evaluate_lines_cached(lines, first_line_no)
+            return
+        evaluate = self._evaluate
+        stats = self.stats
+        for i, line in enumerate(lines, first_line_no - 1):
+            line = line.strip()
+            if line:
+                if stats is not None:
+                    stats.line_no = i + 1
+                result, error = evaluate(line)
+                self.results.append(result)
+                yield i + 1, line, result, error
+    
+    def _evaluate_lines_cached(self, lines, first_line_no=1):
+        """
+        Versão de _evaluate_lines que consulta o cache persistente por trechos
+        de RESULT_CACHE_CHUNK_LINES linhas.
+        
+        A chave de cada trecho inclui, além do texto, o valor da memória no
+        início (se o trecho usa MEM) e o estado de cada (N RES) que lê antes do
+        trecho: o valor lido, ou a falta dele. Assim um trecho só é reaproveitado
+        quando produziria exatamente os mesmos resultados.
+        """
+        cache = self.result_cache
+        numbered = enumerate(lines, first_line_no)
+        while True:
+            chunk = []
+            for line_no, line in islice(numbered, RESULT_CACHE_CHUNK_LINES):
+                line = line.strip()
+                if line:
+                    chunk.append((line_no, line))
+            if not chunk:
+                return
+            texts = [line for _, line in chunk]
+            state = self._chunk_state(texts)
+            key = cache.key(texts, state)
+            entry = cache.get(key)
+            if entry is not None:
+                results, errors, memory = entry
+                for result in results:
+                    self.results.append(result)
+                if memory is not None:
+                    self.memory = memory
+                for (line_no, line), result, error in zip(chunk, results, errors):
+                    yield line_no, line, result, error
+                continue
+            
+            results = []
+            errors = []
+            for line_no, line in chunk:
+                result, error = self._evaluate(line)
+                self.results.append(result)
+                results.append(result)
+                errors.append(error)
+                yield line_no, line, result, error
+            cache.put(key, (results, errors, self.memory if state[0] is not None else None))
+    
+    def _chunk_state(self, texts):
+        """
+        Estado de que um trecho depende (ver _evaluate_lines_cached).
+        
+        Retorna:
+            Tupla (memória ou None, estado de cada RES)
+        """
+        memory = None
+        if any('MEM' in line for line in texts):
+            memory = _value_key(self.memory)
+        base = len(self.results)
+        references = []
+        for offset, line in enumerate(texts):
+            if 'RES' not in line:
+                continue
+            program = self.programs.get(line)
+            if program is None:
+                try:
+                    program = self.compile_expression(line)
+                except Exception:
+                    # O erro de compilação não depende do estado
+                    continue
+            for code, arg in program:
+                if code != OP_RES:
+                    continue
+                target = base + offset - arg - 1 if arg >= 0 else -arg - 1
+                if target >= base:
+                    # Resultado do próprio trecho: depende só da posição
+                    references.append(('i', target - base))
+                elif target < 0:
+                    references.append(('x',))
+                else:
+                    try:
+                        references.append(('v', _value_key(self.results[target])))
+                    except IndexError:
+                        references.append(('x',))
+        return memory, tuple(references)
+    
+    def max_res_depth(self, filename):
+        """
+        Percorre o arquivo procurando o maior N usado em um comando (N RES).
+        
+        Parâmetros:
+            filename: Caminho do arquivo de expressões
+            
+        Retorna:
+            Maior N encontrado (-1 se o arquivo não usa RES), ou None se algum
+            N negativo exigir o histórico completo
+        """
+        depth = -1
+        with open(filename, 'r') as file:
+            for line in file:
+                if 'RES' not in line:
+                    continue
+                line = line.strip()
+                program = self.programs.get(line)
+                if program is None:
+                    program = self.compile_expression(line)
+                for code, arg in program:
+                    if code == OP_RES:
+                        if arg < 0:
+                            return None
+                        depth = max(depth, arg)
+        return depth
+    
+    def _resize_history(self, window):
+        """Troca o histórico por um ResultHistory circular de window resultados, com os últimos já guardados."""
+        previous = list(self.results)[-window:] if window else []
+        self.results = ResultHistory(window, previous, len(self.results) - len(previous))
+    
+    def _growing_history(self, lines):
+        """
+        Repassa as linhas, aumentando a janela do histórico antes de cada linha
+        com um (N RES) que volta além dela (ver iter_file). O N vem do programa
+        já compilado ou, para uma linha nova, dos tokens, sem compilá-la.
+        """
+        for line in lines:
+            if 'RES' in line:
+                program = self.programs.get(line.strip())
+                if program is not None:
+                    depths = [arg for code, arg in program if code == OP_RES]
+                else:
+                    tokens = scan_expression(line)
+                    depths = []
+                    for index in range(2, len(tokens) - 1):
+                        if (tokens[index][0] == TOKEN_RES and tokens[index - 2][0] == TOKEN_LPAREN
+                                and tokens[index + 1][0] == TOKEN_RPAREN):
+                            try:
+                                depths.append(int(tokens[index - 1][3]))
+                            except ValueError:
+                                pass
+                results = self.results
+                window = results.window
+                if depths and window is not None:
+                    if min(depths) < 0:
+                        # N negativo lê a partir do primeiro resultado, se nenhum
+                        # foi descartado ainda
+                        if not results.start and len(results) <= window:
+                            self.results = ResultHistory(None, list(results))
+                    elif max(depths) >= window:
+                        self._resize_history(max(2 * window, max(depths) + 1))
+            yield line
+    
+    def iter_file(self, filename, window=None, full_history=False, position=None):
+        """
+        Avalia um arquivo de expressões de forma preguiçosa, uma linha por vez,
+        sem carregá-lo inteiro na memória.
+        
+        O histórico de resultados passa a ser um ResultHistory circular de
+        STREAM_HISTORY_SIZE resultados, que cresce antes de cada linha com um
+        (N RES) além da janela; assim o arquivo é lido uma única vez e o
+        consumo de memória não cresce com o tamanho do arquivo. Um (N RES) que
+        volta mais que a janela já usada (ou N negativo) depois de mais de
+        STREAM_HISTORY_SIZE linhas exige full_history; sem ele, a linha falha
+        com ERROR_MISSING_RESULT, pois o resultado já foi descartado. A
+        mensagem de erro de cada linha fica disponível em self.last_error.
+        
+        Parâmetros:
+            filename: Caminho do arquivo a ser processado
+            window: Tamanho fixo do histórico; se None, a janela cresce sob demanda
+            full_history: Se verdadeiro, mantém o histórico completo (por
+                          exemplo, para gravá-lo depois com save_state)
+            position: (número da última linha já avaliada, posição em bytes)
+                      para começar depois dela; com position, a leitura
+                      atualiza self.file_position (ver save_checkpoint)
+            
+        Retorna:
+            Gerador de tuplas (número da linha, expressão, resultado)
+        """
+        growing = window is None and not full_history
+        if growing:
+            window = STREAM_HISTORY_SIZE
+        if window is not None:
+            self._resize_history(window)
+        
+        if position is None:
+            with open(filename, 'r') as file:
+                lines = self._growing_history(file) if growing else file
+                for line_no, line, result, error in self._evaluate_lines(lines):
+                    self.last_error = error
+                    yield line_no, line, result
+            return
+        
+        line_no, offset = position
+        with open(filename, 'rb') as file:
+            lines = self._read_lines(file, offset, line_no + 1)
+            if growing:
+                lines = self._growing_history(lines)
+            for line_no, line, result, error in self._evaluate_lines(lines, line_no + 1):
+                self.last_error = error
+                yield line_no, line, result
+    
+    def stream_file(self, filename, output=None, window=None, full_history=False, fail_fast=False,
+                    report_format='text', checkpoint=None, checkpoint_interval=CHECKPOINT_INTERVAL,
+                    resume=False, generator=None):
+        """
+        Processa um arquivo em modo streaming, com memória constante.
+        O relatório é o mesmo de process_file, mas escrito em blocos; sem
+        saída, apenas avalia as expressões. Os erros são registrados em
+        self.error_summary.
+        
+        Parâmetros:
+            filename: Caminho do arquivo a ser processado
+            output: Arquivo para o relatório (None para não gerar relatório)
+            window: Tamanho do histórico de resultados (ver iter_file)
+            full_history: Mantém o histórico completo (ver iter_file)
+            fail_fast: Se verdadeiro, para na primeira linha com erro
+            report_format: 'text' ou 'binary' (ver BinaryReportWriter)
+            checkpoint: Arquivo de checkpoint (ver process_file)
+            checkpoint_interval: Quantidade de linhas entre dois checkpoints
+            resume: Se verdadeiro, continua do checkpoint, se houver um válido
+            generator: Gerador de Assembly (ver code_generator) que recebe cada
+                       linha avaliada, para gerar o Assembly sem ler o arquivo
+                       de novo
+            
+        Retorna:
+            Quantidade de expressões avaliadas (nesta execução); em caso de
+            falha, self.file_error guarda a mensagem
+        """
+        self.file_error = None
+        state = None
+        if checkpoint is not None:
+            state = self._resume(checkpoint, filename, output) if resume else None
+            if state is None:
+                self.file_position = (0, 0)
+            else:
+                # O histórico restaurado já tem a janela da execução original
+                full_history = True
+        report = open_report(output, report_format, state is not None) if output is not None else None
+        summary = self.error_summary
+        count = 0
+        try:
+            records = self.iter_file(filename, window, full_history,
+                                     self.file_position if checkpoint is not None else None)
+            if checkpoint is not None:
+                records = self._checkpointed(records, checkpoint, checkpoint_interval, filename,
+                                             report, output)
+            for line_no, line, result in records:
+                count += 1
+                error = self.last_error
+                if report is not None:
+                    report.write(line_no, line, result, error)
+                if generator is not None:
+                    # O gerador reaproveita o programa compilado na avaliação
+                    generator.add_line(line_no, line, self.programs.get(line))
+                if error is not None:
+                    summary.add(line_no, line, error)
+                    if fail_fast:
+                        break
+        except FileNotFoundError:
+            self.file_error = f"Erro: Arquivo '{filename}' não encontrado."
+            print(self.file_error)
+        except Exception as e:
+            self.file_error = f"Erro ao processar arquivo: {str(e)}"
+            print(self.file_error)
+        finally:
+            if report is not None:
+                self._flush_report(report)
+        return count
+    
+    def code_generator(self, fold_constants=True):
+        """
+        Cria o gerador de Assembly AVR (o módulo avr_codegen só é carregado
+        aqui, quando o Assembly é pedido).
+        
+        Parâmetros:
+            fold_constants: Ver generate_arduino_assembly
+            
+        Retorna:
+            AVRCodeGenerator que recebe as linhas por add_line
+        """
+        from avr_codegen import AVRCodeGenerator
+        return AVRCodeGenerator(self, fold_constants)
+    
+    def generate_arduino_assembly(self, filename, output_filename="arduino_code.asm", fold_constants=True,
+                                  generator=None):
+        """
+        Gera código Assembly para Arduino a partir do arquivo de expressões RPN.
+        Cada expressão é compilada para instruções AVR reais (ver
+        AVRCodeGenerator); o resultado de cada linha fica no buffer results.
+        
+        Parâmetros:
+            filename: Caminho do arquivo de entrada com expressões RPN
+            output_filename: Caminho do arquivo de saída para o código Assembly
+            fold_constants: Se falso, as operações entre constantes também são
+                            feitas pelo código gerado (útil para medir as rotinas)
+            generator: Gerador (de code_generator) que já recebeu as linhas do
+                       arquivo durante a avaliação; nesse caso o arquivo não é
+                       lido de novo
+            
+        Retorna:
+            Booleano indicando sucesso ou falha na geração do código
+        """
+        try:
+            from avr_codegen import AVR_SRAM_SIZE, AVR_STACK_RESERVE
+            if generator is None:
+                generator = self.code_generator(fold_constants)
+                with open(filename, 'r') as file:
+                    assembly_code = generator.generate(file)
+            else:
+                assembly_code = generator.generate()
+            
+            # Escreve o código assembly no arquivo de saída
+            with open(output_filename, 'w') as out_file:
+                out_file.write('\n'.join(assembly_code))
+            
+            print(f"Código Assembly gerado e salvo em '{output_filename}'.")
+            # memory (2 bytes), results (2 bytes por expressão) e errors (1 byte por expressão)
+            data_size = 2 + 3 * len(generator.result_types) + 2 * generator.temp_count
+            if data_size > AVR_SRAM_SIZE - AVR_STACK_RESERVE:
+                print(f"Aviso: os dados ({data_size} bytes) não cabem na SRAM do Arduino "
+                      f"({AVR_SRAM_SIZE} bytes, {AVR_STACK_RESERVE} reservados para a pilha).")
+            return True
+        except Exception as e:
+            print(f"Erro ao gerar código Assembly: {str(e)}")
+            return False
+
+
+def _evaluate_shard(filename, start, end, first_line_no, memory, collect_stats=False):
+    """
+    Avalia um trecho de um arquivo em um processo trabalhador, com uma
+    calculadora própria. Usada pelo ParallelEvaluator.
+    
+    Parâmetros:
+        filename: Caminho do arquivo de expressões
+        start, end: Posições (em bytes) do início e do fim do trecho
+        first_line_no: Número da primeira linha do trecho no arquivo
+        memory: Valor inicial da memória (V MEM) no início do trecho
+        collect_stats: Se verdadeiro, também devolve as estatísticas do trecho
+        
+    Retorna:
+        Lista de tuplas (número da linha, expressão, resultado, erro), ou o par
+        (lista, CalculatorStats) quando collect_stats é verdadeiro
+    """
+    calculator = RPNCalculator()
+    calculator.memory = memory
+    if collect_stats:
+        calculator.enable_stats()
+    with open(filename, 'rb') as file:
+        file.seek(start)
+        data = file.read(end - start) if end is not None else file.read()
+    lines = data.decode('utf-8').split('\n')
+    records = list(calculator._evaluate_lines(lines, first_line_no))
+    if collect_stats:
+        return records, calculator.stats
+    return records
+
+
+class ParallelEvaluator:
+    """
+    Avalia vários arquivos de expressões (ou trechos de um arquivo grande) em
+    paralelo, com um ProcessPoolExecutor e uma RPNCalculator por tarefa.
+    
+    Os resultados são devolvidos na ordem original. Um arquivo só é dividido
+    em pontos onde nenhuma dependência atravessa a fronteira: nenhum (N RES)
+    posterior ao corte pode se referir a uma linha anterior a ele, e o valor
+    da memória no corte precisa ser conhecido sem avaliar as linhas anteriores
+    (isto é, ser o valor inicial ou o de um (V MEM) que sempre é executado).
+    """
+    
+    def __init__(self, jobs=None, collect_stats=False):
+        """
+        Parâmetros:
+            jobs: Quantidade de processos trabalhadores (None usa todos os núcleos)
+            collect_stats: Se verdadeiro, as estatísticas de todas as tarefas são
+                           acumuladas em self.stats à medida que os resultados
+                           são consumidos
+        """
+        self.jobs = jobs
+        self.stats = CalculatorStats() if collect_stats else None
+        # Calculadora usada apenas para compilar as linhas na análise de dependências
+        self.calculator = RPNCalculator()
+    
+    def plan_shards(self, filename, shards):
+        """
+        Divide um arquivo em até `shards` trechos independentes de tamanhos
+        parecidos.
+        
+        Parâmetros:
+            filename: Caminho do arquivo de expressões
+            shards: Quantidade desejada de trechos
+            
+        Retorna:
+            Lista de tuplas (início, fim, primeira linha, memória inicial), com
+            início e fim em bytes (fim None no último trecho)
+        """
+        compile_expression = self.calculator.compile_expression
+        programs = self.calculator.programs
+        offsets = array('q')    # Posição de cada expressão no arquivo
+        line_nos = array('q')   # Número da linha de cada expressão
+        lowest = array('q')     # Menor resultado anterior referenciado por (N RES)
+        memory_known = []       # (índice, valor) onde a memória passa a ser conhecida
+        memory_lost = []        # Índices onde a memória deixa de ser conhecida
+        
+        position = 0
+        index = 0
+        with open(filename, 'rb') as file:
+            for line_no, raw in enumerate(file, 1):
+                start = position
+                position += len(raw)
+                if not raw.strip():
+                    continue
+                offsets.append(start)
+                line_nos.append(line_no)
+                reference = index
+                if b'RES' in raw or b'MEM' in raw:
+                    line = raw.decode('utf-8').strip()
+                    program = programs.get(line)
+                    if program is None:
+                        program = compile_expression(line)
+                    stores = 0
+                    for code, arg in program:
+                        if code == OP_RES:
+                            # Resultados acessados com N negativo são contados a partir
+                            # do início do histórico, então não há corte possível antes
+                            target = index - arg - 1 if arg >= 0 else 0
+                            if 0 <= target < reference:
+                                reference = target
+                        elif code == OP_MEM_STORE:
+                            stores += 1
+                    if stores:
+                        if stores == 1 and program[0][0] == OP_MEM_STORE:
+                            # O armazenamento é a primeira instrução: sempre executa
+                            memory_known.append((index + 1, program[0][1]))
+                        else:
+                            memory_lost.append(index + 1)
+                lowest.append(reference)
+                index += 1
+        
+        total = index
+        if shards <= 1 or total < 2:
+            return [(0, None, 1, 0.0)]
+        
+        # Um corte antes da expressão k é válido se todas as expressões a partir
+        # de k só dependem de resultados a partir de k
+        suffix = array('q', lowest)
+        for i in range(total - 2, -1, -1):
+            if suffix[i + 1] < suffix[i]:
+                suffix[i] = suffix[i + 1]
+        
+        # Valor conhecido da memória antes de cada expressão (None = desconhecido)
+        events = sorted([(i, True, v) for i, v in memory_known] +
+                        [(i, False, None) for i in memory_lost], key=lambda e: e[0])
+        
+        cuts = [(0, 0.0)]
+        memory = 0.0
+        known = True
+        event = 0
+        size = total / shards
+        for k in range(1, total):
+            if len(cuts) >= shards:
+                break
+            while event < len(events) and events[event][0] <= k:
+                known = events[event][1]
+                if known:
+                    memory = events[event][2]
+                event += 1
+            if known and suffix[k] >= k and k >= size * len(cuts):
+                cuts.append((k, memory))
+        
+        # Converte os índices das expressões em posições no arquivo
+        plan = []
+        for i, (first, memory) in enumerate(cuts):
+            end = offsets[cuts[i + 1][0]] if i + 1 < len(cuts) else None
+            plan.append((offsets[first], end, line_nos[first], memory))
+        return plan
+    
+    def evaluate(self, filenames, shards=1):
+        """
+        Avalia arquivos em paralelo. Todas as tarefas são enviadas de uma vez
+        e os resultados de cada arquivo são consumidos na ordem original.
+        
+        Parâmetros:
+            filenames: Lista de caminhos de arquivos
+            shards: Quantidade de trechos em que cada arquivo pode ser dividido
+            
+        Retorna:
+            Gerador de pares (arquivo, registros), em que registros é um gerador
+            de tuplas (número da linha, expressão, resultado, erro) na ordem das
+            linhas do arquivo
+        """
+        from concurrent.futures import ProcessPoolExecutor
+        
+        with ProcessPoolExecutor(max_workers=self.jobs) as executor:
+            tasks = []
+            for filename in filenames:
+                futures = [executor.submit(_evaluate_shard, filename, start, end, first_line_no, memory,
+                                           self.stats is not None)
+                           for start, end, first_line_no, memory in self.plan_shards(filename, shards)]
+                tasks.append((filename, futures))
+            
+            for filename, futures in tasks:
+                yield filename, (record for future in futures for record in self._shard_records(future))
+    
+    def _shard_records(self, future):
+        """Registros de uma tarefa, acumulando suas estatísticas se estiverem ativas"""
+        if self.stats is None:
+            return future.result()
+        records, stats = future.result()
+        self.stats.merge(stats)
+        return records
+
+
+class IncrementalEvaluator:
+    """
+    Reavaliação incremental de um arquivo de expressões que foi editado.
+    
+    Guarda, para cada expressão da última avaliação, o texto, o resultado, o
+    erro, o valor da memória depois dela e suas dependências: os N dos
+    comandos (N RES) e se ela lê ou grava a memória. Ao receber a nova versão
+    do arquivo, as linhas são casadas com as da versão anterior e uma linha só
+    é reavaliada se:
+    - o texto mudou (ou a linha é nova);
+    - algum (N RES) passou a apontar para outra linha, ou para uma linha cujo
+      resultado mudou;
+    - ela lê ou grava a memória e o valor da memória antes dela mudou.
+    As demais reaproveitam o resultado anterior, em uma única passada.
+    """
+    
+    def __init__(self, calculator=None):
+        """
+        Parâmetros:
+            calculator: RPNCalculator usada nas reavaliações (uma nova, se None)
+        """
+        self.calculator = calculator if calculator is not None else RPNCalculator()
+        self.expressions = []
+        self.line_nos = []
+        self.results = ResultHistory()
+        self.errors = []
+        self.memory_after = []
+        # None para expressões sem RES/MEM; senão (N de cada RES, lê MEM, grava MEM)
+        self.dependencies = []
+        # Índices das expressões reavaliadas na última chamada de evaluate
+        self.reevaluated = []
+    
+    def _dependencies(self, expression):
+        """Dependências de uma expressão (ver self.dependencies)"""
+        if 'RES' not in expression and 'MEM' not in expression:
+            return None
+        calculator = self.calculator
+        program = calculator.programs.get(expression)
+        if program is None:
+            program = calculator.compile_expression(expression)
+        res_args = tuple(arg for code, arg in program if code == OP_RES)
+        reads = any(code == OP_MEM_LOAD for code, _ in program)
+        stores = any(code == OP_MEM_STORE for code, _ in program)
+        if not (res_args or reads or stores):
+            return None
+        return res_args, reads, stores
+    
+    @staticmethod
+    def match_lines(old, new, max_edits=INCREMENTAL_MAX_EDITS):
+        """
+        Casa as expressões da nova versão com as da anterior pelo algoritmo de
+        diferença de Myers, que custa O((N+M)·D) para D linhas inseridas ou
+        removidas: barato quando poucas linhas de um arquivo grande mudam.
+        
+        Parâmetros:
+            old: Expressões da versão anterior
+            new: Expressões da nova versão
+            max_edits: Acima desta quantidade de edições, as linhas entre a
+                       primeira e a última diferença não são casadas
+            
+        Retorna:
+            Lista com o índice da expressão anterior correspondente a cada nova
+            expressão (-1 para expressões novas ou alteradas)
+        """
+        n, m = len(old), len(new)
+        mapping = [-1] * m
+        
+        def run_length(x, y):
+            # Tamanho do trecho igual a partir de old[x] e new[y] (busca exponencial)
+            limit = min(n - x, m - y)
+            if limit <= 0 or old[x] != new[y]:
+                return 0
+            low, high = 1, 2
+            while high <= limit and old[x:x + high] == new[y:y + high]:
+                low, high = high, high * 2
+            high = min(high, limit + 1)
+            while high - low > 1:
+                middle = (low + high) // 2
+                if old[x:x + middle] == new[y:y + middle]:
+                    low = middle
+                else:
+                    high = middle
+            return low
+        
+        # Avanço: v[k] é o maior x alcançado na diagonal k = x - y
+        v = {1: 0}
+        trace = []
+        for d in range(min(n + m, max_edits) + 1):
+            trace.append(v.copy())
+            for k in range(-d, d + 1, 2):
+                if k == -d or (k != d and v[k - 1] < v[k + 1]):
+                    x = v[k + 1]
+                else:
+                    x = v[k - 1] + 1
+                x += run_length(x, x - k)
+                v[k] = x
+                if x >= n and x - k >= m:
+                    break
+            else:
+                continue
+            break
+        else:
+            # Edições demais: casa apenas o prefixo e o sufixo comuns
+            prefix = run_length(0, 0)
+            mapping[:prefix] = range(prefix)
+            suffix = 0
+            while suffix < min(n, m) - prefix and old[n - 1 - suffix] == new[m - 1 - suffix]:
+                suffix += 1
+            mapping[m - suffix:] = range(n - suffix, n)
+            return mapping
+        
+        # Retrocesso pelo caminho encontrado, registrando os trechos iguais
+        x, y = n, m
+        for d in range(len(trace) - 1, -1, -1):
+            v = trace[d]
+            k = x - y
+            if k == -d or (k != d and v[k - 1] < v[k + 1]):
+                previous_k = k + 1
+            else:
+                previous_k = k - 1
+            previous_x = v[previous_k]
+            previous_y = previous_x - previous_k
+            count = min(x - max(previous_x, 0), y - max(previous_y, 0))
+            if count > 0:
+                mapping[y - count:y] = range(x - count, x)
+            x, y = previous_x, previous_y
+        return mapping
+    
+    def evaluate(self, expressions, line_nos=None):
+        """
+        Avalia a nova versão das expressões, reaproveitando os resultados da
+        versão anterior sempre que possível.
+        
+        Parâmetros:
+            expressions: Lista com as expressões (linhas não vazias, sem espaços nas pontas)
+            line_nos: Número da linha de cada expressão no arquivo (padrão: 1, 2, ...)
+            
+        Retorna:
+            Quantidade de expressões reavaliadas
+        """
+        old_expressions = self.expressions
+        old_results = self.results
+        old_errors = self.errors
+        old_memory_after = self.memory_after
+        old_dependencies = self.dependencies
+        mapping = self.match_lines(old_expressions, expressions)
+        
+        calculator = self.calculator
+        results = ResultHistory()
+        errors = []
+        memory_after = []
+        dependencies = []
+        reevaluated = []
+        # changed[j] = 1 se o resultado da expressão j difere do anterior
+        changed = bytearray(len(expressions))
+        calculator.results = results
+        memory = 0.0
+        
+        for j, expression in enumerate(expressions):
+            i = mapping[j]
+            if i >= 0:
+                deps = old_dependencies[i]
+                reuse = True
+                if deps is not None:
+                    res_args, reads, stores = deps
+                    for n in res_args:
+                        # Posição lida por (N RES) nas duas versões (N negativo conta do início)
+                        target, old_target = (j - n - 1, i - n - 1) if n >= 0 else (-n - 1, -n - 1)
+                        valid = 0 <= target < j
+                        if valid != (0 <= old_target < i) or (
+                                valid and (mapping[target] != old_target or changed[target])):
+                            reuse = False
+                            break
+                    if reuse and (reads or stores):
+                        old_memory = old_memory_after[i - 1] if i > 0 else 0.0
+                        reuse = _value_key(old_memory) == _value_key(memory)
+                if reuse:
+                    result = old_results[i]
+                    error = old_errors[i]
+                    if deps is not None and deps[2]:
+                        memory = old_memory_after[i]
+                    results.append(result)
+                    errors.append(error)
+                    memory_after.append(memory)
+                    dependencies.append(deps)
+                    continue
+            else:
+                deps = self._dependencies(expression)
+            
+            calculator.memory = memory
+            result, error = calculator._evaluate(expression)
+            memory = calculator.memory
+            if i < 0 or _value_key(result) != _value_key(old_results[i]):
+                changed[j] = 1
+            results.append(result)
+            errors.append(error)
+            memory_after.append(memory)
+            dependencies.append(deps)
+            reevaluated.append(j)
+        
+        self.expressions = list(expressions)
+        self.line_nos = list(line_nos) if line_nos is not None else list(range(1, len(expressions) + 1))
+        self.results = results
+        self.errors = errors
+        self.memory_after = memory_after
+        self.dependencies = dependencies
+        self.reevaluated = reevaluated
+        calculator.memory = memory
+        return len(reevaluated)
+    
+    def evaluate_file(self, filename):
+        """
+        Lê o arquivo e o avalia com evaluate.
+        
+        Retorna:
+            Quantidade de expressões reavaliadas
+        """
+        expressions = []
+        line_nos = []
+        with open(filename, 'r') as file:
+            for line_no, line in enumerate(file, 1):
+                line = line.strip()
+                if line:
+                    expressions.append(line)
+                    line_nos.append(line_no)
+        return self.evaluate(expressions, line_nos)
+    
+    def records(self):
+        """
+        Retorna:
+            Gerador de tuplas (número da linha, expressão, resultado, erro)
+        """
+        return zip(self.line_nos, self.expressions, self.results, self.errors)
+    
+    def save(self, filename):
+        """
+        Grava o estado da última avaliação (substituição atômica do arquivo).
+        O arquivo usa pickle: carregue apenas estados gerados por você.
+        """
+        import os
+        import pickle
+        state = {
+            'version': INCREMENTAL_STATE_VERSION,
+            'expressions': self.expressions,
+            'line_nos': self.line_nos,
+            'results': self.results,
+            'errors': self.errors,
+            'memory_after': self.memory_after,
+            'dependencies': self.dependencies,
+        }
+        temporary = filename + '.tmp'
+        with open(temporary, 'wb') as file:
+            pickle.dump(state, file, protocol=pickle.HIGHEST_PROTOCOL)
+        os.replace(temporary, filename)
+    
+    def load(self, filename):
+        """
+        Carrega o estado gravado por save.
+        
+        Retorna:
+            Verdadeiro se o estado foi carregado; falso se o arquivo não existe
+            ou é de outra versão (a próxima avaliação será completa)
+        """
+        import pickle
+        try:
+            with open(filename, 'rb') as file:
+                state = pickle.load(file)
+        except (OSError, pickle.UnpicklingError, EOFError):
+            return False
+        if not isinstance(state, dict) or state.get('version') != INCREMENTAL_STATE_VERSION:
+            return False
+        self.expressions = state['expressions']
+        self.line_nos = state['line_nos']
+        self.results = state['results']
+        self.errors = state['errors']
+        self.memory_after = state['memory_after']
+        self.dependencies = state['dependencies']
+        return True
@@ -0,0 +1,235 @@
+#!/usr/bin/env python3
+"""
+Servidor da calculadora RPN
+Mantém um processo Python com as calculadoras carregadas e avalia expressões
+recebidas por TCP ou por um socket Unix, evitando o custo de iniciar um novo
+processo a cada avaliação.
+
+Protocolo (texto UTF-8, uma linha por mensagem):
+- cada linha não vazia enviada é uma expressão, e recebe exatamente uma linha
+  de resposta, na ordem de envio: "OK <resultado>" ou "ERRO <mensagem>";
+- linhas vazias são ignoradas, como nos arquivos de expressões;
+- o cliente pode enviar várias linhas sem esperar as respostas (pipelining);
+- linhas que começam com '!' são comandos da sessão, respondidos com "OK":
+  "!session NOME" passa a usar a sessão nomeada (mantida entre conexões),
+  "!reset" apaga os resultados e a memória da sessão atual.
+
+Cada conexão começa em uma sessão própria: os resultados de (N RES) e a
+memória de (V MEM) de uma sessão não são vistos pelas outras. Cada sessão
+guarda apenas os últimos SESSION_HISTORY_SIZE resultados, e só as
+MAX_SESSIONS sessões nomeadas usadas mais recentemente são mantidas.
+"""
+
+import asyncio
+import os
+import stat
+import sys
+
+from rpn_calculator import ResultHistory, RPNCalculator
+
+# Endereço padrão do servidor TCP
+DEFAULT_HOST = '127.0.0.1'
+DEFAULT_PORT = 7878
+
+# Quantidade de bytes lidos do socket por vez
+READ_SIZE = 65536
+
+# Maior linha aceita; acima disso a conexão é encerrada
+MAX_LINE_SIZE = 65536
+
+# Quantidade de resultados mantidos por sessão para (N RES); um resultado
+# mais antigo é respondido com erro. O histórico começa pequeno e só ocupa
+# esse tamanho quando a sessão avalia essa quantidade de expressões
+SESSION_HISTORY_SIZE = 65536
+
+# Quantidade máxima de sessões nomeadas; ao passar dela, a sessão usada há
+# mais tempo é descartada
+MAX_SESSIONS = 1024
+
+
+class Session:
+    """Estado de uma sessão: a calculadora com seus resultados e memória."""
+
+    def __init__(self, history_size=SESSION_HISTORY_SIZE):
+        """
+        Parâmetros:
+            history_size: Quantidade de resultados mantidos para (N RES)
+        """
+        self.history_size = history_size
+        self.calculator = RPNCalculator()
+        self.calculator.results = ResultHistory(history_size)
+
+    def reset(self):
+        """Apaga os resultados e a memória da sessão."""
+        self.calculator.results = ResultHistory(self.history_size)
+        self.calculator.memory = 0.0
+
+    def evaluate(self, line):
+        """
+        Avalia uma expressão e acrescenta o resultado ao histórico da sessão.
+
+        Retorna:
+            Linha de resposta do protocolo (sem a quebra de linha)
+        """
+        calculator = self.calculator
+        result, error = calculator._evaluate(line)
+        calculator.results.append(result)
+        if error is not None:
+            return f"ERRO {error}"
+        return f"OK {result}"
+
+
+class CalculatorServer:
+    """
+    Servidor asyncio do protocolo de linhas descrito no módulo.
+    Todas as conexões são atendidas por um único laço de eventos; as linhas
+    recebidas de uma vez são avaliadas em lote e suas respostas enviadas em
+    uma única escrita.
+    """
+
+    def __init__(self, max_sessions=MAX_SESSIONS, history_size=SESSION_HISTORY_SIZE):
+        """
+        Parâmetros:
+            max_sessions: Quantidade máxima de sessões nomeadas mantidas
+            history_size: Quantidade de resultados mantidos por sessão
+        """
+        self.max_sessions = max_sessions
+        self.history_size = history_size
+        # Sessões nomeadas (comando "!session NOME"), compartilhadas entre
+        # conexões, da usada há mais tempo para a mais recente
+        self.sessions = {}
+        self.connections = 0
+        self.expressions = 0
+
+    def command(self, line, session):
+        """
+        Executa um comando de sessão.
+
+        Retorna:
+            Par (linha de resposta, sessão a usar a partir de agora)
+        """
+        name, _, argument = line[1:].partition(' ')
+        argument = argument.strip()
+        if name == 'session' and argument:
+            sessions = self.sessions
+            session = sessions.pop(argument, None)
+            if session is None:
+                session = Session(self.history_size)
+                if len(sessions) >= self.max_sessions:
+                    # Descarta a sessão usada há mais tempo (as conexões que a
+                    # usam continuam com ela até trocar de sessão)
+                    del sessions[next(iter(sessions))]
+            sessions[argument] = session
+            return "OK", session
+        if name == 'reset':
+            session.reset()
+            return "OK", session
+        return f"ERRO Comando desconhecido: {line}", session
+
+    async def handle(self, reader, writer):
+        """Atende uma conexão até o cliente fechá-la."""
+        self.connections += 1
+        session = Session(self.history_size)
+        pending = b''
+        try:
+            while True:
+                data = await reader.read(READ_SIZE)
+                if not data:
+                    break
+                pending += data
+                end = pending.rfind(b'\n')
+                if end < 0:
+                    if len(pending) > MAX_LINE_SIZE:
+                        writer.write(b"ERRO Linha muito longa\n")
+                        break
+                    continue
+                lines = pending[:end].split(b'\n')
+                pending = pending[end + 1:]
+
+                responses = []
+                for raw in lines:
+                    line = raw.decode('utf-8', 'replace').strip()
+                    if not line:
+                        continue
+                    if line[0] == '!':
+                        response, session = self.command(line, session)
+                    else:
+                        response = session.evaluate(line)
+                        self.expressions += 1
+                    responses.append(response)
+                if responses:
+                    responses.append('')
+                    writer.write('\n'.join(responses).encode())
+                    await writer.drain()
+
+            # Última linha sem quebra de linha no fim da conexão
+            line = pending.decode('utf-8', 'replace').strip()
+            if line and line[0] != '!' and len(pending) <= MAX_LINE_SIZE:
+                writer.write(f"{session.evaluate(line)}\n".encode())
+                await writer.drain()
+        except ConnectionError:
+            pass
+        finally:
+            writer.close()
+            try:
+                await writer.wait_closed()
+            except ConnectionError:
+                pass
+
+    async def serve(self, host=DEFAULT_HOST, port=DEFAULT_PORT, unix_path=None, ready=None):
+        """
+        Atende conexões até o processo ser interrompido.
+
+        Parâmetros:
+            host, port: Endereço TCP (ignorado com unix_path)
+            unix_path: Caminho do socket Unix
+            ready: Função chamada com o asyncio.Server quando ele começa a aceitar conexões
+        """
+        if unix_path is not None:
+            server = await asyncio.start_unix_server(self.handle, path=unix_path)
+        else:
+            server = await asyncio.start_server(self.handle, host, port)
+        if ready is not None:
+            ready(server)
+        async with server:
+            await server.serve_forever()
+
+
+def main():
+    """Inicia o servidor pela linha de comando."""
+    import argparse
+
+    parser = argparse.ArgumentParser(
+        prog="server.py",
+        description="Servidor da calculadora RPN (uma expressão por linha, respostas na ordem).")
+    parser.add_argument("--host", default=DEFAULT_HOST, help=f"endereço TCP (padrão: {DEFAULT_HOST})")
+    parser.add_argument("--port", type=int, default=DEFAULT_PORT, help=f"porta TCP (padrão: {DEFAULT_PORT})")
+    parser.add_argument("--unix", metavar="CAMINHO", help="usa um socket Unix em vez de TCP")
+    parser.add_argument("--max-sessions", type=int, default=MAX_SESSIONS,
+                        help=f"quantidade máxima de sessões nomeadas (padrão: {MAX_SESSIONS})")
+    parser.add_argument("--history", type=int, default=SESSION_HISTORY_SIZE,
+                        help=f"resultados mantidos por sessão para (N RES) (padrão: {SESSION_HISTORY_SIZE})")
+    args = parser.parse_args()
+
+    def ready(server):
+        addresses = ', '.join(str(sock.getsockname()) for sock in server.sockets)
+        print(f"Servidor da calculadora RPN aguardando conexões em {addresses}", flush=True)
+
+    def remove_socket():
+        # Remove apenas um socket antigo, nunca um arquivo comum
+        if args.unix and os.path.exists(args.unix) and stat.S_ISSOCK(os.stat(args.unix).st_mode):
+            os.remove(args.unix)
+
+    remove_socket()
+    try:
+        server = CalculatorServer(max(args.max_sessions, 1), max(args.history, 1))
+        asyncio.run(server.serve(args.host, args.port, args.unix, ready))
+    except KeyboardInterrupt:
+        pass
+    finally:
+        remove_socket()
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
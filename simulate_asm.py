@@ -4,205 +4,1725 @@ Simulador de código Assembly para Arduino
 Este script interpreta o código Assembly gerado e simula sua execução
 """
 
+import os
 import sys
 import re
+import ast
+import struct
+import time
+from array import array
+
+# Instruções suportadas. O código de operação de cada instrução decodificada é
+# a sua posição nesta tupla, usada para indexar a tabela de tratadores.
+INSTRUCTIONS = (
+    'nop', 'ldi', 'mov', 'movw', 'add', 'adc', 'sub', 'sbc', 'subi', 'sbci',
+    'and', 'andi', 'or', 'ori', 'eor', 'com', 'neg', 'inc', 'dec', 'lsr',
+    'ror', 'asr', 'swap', 'mul', 'cp', 'cpc', 'cpi', 'cpse', 'adiw', 'sbiw',
+    'ld', 'st', 'ldd', 'std', 'lds', 'sts', 'push', 'pop', 'in', 'out',
+    'sbi', 'cbi', 'rjmp', 'jmp', 'rcall', 'call', 'ret', 'brbs', 'brbc',
+    'sbrc', 'sbrs', 'bset', 'bclr', 'bst', 'bld',
+)
+OPCODES = {name: code for code, name in enumerate(INSTRUCTIONS)}
+
+# Ciclos de cada instrução no ATmega328P (desvios tomados e instruções puladas
+# somam os ciclos extras no próprio tratador)
+CYCLES = {
+    'mul': 2, 'adiw': 2, 'sbiw': 2, 'ld': 2, 'st': 2, 'ldd': 2, 'std': 2,
+    'lds': 2, 'sts': 2, 'push': 2, 'pop': 2, 'sbi': 2, 'cbi': 2,
+    'rjmp': 2, 'jmp': 3, 'rcall': 3, 'call': 4, 'ret': 4,
+}
+
+# Instruções que ocupam duas palavras de 16 bits na memória de programa
+TWO_WORD_INSTRUCTIONS = frozenset(('jmp', 'call', 'lds', 'sts'))
+
+# Formato dos operandos de cada instrução:
+#   d = registrador de destino, r = registrador de origem, K = constante,
+#   k = endereço (rótulo ou endereço de dados), p = ponteiro (X, X+, -X, ...),
+#   q = ponteiro com deslocamento (Y+q ou Z+q), A = endereço de E/S,
+#   b = número do bit
+OPERAND_FORMATS = {
+    'nop': '', 'ret': '',
+    'ldi': 'dK', 'subi': 'dK', 'sbci': 'dK', 'andi': 'dK', 'ori': 'dK',
+    'cpi': 'dK', 'adiw': 'dK', 'sbiw': 'dK',
+    'mov': 'dr', 'movw': 'dr', 'add': 'dr', 'adc': 'dr', 'sub': 'dr',
+    'sbc': 'dr', 'and': 'dr', 'or': 'dr', 'eor': 'dr', 'mul': 'dr',
+    'cp': 'dr', 'cpc': 'dr', 'cpse': 'dr',
+    'com': 'd', 'neg': 'd', 'inc': 'd', 'dec': 'd', 'lsr': 'd', 'ror': 'd',
+    'asr': 'd', 'swap': 'd', 'push': 'd', 'pop': 'd',
+    'ld': 'dp', 'st': 'pr', 'ldd': 'dq', 'std': 'qr', 'lds': 'dk', 'sts': 'kr',
+    'in': 'dA', 'out': 'Ar', 'sbi': 'Ab', 'cbi': 'Ab',
+    'rjmp': 'k', 'jmp': 'k', 'rcall': 'k', 'call': 'k',
+    'brbs': 'bk', 'brbc': 'bk', 'sbrc': 'db', 'sbrs': 'db',
+    'bset': 'b', 'bclr': 'b', 'bst': 'db', 'bld': 'db',
+}
+
+# Bits do registrador de estado (SREG)
+FLAG_C = 0x01  # Carry
+FLAG_Z = 0x02  # Zero
+FLAG_N = 0x04  # Negativo
+FLAG_V = 0x08  # Overflow em complemento de dois
+FLAG_S = 0x10  # Sinal (N xor V)
+FLAG_H = 0x20  # Meio carry
+FLAG_T = 0x40  # Bit de transferência
+FLAG_I = 0x80  # Interrupções habilitadas
+SREG_FLAGS = 'CZNVSHTI'
+
+# Mnemônicos que o montador traduz para outra instrução:
+#   desvios condicionais -> brbs/brbc, set/clt/sec/... -> bset/bclr,
+#   clr/tst/lsl/rol -> eor/and/add/adc com o mesmo registrador, ser -> ldi 0xFF
+BRANCH_ALIASES = {
+    'brcs': ('brbs', 0), 'brlo': ('brbs', 0), 'brcc': ('brbc', 0), 'brsh': ('brbc', 0),
+    'breq': ('brbs', 1), 'brne': ('brbc', 1), 'brmi': ('brbs', 2), 'brpl': ('brbc', 2),
+    'brvs': ('brbs', 3), 'brvc': ('brbc', 3), 'brlt': ('brbs', 4), 'brge': ('brbc', 4),
+    'brhs': ('brbs', 5), 'brhc': ('brbc', 5), 'brts': ('brbs', 6), 'brtc': ('brbc', 6),
+    'brie': ('brbs', 7), 'brid': ('brbc', 7),
+}
+FLAG_ALIASES = {
+    'se' + flag.lower(): ('bset', bit) for bit, flag in enumerate(SREG_FLAGS)
+}
+FLAG_ALIASES.update({
+    'cl' + flag.lower(): ('bclr', bit) for bit, flag in enumerate(SREG_FLAGS)
+})
+REGISTER_ALIASES = {'clr': 'eor', 'tst': 'and', 'lsl': 'add', 'rol': 'adc'}
+
+# Nomes dos registradores ponteiro (X = r27:r26, Y = r29:r28, Z = r31:r30)
+POINTER_REGISTERS = {'X': 26, 'Y': 28, 'Z': 30}
+REGISTER_NAMES = {
+    'xl': 26, 'xh': 27, 'yl': 28, 'yh': 29, 'zl': 30, 'zh': 31,
+}
+
+# Espaço de dados do ATmega328P: registradores (0x00-0x1F), E/S (0x20-0x5F),
+# E/S estendida (0x60-0xFF) e SRAM (0x100 até RAMEND). O espaço inteiro de
+# 16 bits é alocado para que qualquer endereço calculado seja válido.
+DATA_SPACE_SIZE = 0x10000
+IO_OFFSET = 0x20
+SRAM_START = 0x0100
+RAMEND = 0x08FF
+SPL_ADDRESS = 0x5D
+SPH_ADDRESS = 0x5E
+SREG_ADDRESS = 0x5F
+UCSR0A_ADDRESS = 0xC0
+UDR0_ADDRESS = 0xC6
+
+# Símbolos do ATmega328P conhecidos sem o arquivo m328pdef.inc (endereços de
+# E/S como usados por in/out; os registradores estendidos usam lds/sts)
+DEFAULT_SYMBOLS = {
+    'RAMEND': RAMEND, 'SRAM_START': SRAM_START,
+    'SPL': SPL_ADDRESS - IO_OFFSET, 'SPH': SPH_ADDRESS - IO_OFFSET,
+    'SREG': SREG_ADDRESS - IO_OFFSET,
+    'PINB': 0x03, 'DDRB': 0x04, 'PORTB': 0x05,
+    'PINC': 0x06, 'DDRC': 0x07, 'PORTC': 0x08,
+    'PIND': 0x09, 'DDRD': 0x0A, 'PORTD': 0x0B,
+    'UCSR0A': UCSR0A_ADDRESS, 'UCSR0B': 0xC1, 'UCSR0C': 0xC2,
+    'UBRR0L': 0xC4, 'UBRR0H': 0xC5, 'UDR0': UDR0_ADDRESS,
+    'RXC0': 7, 'TXC0': 6, 'UDRE0': 5, 'RXEN0': 4, 'TXEN0': 3,
+    'UCSZ01': 2, 'UCSZ00': 1,
+}
+
+# Níveis de rastreamento da execução:
+#   off: nenhuma saída; summary: apenas o resumo final;
+#   instructions: uma linha por instrução; sampled: uma linha a cada N instruções
+TRACE_LEVELS = ('off', 'summary', 'instructions', 'sampled')
+
+# Limite padrão de instruções executadas (proteção contra laços infinitos)
+DEFAULT_MAX_STEPS = 10_000_000
+
+# Intervalo padrão (em instruções) do rastreamento por amostragem
+DEFAULT_SAMPLE_INTERVAL = 1000
+
+# Quantidade de linhas (ou registros binários) acumuladas antes de cada escrita
+TRACE_BLOCK_SIZE = 4096
+
+# Registro do arquivo de rastreamento binário: ciclos acumulados antes da
+# instrução (uint32), endereço da instrução (uint16) e código de operação (uint8)
+TRACE_RECORD = struct.Struct('<IHB')
+
+# Checkpoints da simulação: versão do formato e intervalo padrão, em
+# instruções, entre duas gravações
+CHECKPOINT_VERSION = 1
+DEFAULT_CHECKPOINT_INTERVAL = 10_000_000
+
+# Memória de programa do ATmega328P (32 KiB) e formatos da imagem gravada pelo
+# montador: Intel HEX (como o avr-objcopy -O ihex) ou binário puro
+FLASH_SIZE = 0x8000
+IMAGE_FORMATS = ('hex', 'bin')
+HEX_RECORD_SIZE = 16
+
+# Codificação das instruções (manual do conjunto de instruções AVR): bits fixos
+# de cada instrução, agrupadas pelo formato dos operandos
+#   dois registradores (0000 00rd dddd rrrr), constante de 8 bits com
+#   registrador r16-r31 (0000 KKKK dddd KKKK) e um registrador (0000 000d dddd 0000)
+REGISTER_PAIR_ENCODINGS = {
+    'cpc': 0x0400, 'sbc': 0x0800, 'add': 0x0C00, 'cpse': 0x1000, 'cp': 0x1400,
+    'sub': 0x1800, 'adc': 0x1C00, 'and': 0x2000, 'eor': 0x2400, 'or': 0x2800,
+    'mov': 0x2C00, 'mul': 0x9C00,
+}
+IMMEDIATE_ENCODINGS = {
+    'cpi': 0x3000, 'sbci': 0x4000, 'subi': 0x5000, 'ori': 0x6000, 'andi': 0x7000,
+    'ldi': 0xE000,
+}
+SINGLE_REGISTER_ENCODINGS = {
+    'com': 0x9400, 'neg': 0x9401, 'swap': 0x9402, 'inc': 0x9403, 'asr': 0x9405,
+    'lsr': 0x9406, 'ror': 0x9407, 'dec': 0x940A, 'pop': 0x900F, 'push': 0x920F,
+}
+# ld/st pelos ponteiros: bits fixos de ld para cada (registrador base, modo)
+# (st soma 0x0200). ld Y/ld Z são ldd com deslocamento 0.
+POINTER_ENCODINGS = {
+    (26, 0): 0x900C, (26, 1): 0x900D, (26, -1): 0x900E,
+    (28, 0): 0x8008, (28, 1): 0x9009, (28, -1): 0x900A,
+    (30, 0): 0x8000, (30, 1): 0x9001, (30, -1): 0x9002,
+}
+# Bits fixos das demais instruções (os operandos são somados em encode_instruction)
+FIXED_ENCODINGS = {
+    'nop': 0x0000, 'movw': 0x0100, 'adiw': 0x9600, 'sbiw': 0x9700, 'lds': 0x9000,
+    'sts': 0x9200, 'in': 0xB000, 'out': 0xB800, 'cbi': 0x9800, 'sbi': 0x9A00,
+    'rjmp': 0xC000, 'rcall': 0xD000, 'jmp': 0x940C, 'call': 0x940E, 'ret': 0x9508,
+    'brbs': 0xF000, 'brbc': 0xF400, 'bld': 0xF800, 'bst': 0xFA00, 'sbrc': 0xFC00,
+    'sbrs': 0xFE00, 'bset': 0x9408, 'bclr': 0x9488,
+}
+# Decodificação: código de cada grupo pelos bits fixos (com a máscara do grupo)
+REGISTER_PAIR_DECODINGS = {bits: name for name, bits in REGISTER_PAIR_ENCODINGS.items()}
+IMMEDIATE_DECODINGS = {bits: name for name, bits in IMMEDIATE_ENCODINGS.items()}
+SINGLE_REGISTER_DECODINGS = {bits: name for name, bits in SINGLE_REGISTER_ENCODINGS.items()}
+POINTER_DECODINGS = {bits: pointer for pointer, bits in POINTER_ENCODINGS.items() if bits & 0x1000}
+
+# Operações permitidas nas expressões dos operandos
+_BINARY_OPERATORS = {
+    ast.Add: lambda a, b: a + b,
+    ast.Sub: lambda a, b: a - b,
+    ast.Mult: lambda a, b: a * b,
+    ast.FloorDiv: lambda a, b: a // b,
+    ast.Div: lambda a, b: a // b,
+    ast.LShift: lambda a, b: a << b,
+    ast.RShift: lambda a, b: a >> b,
+    ast.BitAnd: lambda a, b: a & b,
+    ast.BitOr: lambda a, b: a | b,
+    ast.BitXor: lambda a, b: a ^ b,
+}
+_FUNCTIONS = {
+    'low': lambda v: v & 0xFF,
+    'high': lambda v: (v >> 8) & 0xFF,
+    'lo8': lambda v: v & 0xFF,
+    'hi8': lambda v: (v >> 8) & 0xFF,
+}
+
+
+def _add_flags(a, b, result):
+    """
+    Calcula os bits H, S, V, N, Z e C de uma soma de 8 bits (add/adc).
+
+    Parâmetros:
+        a, b: Operandos de 8 bits
+        result: Soma sem truncamento (pode passar de 8 bits)
+
+    Retorna:
+        Bits do SREG afetados pela soma
+    """
+    r = result & 0xFF
+    carries = (a & b) | ((a | b) & ~r)
+    n = r >> 7
+    v = ((a ^ r) & (b ^ r)) >> 7 & 1
+    return ((result >> 8) | (r == 0) << 1 | n << 2 | v << 3 | (n ^ v) << 4
+            | (carries & 0x08) << 2)
+
+
+def _sub_flags(a, b, result):
+    """
+    Calcula os bits H, S, V, N, Z e C de uma subtração de 8 bits
+    (sub/sbc/subi/sbci/cp/cpc/cpi/neg).
+
+    Parâmetros:
+        a, b: Minuendo e subtraendo de 8 bits
+        result: Diferença sem truncamento (negativa quando há empréstimo)
+
+    Retorna:
+        Bits do SREG afetados pela subtração
+    """
+    r = result & 0xFF
+    borrows = (~a & b) | ((~a | b) & r)
+    n = r >> 7
+    v = ((a ^ b) & (a ^ r)) >> 7 & 1
+    return ((result < 0) | (r == 0) << 1 | n << 2 | v << 3 | (n ^ v) << 4
+            | (borrows & 0x08) << 2)
+
+
+def _shift_flags(result, carry):
+    """Bits S, V, N, Z e C dos deslocamentos para a direita (lsr/ror/asr)"""
+    n = result >> 7
+    return carry | (result == 0) << 1 | n << 2 | (n ^ carry) << 3 | carry << 4
+
+
+# Bits N, Z e S de cada resultado de 8 bits das operações lógicas (V = 0), e
+# de inc/dec (V indica a passagem de 0x7F para 0x80 e vice-versa)
+LOGIC_FLAGS = bytes((r == 0) << 1 | (r >> 7) * (FLAG_N | FLAG_S) for r in range(256))
+INC_FLAGS = bytes(LOGIC_FLAGS[r] ^ (FLAG_V | FLAG_S) * (r == 0x80) for r in range(256))
+DEC_FLAGS = bytes(LOGIC_FLAGS[r] | (FLAG_V | FLAG_S) * (r == 0x7F) for r in range(256))
+
+
+def encode_instruction(record, address):
+    """
+    Codifica uma instrução decodificada nas palavras de 16 bits da memória de
+    programa. Operandos que a instrução real não aceita (por exemplo, ldi com
+    r0-r15 ou um desvio fora do alcance) geram ValueError.
+
+    Parâmetros:
+        record: Tupla (código de operação, operando a, operando b, tamanho),
+                como as de AVRSimulator.decode
+        address: Endereço da instrução em palavras (para os desvios relativos)
+
+    Retorna:
+        Lista com 1 ou 2 palavras
+    """
+    opcode, a, b, size = record
+    name = INSTRUCTIONS[opcode]
+    if name in REGISTER_PAIR_ENCODINGS:
+        return [REGISTER_PAIR_ENCODINGS[name] | (b & 0x10) << 5 | a << 4 | b & 0x0F]
+    if name in IMMEDIATE_ENCODINGS:
+        if a < 16:
+            raise ValueError(f"{name} aceita apenas os registradores r16-r31")
+        k = b & 0xFF
+        return [IMMEDIATE_ENCODINGS[name] | (k & 0xF0) << 4 | (a - 16) << 4 | k & 0x0F]
+    if name in SINGLE_REGISTER_ENCODINGS:
+        return [SINGLE_REGISTER_ENCODINGS[name] | a << 4]
+    if name in ('ld', 'st'):
+        register, pointer = (a, b) if name == 'ld' else (b, a)
+        return [POINTER_ENCODINGS[pointer] | (name == 'st') << 9 | register << 4]
+    if name in ('ldd', 'std'):
+        register, (base, q) = (a, b) if name == 'ldd' else (b, a)
+        return [0x8000 | (q & 0x20) << 8 | (q & 0x18) << 7 | (name == 'std') << 9
+                | register << 4 | (base == 28) << 3 | q & 0x07]
+
+    bits = FIXED_ENCODINGS[name]
+    if name == 'movw':
+        if a & 1 or b & 1:
+            raise ValueError("movw aceita apenas registradores pares")
+        return [bits | a << 3 | b >> 1]
+    if name in ('adiw', 'sbiw'):
+        if a not in (24, 26, 28, 30) or not 0 <= b <= 63:
+            raise ValueError(f"{name} aceita apenas r24, r26, r28 e r30 e constantes de 0 a 63")
+        return [bits | (b & 0x30) << 2 | (a - 24) << 3 | b & 0x0F]
+    if name in ('lds', 'sts'):
+        register, k = (a, b) if name == 'lds' else (b, a)
+        return [bits | register << 4, k & 0xFFFF]
+    if name in ('in', 'out'):
+        register, port = (a, b) if name == 'in' else (b, a)
+        port -= IO_OFFSET
+        if not 0 <= port <= 63:
+            raise ValueError(f"endereço de E/S fora do intervalo 0..63 em {name}")
+        return [bits | (port & 0x30) << 5 | register << 4 | port & 0x0F]
+    if name in ('sbi', 'cbi'):
+        port = a - IO_OFFSET
+        if not 0 <= port <= 31:
+            raise ValueError(f"endereço de E/S fora do intervalo 0..31 em {name}")
+        return [bits | port << 3 | b.bit_length() - 1]
+    if name in ('rjmp', 'rcall'):
+        offset = a - address - 1
+        if not -2048 <= offset <= 2047:
+            raise ValueError(f"destino fora do alcance de {name} (2K palavras)")
+        return [bits | offset & 0x0FFF]
+    if name in ('jmp', 'call'):
+        return [bits | (a >> 17 & 0x1F) << 4 | a >> 16 & 1, a & 0xFFFF]
+    if name in ('brbs', 'brbc'):
+        offset = b - address - 1
+        if not -64 <= offset <= 63:
+            raise ValueError("destino fora do alcance do desvio condicional (64 palavras)")
+        return [bits | (offset & 0x7F) << 3 | a.bit_length() - 1]
+    if name in ('bld', 'bst', 'sbrc', 'sbrs'):
+        return [bits | a << 4 | b.bit_length() - 1]
+    if name in ('bset', 'bclr'):
+        return [bits | (a.bit_length() - 1) << 4]
+    return [bits]
+
+
+def decode_instruction(word, next_word, address):
+    """
+    Decodifica uma palavra da memória de programa (o inverso de encode_instruction).
+
+    Parâmetros:
+        word: Palavra de 16 bits no endereço da instrução
+        next_word: Palavra seguinte (usada por lds, sts, jmp e call), ou None
+        address: Endereço da instrução em palavras
+
+    Retorna:
+        Tupla (código de operação, operando a, operando b, tamanho em palavras);
+        palavras de instruções não suportadas geram ValueError
+    """
+    d = word >> 4 & 0x1F
+    name = REGISTER_PAIR_DECODINGS.get(word & 0xFC00)
+    if name is not None:
+        return (OPCODES[name], d, word >> 5 & 0x10 | word & 0x0F, 1)
+    name = IMMEDIATE_DECODINGS.get(word & 0xF000)
+    if name is not None:
+        return (OPCODES[name], 16 + (d & 0x0F), word >> 4 & 0xF0 | word & 0x0F, 1)
+    name = SINGLE_REGISTER_DECODINGS.get(word & 0xFE0F)
+    if name is not None:
+        return (OPCODES[name], d, None, 1)
+
+    if word == 0x0000:
+        return (OPCODES['nop'], None, None, 1)
+    if word == 0x9508:
+        return (OPCODES['ret'], None, None, 1)
+    if word & 0xFF00 == 0x0100:
+        return (OPCODES['movw'], (word >> 4 & 0x0F) * 2, (word & 0x0F) * 2, 1)
+    if word & 0xFC0F == 0x9000 or word & 0xFE0C == 0x940C:
+        if next_word is None:
+            raise ValueError(f"instrução de 2 palavras incompleta (0x{word:04X})")
+        if word & 0xFC0F == 0x9000:
+            if word & 0x0200:
+                return (OPCODES['sts'], next_word, d, 2)
+            return (OPCODES['lds'], d, next_word, 2)
+        target = (word >> 4 & 0x1F) << 17 | (word & 1) << 16 | next_word
+        return (OPCODES['call' if word & 0x0002 else 'jmp'], target, None, 2)
+    if word & 0xFC00 == 0x9000 and word & 0xFC0F in POINTER_DECODINGS:
+        pointer = POINTER_DECODINGS[word & 0xFC0F]
+        if word & 0x0200:
+            return (OPCODES['st'], pointer, d, 1)
+        return (OPCODES['ld'], d, pointer, 1)
+    if word & 0xD000 == 0x8000:
+        displacement = (28 if word & 0x0008 else 30,
+                        word >> 8 & 0x20 | word >> 7 & 0x18 | word & 0x07)
+        if word & 0x0200:
+            return (OPCODES['std'], displacement, d, 1)
+        return (OPCODES['ldd'], d, displacement, 1)
+    if word & 0xFF0F == 0x9408:
+        return (OPCODES['bclr' if word & 0x0080 else 'bset'], 1 << (word >> 4 & 0x07), None, 1)
+    if word & 0xFE00 == 0x9600:
+        return (OPCODES['sbiw' if word & 0x0100 else 'adiw'], 24 + (word >> 3 & 0x06),
+                word >> 2 & 0x30 | word & 0x0F, 1)
+    if word & 0xFD00 == 0x9800:
+        return (OPCODES['sbi' if word & 0x0200 else 'cbi'], IO_OFFSET + (word >> 3 & 0x1F),
+                1 << (word & 0x07), 1)
+    if word & 0xF000 == 0xB000:
+        port = IO_OFFSET + (word >> 5 & 0x30 | word & 0x0F)
+        if word & 0x0800:
+            return (OPCODES['out'], port, d, 1)
+        return (OPCODES['in'], d, port, 1)
+    if word & 0xE000 == 0xC000:
+        offset = (word & 0x0FFF) - (word & 0x0800) * 2
+        return (OPCODES['rcall' if word & 0x1000 else 'rjmp'], address + 1 + offset, None, 1)
+    if word & 0xF800 == 0xF000:
+        offset = (word >> 3 & 0x7F) - (word >> 3 & 0x40) * 2
+        return (OPCODES['brbc' if word & 0x0400 else 'brbs'], 1 << (word & 0x07),
+                address + 1 + offset, 1)
+    if word & 0xF808 == 0xF800:
+        name = ('bld', 'bst', 'sbrc', 'sbrs')[word >> 9 & 0x03]
+        return (OPCODES[name], d, 1 << (word & 0x07), 1)
+    raise ValueError(f"palavra 0x{word:04X} não corresponde a uma instrução suportada")
+
+
+def format_instruction(record):
+    """Texto de uma instrução decodificada, no formato aceito por AVRSimulator.decode"""
+    opcode, a, b, size = record
+    name = INSTRUCTIONS[opcode]
+    operands = []
+    for kind, value in zip(OPERAND_FORMATS[name], (a, b)):
+        if kind in 'dr':
+            operands.append(f"r{value}")
+        elif kind == 'p':
+            base, mode = value
+            pointer = 'XYZ'[(base - 26) // 2]
+            operands.append('-' + pointer if mode < 0 else pointer + '+' * mode)
+        elif kind == 'q':
+            base, q = value
+            operands.append(f"{'XYZ'[(base - 26) // 2]}+{q}")
+        elif kind == 'A':
+            operands.append(f"0x{value - IO_OFFSET:02X}")
+        elif kind == 'b':
+            operands.append(str(value.bit_length() - 1))
+        else:
+            operands.append(str(value))
+    return f"{name} {', '.join(operands)}" if operands else name
+
+
+def write_intel_hex(data, stream):
+    """
+    Grava bytes da memória de programa no formato Intel HEX (registros de dados
+    de HEX_RECORD_SIZE bytes e o registro de fim de arquivo).
+
+    Parâmetros:
+        data: Conteúdo da memória de programa, a partir do endereço 0
+        stream: Arquivo de texto de saída
+    """
+    lines = []
+    for offset in range(0, len(data), HEX_RECORD_SIZE):
+        if offset and not offset & 0xFFFF:
+            # Registro de endereço estendido (bits 16-31) a cada 64 KiB
+            record = bytes((2, 0, 0, 4, offset >> 24, offset >> 16 & 0xFF))
+            lines.append(f":{record.hex().upper()}{-sum(record) & 0xFF:02X}\n")
+        chunk = bytes(data[offset:offset + HEX_RECORD_SIZE])
+        record = bytes((len(chunk), offset >> 8 & 0xFF, offset & 0xFF, 0)) + chunk
+        lines.append(f":{record.hex().upper()}{-sum(record) & 0xFF:02X}\n")
+    lines.append(":00000001FF\n")
+    stream.write(''.join(lines))
+
+
+def read_intel_hex(lines):
+    """
+    Lê um arquivo Intel HEX (registros de dados, de fim de arquivo e de
+    endereço estendido).
+
+    Parâmetros:
+        lines: Linhas do arquivo
+
+    Retorna:
+        bytearray com a memória de programa a partir do endereço 0 (os
+        intervalos não gravados ficam zerados)
+    """
+    data = bytearray()
+    base = 0
+    for line_num, line in enumerate(lines, 1):
+        line = line.strip()
+        if not line:
+            continue
+        try:
+            if line[0] != ':':
+                raise ValueError
+            record = bytes.fromhex(line[1:])
+        except ValueError:
+            raise ValueError(f"linha {line_num} do arquivo HEX inválida") from None
+        if len(record) < 5 or len(record) != record[0] + 5 or sum(record) & 0xFF:
+            raise ValueError(f"linha {line_num} do arquivo HEX inválida (tamanho ou checksum)")
+        kind = record[3]
+        if kind == 0:
+            address = base + (record[1] << 8 | record[2])
+            end = address + record[0]
+            if end > len(data):
+                data.extend(bytes(end - len(data)))
+            data[address:end] = record[4:-1]
+        elif kind == 1:
+            break
+        elif kind == 2:
+            base = (record[4] << 8 | record[5]) << 4
+        elif kind == 4:
+            base = (record[4] << 8 | record[5]) << 16
+    return data
+
+
+def _image_format(filename):
+    """Formato da imagem pela extensão do arquivo ('hex' para .hex, 'bin' para os demais)"""
+    return 'hex' if filename.lower().endswith(('.hex', '.ihex')) else 'bin'
+
+
+class SimulationStop(Exception):
+    """Interrompe a execução ao chegar ao laço final (por exemplo, end: rjmp end)."""
+
+
+class TraceWriter:
+    """
+    Destino do rastreamento: acumula as linhas de texto (ou os registros
+    binários) e os escreve em blocos, em vez de uma escrita por instrução.
+    """
+
+    def __init__(self, stream=None, binary_file=None, block_size=TRACE_BLOCK_SIZE):
+        """
+        Parâmetros:
+            stream: Fluxo de texto para as linhas (None para não escrever texto)
+            binary_file: Arquivo binário aberto para os registros TRACE_RECORD
+            block_size: Quantidade de itens acumulados antes de cada escrita
+        """
+        self.stream = stream
+        self.binary_file = binary_file
+        self.block_size = block_size
+        self.lines = []
+        self.records = bytearray()
+        self.pending_records = 0
+
+    def write(self, line):
+        self.lines.append(line)
+        if len(self.lines) >= self.block_size:
+            self.flush()
+
+    def record(self, cycles, pc, opcode):
+        self.records += TRACE_RECORD.pack(cycles & 0xFFFFFFFF, pc, opcode)
+        self.pending_records += 1
+        if self.pending_records >= self.block_size:
+            self.flush()
+
+    def flush(self):
+        if self.lines:
+            if self.stream is not None:
+                self.stream.write('\n'.join(self.lines) + '\n')
+            self.lines = []
+        if self.records:
+            self.binary_file.write(self.records)
+            self.records = bytearray()
+            self.pending_records = 0
+
 
 class AVRSimulator:
-    def __init__(self):
-        # Registradores do AVR
-        self.registers = {f'r{i}': 0 for i in range(32)}
-        # Memória RAM (simulada)
-        self.memory = bytearray(2048)  # 2KB de RAM
-        # Memória para variáveis (simulando .dseg)
-        self.variables = {'memory': 0.0, 'results': [0.0] * 10}
-        # Contador de programa
+    def __init__(self, trace='summary', max_steps=DEFAULT_MAX_STEPS, max_cycles=None,
+                 sample_interval=DEFAULT_SAMPLE_INTERVAL, trace_stream=None, trace_file=None,
+                 checkpoint=None, checkpoint_interval=DEFAULT_CHECKPOINT_INTERVAL):
+        """
+        Parâmetros:
+            trace: Nível de rastreamento (um de TRACE_LEVELS)
+            max_steps: Máximo de instruções executadas (None para ilimitado)
+            max_cycles: Máximo de ciclos de clock (None para ilimitado)
+            sample_interval: Intervalo, em instruções, do nível 'sampled'
+            trace_stream: Fluxo de texto do rastreamento (padrão: sys.stdout)
+            trace_file: Caminho do arquivo binário de rastreamento, com um
+                        registro TRACE_RECORD por instrução executada
+            checkpoint: Caminho do arquivo de checkpoint, gravado a cada
+                        checkpoint_interval instruções (ver save_checkpoint)
+            checkpoint_interval: Instruções entre dois checkpoints
+        """
+        if trace not in TRACE_LEVELS:
+            raise ValueError(f"Nível de rastreamento inválido: {trace}")
+        self.trace = trace
+        self.max_steps = max_steps
+        self.max_cycles = max_cycles
+        self.sample_interval = max(1, sample_interval)
+        self.trace_stream = trace_stream
+        self.trace_file = trace_file
+        self.checkpoint = checkpoint
+        self.checkpoint_interval = max(1, checkpoint_interval)
+        # Espaço de dados inteiro (registradores, E/S e SRAM), acessado sem
+        # cópias por memoryviews: os registradores são os primeiros 32 bytes
+        self.data = bytearray(DATA_SPACE_SIZE)
+        self.memory = memoryview(self.data)
+        self.registers = self.memory[:32]
+        self.sram = self.memory[SRAM_START:RAMEND + 1]
+        # Tráfego de memória (bytes lidos e escritos por ld/st/lds/sts/push/pop,
+        # incluindo os endereços de retorno de call/ret)
+        self.loads = 0
+        self.stores = 0
+        # Bytes escritos em UDR0 (saída serial)
+        self.serial_output = bytearray()
+        # Contador de programa (endereço em palavras de 16 bits)
         self.pc = 0
+        # Ciclos de clock executados
+        self.cycles = 0
         # Flag para indicar se o programa terminou
         self.running = True
-        
-    def load_program(self, filename):
-        """Carrega o programa assembly do arquivo"""
+        # Instruções executadas e motivo do fim da última execução
+        self.steps = 0
+        self.stop_reason = None
+        # Programa decodificado: um registro (código, operando a, operando b,
+        # tamanho em palavras) por endereço; a segunda palavra de instruções
+        # longas fica como None
         self.program = []
+        # Texto original de cada instrução, por endereço
+        self.source = []
         self.labels = {}
-        
+        # Rótulos do segmento de dados (.dseg), com o tamanho reservado
+        self.data_labels = {}
+        self.symbols = dict(DEFAULT_SYMBOLS)
+        # Tabela de tratadores e de ciclos, indexadas pelo código de operação
+        self.handlers = [getattr(self, '_op_' + name) for name in INSTRUCTIONS]
+        self.cycle_table = [CYCLES.get(name, 1) for name in INSTRUCTIONS]
+
+    def load_program(self, filename, strict=False):
+        """
+        Carrega o programa assembly do arquivo e decodifica cada instrução uma única vez.
+        Com strict, instruções inválidas ou não suportadas fazem o carregamento
+        falhar em vez de virarem nop (como em um montador).
+        """
+        self.program = []
+        self.source = []
+        self.labels = {}
+        self.data_labels = {}
+        self.symbols = dict(DEFAULT_SYMBOLS)
+
         try:
+            # Primeira passada: endereços dos rótulos e dos dados
+            instructions = []
+            address = 0
+            data_address = SRAM_START
+            in_data = False
+            pending_data_labels = []
             with open(filename, 'r') as f:
-                line_num = 0
-                for line in f:
+                for line_num, line in enumerate(f, 1):
                     # Remove comentários e espaços extras
                     line = re.sub(r';.*$', '', line).strip()
                     if not line:
                         continue
-                    
-                    # Processa labels
-                    if ':' in line and not line.startswith('.'):
-                        label, rest = line.split(':', 1)
-                        self.labels[label.strip()] = line_num
-                        line = rest.strip()
+
+                    # Processa labels (no segmento de dados, o rótulo aponta para a SRAM)
+                    match = re.match(r'([A-Za-z_.$][\w.$]*)\s*:(.*)$', line)
+                    if match:
+                        label, line = match.group(1), match.group(2).strip()
+                        if in_data:
+                            self.symbols[label] = data_address
+                            self.data_labels[label] = (data_address, 0)
+                            pending_data_labels.append(label)
+                        else:
+                            self.labels[label] = address
+                            self.symbols[label] = address
                         if not line:
                             continue
-                    
-                    # Adiciona instrução ao programa
-                    self.program.append(line)
-                    line_num += 1
-            
-            print(f"Programa carregado: {len(self.program)} instruções")
-            for label, addr in self.labels.items():
-                print(f"Label '{label}' em {addr}")
+
+                    # Diretivas: segmentos (.dseg/.cseg ou .section .data/.text),
+                    # reserva de dados (.byte/.space), .org e .equ/.set
+                    if line.startswith('.'):
+                        directive, _, argument = line.partition(' ')
+                        directive = directive.lower()
+                        argument = argument.strip()
+                        if directive in ('.dseg', '.data') or (
+                                directive == '.section' and argument.startswith(('.data', '.bss'))):
+                            in_data = True
+                        elif directive in ('.cseg', '.text') or directive == '.section':
+                            in_data = False
+                        elif directive in ('.byte', '.space', '.skip') and in_data:
+                            size = self.evaluate_operand(argument.split(',')[0])
+                            for label in pending_data_labels:
+                                self.data_labels[label] = (self.data_labels[label][0], size)
+                            pending_data_labels = []
+                            data_address += size
+                        elif directive == '.org':
+                            if in_data:
+                                data_address = self.evaluate_operand(argument)
+                            else:
+                                address = self.evaluate_operand(argument)
+                        else:
+                            match = re.fullmatch(r'\.(?:equ|set)\s+(\w+)\s*[=,]\s*(.+)', line, re.IGNORECASE)
+                            if match:
+                                self.symbols[match.group(1)] = self.evaluate_operand(match.group(2))
+                        continue
+
+                    mnemonic = line.split(None, 1)[0].lower()
+                    instructions.append((address, line_num, line))
+                    address += 2 if mnemonic in TWO_WORD_INSTRUCTIONS else 1
+
+            # Segunda passada: decodificação (endereços sem instrução viram nop)
+            nop = (OPCODES['nop'], None, None, 1)
+            self.program = [nop] * address
+            self.source = ['nop'] * address
+            for address, line_num, line in instructions:
+                try:
+                    self.program[address] = self.decode(line, strict)
+                except ValueError as e:
+                    if strict:
+                        raise ValueError(f"linha {line_num}: {e}") from None
+                    # Como as operações desconhecidas, a instrução é ignorada
+                    print(f"  Linha {line_num}: {e} (ignorando)")
+                    self.program[address] = nop
+                self.source[address] = line
+                if self.program[address][3] == 2:
+                    self.program[address + 1] = None
+                    self.source[address + 1] = None
+
+            if self.trace != 'off':
+                print(f"Programa carregado: {len(instructions)} instruções")
+            if self.trace == 'instructions':
+                for label, addr in self.labels.items():
+                    print(f"Label '{label}' em {addr}")
+                for label, (addr, size) in self.data_labels.items():
+                    print(f"Dado '{label}' em 0x{addr:04X} ({size} bytes)")
             return True
-        
+
         except Exception as e:
             print(f"Erro ao carregar o programa: {e}")
             return False
-    
-    def execute(self):
-        """Executa o programa carregado"""
-        self.pc = 0
-        self.running = True
-        
-        print("\n--- Iniciando simulação ---\n")
-        
-        # Localiza o rótulo principal
-        if 'main' in self.labels:
-            self.pc = self.labels['main']
-        
-        # Loop principal de execução
-        step_count = 0
-        while self.running and self.pc < len(self.program) and step_count < 1000:
-            instruction = self.program[self.pc]
-            print(f"PC={self.pc}: Executando '{instruction}'")
-            
-            # Simula a execução da instrução
-            self.execute_instruction(instruction)
-            
-            # Avança o PC (a menos que a instrução já tenha modificado)
-            self.pc += 1
-            step_count += 1
-            
-            # Mostra estado dos registradores a cada 5 passos
-            if step_count % 5 == 0:
-                self.print_state()
-        
-        print("\n--- Simulação concluída ---")
-        print(f"Passos executados: {step_count}")
-        self.print_state()
-        
-        # Se terminou porque atingiu o limite, avisa
-        if step_count >= 1000:
-            print("Atenção: Limite de passos atingido. A simulação foi interrompida.")
-    
-    def execute_instruction(self, instruction):
-        """Simula a execução de uma instrução"""
-        # Divide a instrução em operação e operandos
-        parts = instruction.split()
-        if not parts:
-            return
-        
+
+    def decode(self, instruction, strict=False):
+        """
+        Decodifica uma instrução em um registro compacto.
+
+        Parâmetros:
+            instruction: Texto da instrução, sem rótulo e sem comentário
+            strict: Se verdadeiro, instruções não suportadas geram ValueError
+
+        Retorna:
+            Tupla (código de operação, operando a, operando b, tamanho em palavras);
+            instruções não suportadas viram nop
+        """
+        parts = instruction.split(None, 1)
         operation = parts[0].lower()
-        operands = []
-        if len(parts) > 1:
-            # Processa operandos, separando por vírgulas se houver
-            operands_str = ' '.join(parts[1:])
-            operands = [op.strip() for op in operands_str.split(',')]
-        
-        # Simula operações específicas
-        if operation == 'ld':
-            # ld r16, X+
-            if len(operands) >= 2 and operands[1] == 'X+':
-                reg = operands[0]
-                # Simula carregar da memória
-                self.registers[reg] = 5  # Valor fictício para simulação
-                print(f"  Carregado valor 5 para {reg}")
-            
-        elif operation == 'st':
-            # st X+, r16
-            if len(operands) >= 2 and operands[0] == 'X+':
-                reg = operands[1]
-                # Simula armazenar na memória
-                print(f"  Armazenado valor {self.registers.get(reg, 0)} na memória")
-        
-        elif operation == 'add':
-            # add r16, r17
-            if len(operands) >= 2:
-                dst = operands[0]
-                src = operands[1]
-                # Simula adição
-                result = self.registers.get(dst, 0) + self.registers.get(src, 0)
-                self.registers[dst] = result
-                print(f"  {dst} = {dst} + {src} = {result}")
-        
-        elif operation == 'sub':
-            # sub r16, r17
-            if len(operands) >= 2:
-                dst = operands[0]
-                src = operands[1]
-                # Simula subtração
-                result = self.registers.get(dst, 0) - self.registers.get(src, 0)
-                self.registers[dst] = result
-                print(f"  {dst} = {dst} - {src} = {result}")
+        operands = [op.strip() for op in parts[1].split(',')] if len(parts) > 1 else []
+
+        # Mnemônicos alternativos do montador
+        if operation in BRANCH_ALIASES and len(operands) == 1:
+            operation, bit = BRANCH_ALIASES[operation]
+            operands = [str(bit)] + operands
+        elif operation in FLAG_ALIASES and not operands:
+            operation, bit = FLAG_ALIASES[operation]
+            operands = [str(bit)]
+        elif operation in REGISTER_ALIASES and len(operands) == 1:
+            operation = REGISTER_ALIASES[operation]
+            operands = operands * 2
+        elif operation == 'ser' and len(operands) == 1:
+            operation = 'ldi'
+            operands = operands + ['0xFF']
+
+        if operation not in OPCODES:
+            if strict:
+                raise ValueError(f"operação '{operation}' não suportada")
+            print(f"  Operação '{operation}' não implementada na simulação (ignorando)")
+            return (OPCODES['nop'], None, None, 1)
+
+        operand_format = OPERAND_FORMATS[operation]
+        if len(operands) != len(operand_format):
+            raise ValueError(f"número de operandos inválido em '{instruction}'")
+        values = []
+        for kind, text in zip(operand_format, operands):
+            if kind in 'dr':
+                values.append(self.parse_register(text))
+            elif kind == 'p':
+                values.append(self.parse_pointer(text))
+            elif kind == 'q':
+                values.append(self.parse_displacement(text))
+            elif kind == 'A':
+                values.append(self.evaluate_operand(text) + IO_OFFSET)
+            elif kind == 'b':
+                # O bit é guardado como máscara
+                values.append(1 << self.evaluate_operand(text))
+            else:
+                values.append(self.evaluate_operand(text))
+        values += [None] * (2 - len(values))
+        size = 2 if operation in TWO_WORD_INSTRUCTIONS else 1
+        return (OPCODES[operation], values[0], values[1], size)
+
+    def parse_register(self, text):
+        """Converte 'r16' (ou o par 'r17:r16', ou XL...ZH) no índice do registrador"""
+        indexes = []
+        for name in text.lower().split(':'):
+            name = name.strip()
+            if name in REGISTER_NAMES:
+                indexes.append(REGISTER_NAMES[name])
+            elif re.fullmatch(r'r\d+', name) and int(name[1:]) <= 31:
+                indexes.append(int(name[1:]))
+            else:
+                raise ValueError(f"registrador inválido '{text}'")
+        # Em um par como 'r25:r24' o operando é o registrador menor
+        return min(indexes)
+
+    def parse_pointer(self, text):
+        """
+        Converte um operando de ld/st em (registrador base, modo), com modo
+        0 (sem alteração), 1 (pós-incremento, X+) ou -1 (pré-decremento, -X).
+        """
+        name = text.replace(' ', '').upper()
+        mode = 0
+        if name.endswith('+'):
+            name, mode = name[:-1], 1
+        elif name.startswith('-'):
+            name, mode = name[1:], -1
+        if name not in POINTER_REGISTERS:
+            raise ValueError(f"ponteiro inválido '{text}'")
+        return (POINTER_REGISTERS[name], mode)
+
+    def parse_displacement(self, text):
+        """Converte um operando de ldd/std ('Y+q' ou 'Z+q') em (registrador base, q)"""
+        name, _, displacement = text.replace(' ', '').partition('+')
+        name = name.upper()
+        if name not in ('Y', 'Z') or not displacement:
+            raise ValueError(f"ponteiro com deslocamento inválido '{text}'")
+        q = self.evaluate_operand(displacement)
+        if not 0 <= q <= 63:
+            raise ValueError(f"deslocamento fora do intervalo 0..63 em '{text}'")
+        return (POINTER_REGISTERS[name], q)
+
+    def evaluate_operand(self, text):
+        """
+        Calcula o valor de um operando numérico: números, rótulos, símbolos,
+        operadores aritméticos e as funções low()/high() (ou lo8()/hi8()).
+        """
+        try:
+            tree = ast.parse(text.replace('$', '0x'), mode='eval')
+        except SyntaxError:
+            raise ValueError(f"operando inválido '{text}'")
+        return self._evaluate_node(tree.body, text)
+
+    def _evaluate_node(self, node, text):
+        if isinstance(node, ast.Constant) and isinstance(node.value, int):
+            return node.value
+        if isinstance(node, ast.Constant) and isinstance(node.value, str) and len(node.value) == 1:
+            return ord(node.value)  # Caractere, como 'A'
+        if isinstance(node, ast.Name) and node.id in self.symbols:
+            return self.symbols[node.id]
+        if isinstance(node, ast.UnaryOp) and isinstance(node.op, (ast.USub, ast.UAdd, ast.Invert)):
+            value = self._evaluate_node(node.operand, text)
+            if isinstance(node.op, ast.USub):
+                return -value
+            return ~value if isinstance(node.op, ast.Invert) else value
+        if isinstance(node, ast.BinOp) and type(node.op) in _BINARY_OPERATORS:
+            return _BINARY_OPERATORS[type(node.op)](self._evaluate_node(node.left, text),
+                                                    self._evaluate_node(node.right, text))
+        if (isinstance(node, ast.Call) and isinstance(node.func, ast.Name)
+                and node.func.id.lower() in _FUNCTIONS and len(node.args) == 1):
+            return _FUNCTIONS[node.func.id.lower()](self._evaluate_node(node.args[0], text))
+        raise ValueError(f"operando inválido '{text}'")
+
+    def flash_image(self):
+        """
+        Monta o programa carregado: codifica cada instrução nas palavras de
+        16 bits do ATmega328P (endereços sem instrução ficam com nop).
+
+        Retorna:
+            bytearray com a memória de programa (palavras little-endian)
+        """
+        words = array('H')
+        for address, record in enumerate(self.program):
+            if record is None:
+                continue
+            try:
+                words.extend(encode_instruction(record, address))
+            except ValueError as e:
+                raise ValueError(f"endereço {address} ('{self.source[address]}'): {e}") from None
+        if sys.byteorder != 'little':
+            words.byteswap()
+        return bytearray(words.tobytes())
+
+    def save_image(self, filename, image_format=None):
+        """
+        Grava a imagem da memória de programa e a tabela de símbolos
+        (<nome>.sym, com os rótulos do código e do segmento de dados).
+
+        Parâmetros:
+            filename: Caminho da imagem
+            image_format: 'hex' (Intel HEX) ou 'bin' (binário puro); por
+                          padrão, pela extensão do arquivo
+
+        Retorna:
+            Tamanho do programa em bytes (que pode passar de FLASH_SIZE; a
+            imagem é gravada mesmo assim, para simulação)
+        """
+        image_format = image_format or _image_format(filename)
+        data = self.flash_image()
+        if image_format == 'hex':
+            with open(filename, 'w') as f:
+                write_intel_hex(data, f)
+        else:
+            with open(filename, 'wb') as f:
+                f.write(data)
+
+        lines = ["; Tabela de símbolos: code NOME ENDEREÇO (em palavras) e "
+                 "data NOME ENDEREÇO TAMANHO (em bytes)"]
+        lines += [f"code {label} 0x{address:04X}" for label, address in self.labels.items()]
+        lines += [f"data {label} 0x{address:04X} {size}"
+                  for label, (address, size) in self.data_labels.items()]
+        with open(os.path.splitext(filename)[0] + '.sym', 'w') as f:
+            f.write('\n'.join(lines) + '\n')
+        return len(data)
+
+    def load_image(self, filename, image_format=None):
+        """
+        Carrega uma imagem gravada por save_image (ou por avr-objcopy),
+        decodificando as palavras de 16 bits sem analisar texto. Os rótulos
+        vêm da tabela de símbolos <nome>.sym, se existir.
+
+        Parâmetros:
+            filename: Caminho da imagem
+            image_format: 'hex' ou 'bin'; por padrão, pela extensão do arquivo
+
+        Retorna:
+            True se a imagem foi carregada
+        """
+        self.program = []
+        self.source = []
+        self.labels = {}
+        self.data_labels = {}
+        self.symbols = dict(DEFAULT_SYMBOLS)
+
+        try:
+            image_format = image_format or _image_format(filename)
+            if image_format == 'hex':
+                with open(filename, 'r') as f:
+                    data = read_intel_hex(f)
+            else:
+                with open(filename, 'rb') as f:
+                    data = f.read()
+            if len(data) & 1:
+                data += b'\x00'
+            words = array('H', bytes(data))
+            if sys.byteorder != 'little':
+                words.byteswap()
+
+            nop = (OPCODES['nop'], None, None, 1)
+            program = [nop] * len(words)
+            source = ['nop'] * len(words)
+            address = 0
+            while address < len(words):
+                next_word = words[address + 1] if address + 1 < len(words) else None
+                try:
+                    record = decode_instruction(words[address], next_word, address)
+                except ValueError as e:
+                    print(f"  Endereço {address}: {e} (ignorando)")
+                    record = nop
+                program[address] = record
+                source[address] = format_instruction(record)
+                if record[3] == 2:
+                    program[address + 1] = None
+                    source[address + 1] = None
+                address += record[3]
+            self.program = program
+            self.source = source
+
+            symbols_filename = os.path.splitext(filename)[0] + '.sym'
+            if os.path.exists(symbols_filename):
+                with open(symbols_filename, 'r') as f:
+                    for line in f:
+                        fields = line.split(';', 1)[0].split()
+                        if len(fields) == 3 and fields[0] == 'code':
+                            self.labels[fields[1]] = int(fields[2], 0)
+                            self.symbols[fields[1]] = int(fields[2], 0)
+                        elif len(fields) == 4 and fields[0] == 'data':
+                            self.data_labels[fields[1]] = (int(fields[2], 0), int(fields[3]))
+                            self.symbols[fields[1]] = int(fields[2], 0)
+
+            if self.trace != 'off':
+                print(f"Imagem carregada: {len(words)} palavras")
+            if self.trace == 'instructions':
+                for label, addr in self.labels.items():
+                    print(f"Label '{label}' em {addr}")
+                for label, (addr, size) in self.data_labels.items():
+                    print(f"Dado '{label}' em 0x{addr:04X} ({size} bytes)")
+            return True
+
+        except Exception as e:
+            print(f"Erro ao carregar a imagem: {e}")
+            return False
+
+    def execute(self, resume=False):
+        """
+        Executa o programa carregado, a partir do vetor de reset (endereço 0),
+        até o laço final, o fim do programa ou um dos limites configurados.
         
-        elif operation == 'mul':
-            # mul r16, r17
-            if len(operands) >= 2:
-                dst = operands[0]
-                src = operands[1]
-                # Simula multiplicação
-                result = self.registers.get(dst, 0) * self.registers.get(src, 0)
-                self.registers['r0'] = result & 0xFF  # Parte baixa
-                self.registers['r1'] = (result >> 8) & 0xFF  # Parte alta
-                print(f"  r0:r1 = {dst} * {src} = {result}")
+        Parâmetros:
+            resume: Se verdadeiro, continua do checkpoint (se houver um válido
+                    para este programa) em vez de partir do reset
         
-        elif operation == 'rjmp':
-            # rjmp label
-            if len(operands) >= 1:
-                label = operands[0]
-                if label in self.labels:
-                    # Simula salto
-                    old_pc = self.pc
-                    self.pc = self.labels[label]
-                    print(f"  Salto de {old_pc} para {self.pc} (label {label})")
+        Retorna:
+            Quantidade de instruções executadas (contando as anteriores ao
+            checkpoint, ao retomar)
+        """
+        resumed = resume and self.checkpoint is not None and self.load_checkpoint(self.checkpoint)
+        if not resumed:
+            self.reset()
+            self.pc = 0
+            self.cycles = 0
+            self.steps = 0
+        self.running = True
+        self.stop_reason = None
+        first_step = self.steps
+        max_steps = self.max_steps if self.max_steps is not None else float('inf')
+        max_cycles = self.max_cycles if self.max_cycles is not None else float('inf')
+
+        if self.trace != 'off':
+            if resumed:
+                print(f"\n--- Retomando simulação do checkpoint (passo {self.steps}) ---\n")
+            else:
+                print("\n--- Iniciando simulação ---\n")
+        started = time.perf_counter()
+        if self.trace in ('instructions', 'sampled') or self.trace_file:
+            binary_file = None
+            if self.trace_file:
+                if resumed and os.path.exists(self.trace_file):
+                    # Descarta os registros gravados depois do checkpoint
+                    binary_file = open(self.trace_file, 'r+b')
+                    binary_file.truncate(self.steps * TRACE_RECORD.size)
+                    binary_file.seek(0, os.SEEK_END)
                 else:
-                    print(f"  Erro: Label '{label}' não encontrada")
-        
-        elif operation == 'movw':
-            # movw r16:r17, r0:r1
-            if len(operands) >= 2:
-                dst_pair = operands[0].split(':')
-                src_pair = operands[1].split(':')
-                if len(dst_pair) >= 1 and len(src_pair) >= 1:
-                    dst_reg = dst_pair[0]
-                    src_reg = src_pair[0]
-                    # Simula mover word
-                    self.registers[dst_reg] = self.registers.get(src_reg, 0)
-                    if len(dst_pair) > 1 and len(src_pair) > 1:
-                        self.registers[dst_pair[1]] = self.registers.get(src_pair[1], 0)
-                    print(f"  Movido {src_reg} para {dst_reg}")
-        
+                    binary_file = open(self.trace_file, 'wb')
+            try:
+                writer = TraceWriter(self.trace_stream or sys.stdout, binary_file)
+                try:
+                    self._run_checkpointed(self._run_traced, max_steps, max_cycles, writer)
+                finally:
+                    writer.flush()
+            finally:
+                if binary_file is not None:
+                    binary_file.close()
         else:
-            print(f"  Operação '{operation}' não implementada na simulação (ignorando)")
-    
+            self._run_checkpointed(self._run, max_steps, max_cycles)
+        elapsed = time.perf_counter() - started
+        self.running = False
+
+        if self.trace != 'off':
+            print("\n--- Simulação concluída ---")
+            print(f"Passos executados: {self.steps}")
+            print(f"Ciclos executados: {self.cycles}")
+            if elapsed > 0:
+                print(f"Velocidade: {(self.steps - first_step) / elapsed:,.0f} instruções/s")
+            print(f"Tráfego de memória: {self.loads} bytes lidos, {self.stores} bytes escritos")
+            if self.serial_output:
+                print("Saída serial:")
+                print(self.serial_output.decode('latin-1'))
+            self.print_state()
+            if self.stop_reason == 'steps':
+                print("Atenção: Limite de passos atingido. A simulação foi interrompida.")
+            elif self.stop_reason == 'cycles':
+                print("Atenção: Limite de ciclos atingido. A simulação foi interrompida.")
+        return self.steps
+
+    def _run_checkpointed(self, run, max_steps, max_cycles, writer=None):
+        """
+        Executa o laço run em trechos de checkpoint_interval instruções,
+        gravando um checkpoint ao fim de cada trecho. Se a execução para em um
+        dos limites, o checkpoint final permite continuá-la com limites
+        maiores; se o programa termina, o checkpoint é apagado.
+        """
+        args = (max_cycles,) if writer is None else (max_cycles, writer)
+        if self.checkpoint is None:
+            run(max_steps, *args)
+            return
+        while True:
+            run(min(max_steps, self.steps + self.checkpoint_interval), *args)
+            if self.stop_reason not in ('steps', 'cycles'):
+                break
+            if writer is not None:
+                # Os registros do rastreamento até o checkpoint vão para o disco
+                writer.flush()
+                if writer.binary_file is not None:
+                    writer.binary_file.flush()
+                    os.fsync(writer.binary_file.fileno())
+            self.save_checkpoint(self.checkpoint)
+            if self.stop_reason == 'cycles' or self.steps >= max_steps:
+                return
+        try:
+            os.remove(self.checkpoint)
+        except FileNotFoundError:
+            pass
+
+    def _program_digest(self):
+        """Resumo do programa decodificado, para reconhecer o checkpoint dele"""
+        import hashlib
+        return hashlib.sha256(repr(self.program).encode()).hexdigest()
+
+    def save_checkpoint(self, filename):
+        """
+        Grava o estado da simulação (espaço de dados com registradores, E/S e
+        SRAM, PC, ciclos, instruções executadas, tráfego de memória e saída
+        serial). O arquivo é gravado em disco e só então substitui o anterior,
+        então uma interrupção a qualquer momento deixa um checkpoint válido.
+
+        Parâmetros:
+            filename: Caminho do arquivo de checkpoint
+        """
+        import pickle
+        import zlib
+        state = {
+            'version': CHECKPOINT_VERSION,
+            'program': self._program_digest(),
+            'data': zlib.compress(bytes(self.data), 1),
+            'pc': self.pc,
+            'cycles': self.cycles,
+            'steps': self.steps,
+            'loads': self.loads,
+            'stores': self.stores,
+            'serial_output': bytes(self.serial_output),
+        }
+        temporary = filename + '.tmp'
+        with open(temporary, 'wb') as file:
+            pickle.dump(state, file, protocol=pickle.HIGHEST_PROTOCOL)
+            file.flush()
+            os.fsync(file.fileno())
+        os.replace(temporary, filename)
+
+    def load_checkpoint(self, filename):
+        """
+        Restaura o estado gravado por save_checkpoint, se ele for do programa
+        carregado.
+
+        Parâmetros:
+            filename: Caminho do arquivo de checkpoint
+
+        Retorna:
+            Booleano indicando se o estado foi restaurado
+        """
+        import pickle
+        import zlib
+        try:
+            with open(filename, 'rb') as file:
+                state = pickle.load(file)
+        except (OSError, pickle.UnpicklingError, EOFError):
+            return False
+        if not isinstance(state, dict) or state.get('version') != CHECKPOINT_VERSION \
+                or state['program'] != self._program_digest():
+            return False
+        self.memory[:] = zlib.decompress(state['data'])
+        self.pc = state['pc']
+        self.cycles = state['cycles']
+        self.steps = state['steps']
+        self.loads = state['loads']
+        self.stores = state['stores']
+        self.serial_output = bytearray(state['serial_output'])
+        return True
+
+    def _run(self, max_steps, max_cycles):
+        """Laço de execução sem rastreamento"""
+        program = self.program
+        handlers = self.handlers
+        cycle_table = self.cycle_table
+        pc = self.pc
+        steps = self.steps
+        try:
+            while True:
+                if steps >= max_steps:
+                    self.stop_reason = 'steps'
+                    break
+                if self.cycles >= max_cycles:
+                    self.stop_reason = 'cycles'
+                    break
+                opcode, a, b, size = program[pc]
+                # Executa a instrução; o tratador devolve o próximo PC
+                self.cycles += cycle_table[opcode]
+                pc = handlers[opcode](a, b, pc + size)
+                steps += 1
+        except SimulationStop as stop:
+            pc = stop.args[0]
+            steps += 1
+            self.stop_reason = 'end'
+        except IndexError:
+            # O PC passou do fim do programa
+            self.stop_reason = 'end of program'
+        self.pc = pc
+        self.steps = steps
+
+    def _run_traced(self, max_steps, max_cycles, writer):
+        """Laço de execução com rastreamento por instrução ou por amostragem"""
+        program = self.program
+        handlers = self.handlers
+        cycle_table = self.cycle_table
+        source = self.source
+        every = 1 if self.trace == 'instructions' else self.sample_interval
+        text = self.trace in ('instructions', 'sampled')
+        binary = self.trace_file is not None
+        pc = self.pc
+        steps = self.steps
+        try:
+            while True:
+                if steps >= max_steps:
+                    self.stop_reason = 'steps'
+                    break
+                if self.cycles >= max_cycles:
+                    self.stop_reason = 'cycles'
+                    break
+                opcode, a, b, size = program[pc]
+                if binary:
+                    writer.record(self.cycles, pc, opcode)
+                if text and steps % every == 0:
+                    writer.write(f"PC={pc} ciclo={self.cycles}: Executando '{source[pc]}'")
+                    if every > 1:
+                        writer.write(self.format_registers())
+                self.cycles += cycle_table[opcode]
+                pc = handlers[opcode](a, b, pc + size)
+                steps += 1
+        except SimulationStop as stop:
+            pc = stop.args[0]
+            steps += 1
+            self.stop_reason = 'end'
+        except IndexError:
+            self.stop_reason = 'end of program'
+        self.pc = pc
+        self.steps = steps
+
+    def execute_instruction(self, instruction):
+        """Decodifica e simula a execução de uma única instrução"""
+        opcode, a, b, size = self.decode(instruction)
+        self.cycles += self.cycle_table[opcode]
+        self.pc = self.handlers[opcode](a, b, self.pc + size)
+
+    # Tratadores das instruções: recebem os operandos decodificados e o
+    # endereço da próxima instrução, e devolvem o novo valor do PC. Os bits do
+    # SREG ficam no próprio espaço de dados, em SREG_ADDRESS.
+
+    def _op_nop(self, a, b, pc):
+        return pc
+
+    def _op_ldi(self, d, k, pc):
+        self.registers[d] = k & 0xFF
+        return pc
+
+    def _op_mov(self, d, r, pc):
+        self.registers[d] = self.registers[r]
+        return pc
+
+    def _op_movw(self, d, r, pc):
+        registers = self.registers
+        registers[d] = registers[r]
+        registers[d + 1] = registers[r + 1]
+        return pc
+
+    def _op_add(self, d, r, pc):
+        registers = self.registers
+        a = registers[d]
+        b = registers[r]
+        result = a + b
+        registers[d] = result & 0xFF
+        memory = self.memory
+        memory[SREG_ADDRESS] = (memory[SREG_ADDRESS] & 0xC0) | _add_flags(a, b, result)
+        return pc
+
+    def _op_adc(self, d, r, pc):
+        registers = self.registers
+        memory = self.memory
+        sreg = memory[SREG_ADDRESS]
+        a = registers[d]
+        b = registers[r]
+        result = a + b + (sreg & FLAG_C)
+        registers[d] = result & 0xFF
+        memory[SREG_ADDRESS] = (sreg & 0xC0) | _add_flags(a, b, result)
+        return pc
+
+    def _subtract(self, d, b, carry, keep_zero, store=True):
+        """Subtração comum a sub/sbc/subi/sbci/cp/cpc/cpi"""
+        registers = self.registers
+        memory = self.memory
+        sreg = memory[SREG_ADDRESS]
+        a = registers[d]
+        result = a - b - (sreg & carry)
+        flags = _sub_flags(a, b, result)
+        if keep_zero and not sreg & FLAG_Z:
+            # Em sbc/sbci/cpc o Z só continua 1 se já era 1 (comparação de 16 bits)
+            flags &= ~FLAG_Z
+        if store:
+            registers[d] = result & 0xFF
+        memory[SREG_ADDRESS] = (sreg & 0xC0) | flags
+
+    def _op_sub(self, d, r, pc):
+        self._subtract(d, self.registers[r], 0, False)
+        return pc
+
+    def _op_sbc(self, d, r, pc):
+        self._subtract(d, self.registers[r], FLAG_C, True)
+        return pc
+
+    def _op_subi(self, d, k, pc):
+        self._subtract(d, k & 0xFF, 0, False)
+        return pc
+
+    def _op_sbci(self, d, k, pc):
+        self._subtract(d, k & 0xFF, FLAG_C, True)
+        return pc
+
+    def _op_cp(self, d, r, pc):
+        self._subtract(d, self.registers[r], 0, False, False)
+        return pc
+
+    def _op_cpc(self, d, r, pc):
+        self._subtract(d, self.registers[r], FLAG_C, True, False)
+        return pc
+
+    def _op_cpi(self, d, k, pc):
+        self._subtract(d, k & 0xFF, 0, False, False)
+        return pc
+
+    def _logic(self, d, result):
+        """Guarda o resultado das operações lógicas (V = 0; C e H não mudam)"""
+        self.registers[d] = result
+        memory = self.memory
+        memory[SREG_ADDRESS] = (memory[SREG_ADDRESS] & 0xE1) | LOGIC_FLAGS[result]
+
+    def _op_and(self, d, r, pc):
+        self._logic(d, self.registers[d] & self.registers[r])
+        return pc
+
+    def _op_andi(self, d, k, pc):
+        self._logic(d, self.registers[d] & k & 0xFF)
+        return pc
+
+    def _op_or(self, d, r, pc):
+        self._logic(d, self.registers[d] | self.registers[r])
+        return pc
+
+    def _op_ori(self, d, k, pc):
+        self._logic(d, self.registers[d] | (k & 0xFF))
+        return pc
+
+    def _op_eor(self, d, r, pc):
+        self._logic(d, self.registers[d] ^ self.registers[r])
+        return pc
+
+    def _op_com(self, d, b, pc):
+        result = self.registers[d] ^ 0xFF
+        self.registers[d] = result
+        memory = self.memory
+        memory[SREG_ADDRESS] = (memory[SREG_ADDRESS] & 0xE0) | LOGIC_FLAGS[result] | FLAG_C
+        return pc
+
+    def _op_neg(self, d, b, pc):
+        a = self.registers[d]
+        self.registers[d] = -a & 0xFF
+        memory = self.memory
+        memory[SREG_ADDRESS] = (memory[SREG_ADDRESS] & 0xC0) | _sub_flags(0, a, -a)
+        return pc
+
+    def _op_inc(self, d, b, pc):
+        result = (self.registers[d] + 1) & 0xFF
+        self.registers[d] = result
+        memory = self.memory
+        memory[SREG_ADDRESS] = (memory[SREG_ADDRESS] & 0xE1) | INC_FLAGS[result]
+        return pc
+
+    def _op_dec(self, d, b, pc):
+        result = (self.registers[d] - 1) & 0xFF
+        self.registers[d] = result
+        memory = self.memory
+        memory[SREG_ADDRESS] = (memory[SREG_ADDRESS] & 0xE1) | DEC_FLAGS[result]
+        return pc
+
+    def _op_lsr(self, d, b, pc):
+        value = self.registers[d]
+        result = value >> 1
+        self.registers[d] = result
+        memory = self.memory
+        memory[SREG_ADDRESS] = (memory[SREG_ADDRESS] & 0xE0) | _shift_flags(result, value & 1)
+        return pc
+
+    def _op_ror(self, d, b, pc):
+        value = self.registers[d]
+        memory = self.memory
+        sreg = memory[SREG_ADDRESS]
+        result = (value >> 1) | (sreg & FLAG_C) << 7
+        self.registers[d] = result
+        memory[SREG_ADDRESS] = (sreg & 0xE0) | _shift_flags(result, value & 1)
+        return pc
+
+    def _op_asr(self, d, b, pc):
+        value = self.registers[d]
+        result = (value >> 1) | (value & 0x80)
+        self.registers[d] = result
+        memory = self.memory
+        memory[SREG_ADDRESS] = (memory[SREG_ADDRESS] & 0xE0) | _shift_flags(result, value & 1)
+        return pc
+
+    def _op_swap(self, d, b, pc):
+        value = self.registers[d]
+        self.registers[d] = ((value << 4) | (value >> 4)) & 0xFF
+        return pc
+
+    def _op_mul(self, d, r, pc):
+        registers = self.registers
+        result = registers[d] * registers[r]
+        registers[0] = result & 0xFF  # Parte baixa
+        registers[1] = result >> 8  # Parte alta
+        memory = self.memory
+        memory[SREG_ADDRESS] = ((memory[SREG_ADDRESS] & 0xFC) | (result >> 15)
+                                | (result == 0) << 1)
+        return pc
+
+    def _op_adiw(self, d, k, pc):
+        registers = self.registers
+        value = registers[d] | registers[d + 1] << 8
+        result = value + k
+        registers[d] = result & 0xFF
+        registers[d + 1] = (result >> 8) & 0xFF
+        n = (result >> 15) & 1
+        v = n & ~(value >> 15) & 1
+        memory = self.memory
+        memory[SREG_ADDRESS] = ((memory[SREG_ADDRESS] & 0xE0) | (result >> 16)
+                                | ((result & 0xFFFF) == 0) << 1 | n << 2 | v << 3 | (n ^ v) << 4)
+        return pc
+
+    def _op_sbiw(self, d, k, pc):
+        registers = self.registers
+        value = registers[d] | registers[d + 1] << 8
+        result = value - k
+        registers[d] = result & 0xFF
+        registers[d + 1] = (result >> 8) & 0xFF
+        n = (result >> 15) & 1
+        v = (value >> 15) & ~n & 1
+        memory = self.memory
+        memory[SREG_ADDRESS] = ((memory[SREG_ADDRESS] & 0xE0) | (result < 0)
+                                | ((result & 0xFFFF) == 0) << 1 | n << 2 | v << 3 | (n ^ v) << 4)
+        return pc
+
+    def _pointer_address(self, pointer):
+        """Endereço apontado por X, Y ou Z, já aplicando o pós-incremento ou o pré-decremento"""
+        p, mode = pointer
+        registers = self.registers
+        address = registers[p] | registers[p + 1] << 8
+        if mode:
+            updated = (address + mode) & 0xFFFF
+            registers[p] = updated & 0xFF
+            registers[p + 1] = updated >> 8
+            if mode < 0:
+                address = updated
+        return address
+
+    def _op_ld(self, d, pointer, pc):
+        self.registers[d] = self.memory[self._pointer_address(pointer)]
+        self.loads += 1
+        return pc
+
+    def _op_st(self, pointer, r, pc):
+        self.store(self._pointer_address(pointer), self.registers[r])
+        return pc
+
+    def _op_ldd(self, d, displacement, pc):
+        p, q = displacement
+        registers = self.registers
+        address = ((registers[p] | registers[p + 1] << 8) + q) & 0xFFFF
+        registers[d] = self.memory[address]
+        self.loads += 1
+        return pc
+
+    def _op_std(self, displacement, r, pc):
+        p, q = displacement
+        registers = self.registers
+        self.store(((registers[p] | registers[p + 1] << 8) + q) & 0xFFFF, registers[r])
+        return pc
+
+    def _op_lds(self, d, k, pc):
+        self.registers[d] = self.memory[k & 0xFFFF]
+        self.loads += 1
+        return pc
+
+    def _op_sts(self, k, r, pc):
+        self.store(k & 0xFFFF, self.registers[r])
+        return pc
+
+    def store(self, address, value):
+        """Escreve um byte no espaço de dados; os bytes escritos em UDR0 vão para a saída serial"""
+        self.memory[address] = value
+        self.stores += 1
+        if address == UDR0_ADDRESS:
+            self.serial_output.append(value)
+
+    def _push(self, value):
+        memory = self.memory
+        sp = memory[SPL_ADDRESS] | memory[SPH_ADDRESS] << 8
+        memory[sp] = value
+        sp = (sp - 1) & 0xFFFF
+        memory[SPL_ADDRESS] = sp & 0xFF
+        memory[SPH_ADDRESS] = sp >> 8
+        self.stores += 1
+
+    def _pop(self):
+        memory = self.memory
+        sp = ((memory[SPL_ADDRESS] | memory[SPH_ADDRESS] << 8) + 1) & 0xFFFF
+        memory[SPL_ADDRESS] = sp & 0xFF
+        memory[SPH_ADDRESS] = sp >> 8
+        self.loads += 1
+        return memory[sp]
+
+    def _op_push(self, r, b, pc):
+        self._push(self.registers[r])
+        return pc
+
+    def _op_pop(self, d, b, pc):
+        self.registers[d] = self._pop()
+        return pc
+
+    def _op_in(self, d, a, pc):
+        self.registers[d] = self.memory[a]
+        return pc
+
+    def _op_out(self, a, r, pc):
+        self.memory[a] = self.registers[r]
+        return pc
+
+    def _op_sbi(self, a, mask, pc):
+        self.memory[a] |= mask
+        return pc
+
+    def _op_cbi(self, a, mask, pc):
+        self.memory[a] &= ~mask & 0xFF
+        return pc
+
+    def _op_rjmp(self, k, b, pc):
+        if k == pc - 1:
+            # Salto para si mesmo (end: rjmp end): fim do programa
+            raise SimulationStop(k)
+        return k
+
+    def _op_jmp(self, k, b, pc):
+        if k == pc - 2:
+            raise SimulationStop(k)
+        return k
+
+    def _op_rcall(self, k, b, pc):
+        # Endereço de retorno na pilha: byte baixo primeiro
+        self._push(pc & 0xFF)
+        self._push(pc >> 8)
+        return k
+
+    _op_call = _op_rcall
+
+    def _op_ret(self, a, b, pc):
+        high = self._pop()
+        return self._pop() | high << 8
+
+    def _op_brbs(self, mask, k, pc):
+        if self.memory[SREG_ADDRESS] & mask:
+            self.cycles += 1
+            return k
+        return pc
+
+    def _op_brbc(self, mask, k, pc):
+        if self.memory[SREG_ADDRESS] & mask:
+            return pc
+        self.cycles += 1
+        return k
+
+    def _skip(self, pc):
+        """Pula a próxima instrução (1 ou 2 palavras), somando os ciclos do salto"""
+        size = self.program[pc][3]
+        self.cycles += size
+        return pc + size
+
+    def _op_sbrc(self, r, mask, pc):
+        if self.registers[r] & mask:
+            return pc
+        return self._skip(pc)
+
+    def _op_sbrs(self, r, mask, pc):
+        if self.registers[r] & mask:
+            return self._skip(pc)
+        return pc
+
+    def _op_cpse(self, d, r, pc):
+        if self.registers[d] == self.registers[r]:
+            return self._skip(pc)
+        return pc
+
+    def _op_bset(self, mask, b, pc):
+        self.memory[SREG_ADDRESS] |= mask
+        return pc
+
+    def _op_bclr(self, mask, b, pc):
+        self.memory[SREG_ADDRESS] &= ~mask & 0xFF
+        return pc
+
+    def _op_bst(self, r, mask, pc):
+        memory = self.memory
+        if self.registers[r] & mask:
+            memory[SREG_ADDRESS] |= FLAG_T
+        else:
+            memory[SREG_ADDRESS] &= ~FLAG_T & 0xFF
+        return pc
+
+    def _op_bld(self, d, mask, pc):
+        if self.memory[SREG_ADDRESS] & FLAG_T:
+            self.registers[d] |= mask
+        else:
+            self.registers[d] &= ~mask & 0xFF
+        return pc
+
+    def reset(self):
+        """Estado de reset: memória zerada, SP = RAMEND e UDRE0 = 1 (transmissor livre)"""
+        self.memory[:] = bytes(DATA_SPACE_SIZE)
+        self.memory[SPL_ADDRESS] = RAMEND & 0xFF
+        self.memory[SPH_ADDRESS] = RAMEND >> 8
+        self.memory[UCSR0A_ADDRESS] = 0x20
+        self.loads = 0
+        self.stores = 0
+        self.serial_output = bytearray()
+
+    def read_word(self, address):
+        """Lê uma palavra de 16 bits (little-endian) do espaço de dados"""
+        return self.memory[address] | self.memory[address + 1] << 8
+
+    def read_symbol(self, name, index=0, width=2):
+        """
+        Lê o elemento index de um dado declarado no segmento de dados.
+
+        Parâmetros:
+            name: Rótulo do dado (por exemplo, 'results')
+            index: Posição do elemento
+            width: Tamanho de cada elemento em bytes (1 ou 2)
+
+        Retorna:
+            Valor sem sinal do elemento
+        """
+        address = self.symbols[name] + index * width
+        return self.read_word(address) if width == 2 else self.memory[address]
+
+    def format_registers(self):
+        """Retorna os registradores diferentes de zero em uma única linha"""
+        regs = [f"r{i}={value}" for i, value in enumerate(self.registers) if value]
+        return "  " + (", ".join(regs) if regs else "(registradores zerados)")
+
+    def format_flags(self):
+        """Retorna os bits do SREG, em maiúscula os que estão ligados"""
+        sreg = self.memory[SREG_ADDRESS]
+        return ''.join(flag if sreg >> bit & 1 else flag.lower()
+                       for bit, flag in reversed(list(enumerate(SREG_FLAGS))))
+
     def print_state(self):
         """Mostra o estado atual dos registradores e memória"""
         print("\n--- Estado atual ---")
         print("Registradores:")
         for i in range(0, 32, 4):
-            regs = [f"r{j}={self.registers.get(f'r{j}', 0)}" for j in range(i, min(i+4, 32))]
+            regs = [f"r{j}={self.registers[j]}" for j in range(i, min(i+4, 32))]
             print("  " + ", ".join(regs))
-        
-        print("Variáveis:")
-        print(f"  memory = {self.variables['memory']}")
-        print(f"  results = {self.variables['results'][:3]}...")
+        sp = self.read_word(SPL_ADDRESS)
+        print(f"SREG: {self.format_flags()}  SP: 0x{sp:04X}")
+
+        if self.data_labels:
+            print("Variáveis:")
+        for label, (address, size) in self.data_labels.items():
+            if size == 2 or label in ('memory', 'results'):
+                # Palavras de 16 bits (meia precisão ou inteiros, conforme a expressão)
+                words = [self.read_word(address + i) for i in range(0, min(size, 6), 2)]
+                values = ", ".join(f"0x{w:04X} ({struct.unpack('<e', struct.pack('<H', w))[0]})"
+                                   for w in words)
+            else:
+                values = " ".join(f"{b:02X}" for b in self.memory[address:address + min(size, 8)])
+            print(f"  {label} @0x{address:04X} = {values}{' ...' if size > 8 else ''}")
         print("---------------------")
 
 
-if __name__ == "__main__":
-    if len(sys.argv) < 2:
-        print("Uso: python3 simulate_asm.py <arquivo_asm>")
-        sys.exit(1)
-    
-    simulator = AVRSimulator()
-    if simulator.load_program(sys.argv[1]):
-        simulator.execute()
+def main(argv=None, prog=None):
+    """
+    Simula (ou monta, com --assemble) um programa pela linha de comando.
+
+    Parâmetros:
+        argv: Argumentos da linha de comando (padrão: sys.argv[1:])
+        prog: Nome do programa nas mensagens de ajuda
+
+    Retorna:
+        Código de saída do programa
+    """
+    import argparse
+
+    parser = argparse.ArgumentParser(prog=prog, description="Simulador simplificado de Assembly AVR")
+    parser.add_argument("arquivo", help="Arquivo .asm a simular, ou imagem .hex/.bin gerada com --assemble")
+    parser.add_argument("--trace", choices=TRACE_LEVELS, default="summary",
+                        help="Nível de rastreamento (padrão: summary)")
+    parser.add_argument("--sample", type=int, default=DEFAULT_SAMPLE_INTERVAL,
+                        help="Intervalo, em instruções, do rastreamento 'sampled'")
+    parser.add_argument("--max-steps", type=int, default=DEFAULT_MAX_STEPS,
+                        help="Limite de instruções executadas (0 para ilimitado)")
+    parser.add_argument("--max-cycles", type=int, default=0,
+                        help="Limite de ciclos de clock (0 para ilimitado)")
+    parser.add_argument("--trace-file", default=None,
+                        help="Grava um registro binário por instrução neste arquivo")
+    parser.add_argument("--checkpoint", metavar="ARQUIVO",
+                        help="Grava periodicamente o estado da simulação neste arquivo")
+    parser.add_argument("--checkpoint-interval", type=int, default=DEFAULT_CHECKPOINT_INTERVAL,
+                        help=f"Instruções entre dois checkpoints (padrão: {DEFAULT_CHECKPOINT_INTERVAL})")
+    parser.add_argument("--resume", action="store_true",
+                        help="Continua a simulação do checkpoint, se houver um válido para o programa")
+    parser.add_argument("--assemble", metavar="IMAGEM",
+                        help="Monta o arquivo .asm na imagem IMAGEM (Intel HEX se .hex, senão "
+                             "binária) e grava a tabela de símbolos em .sym, sem simular")
+    args = parser.parse_args(argv)
+
+    simulator = AVRSimulator(trace=args.trace,
+                             max_steps=args.max_steps or None,
+                             max_cycles=args.max_cycles or None,
+                             sample_interval=args.sample,
+                             trace_file=args.trace_file,
+                             checkpoint=args.checkpoint,
+                             checkpoint_interval=args.checkpoint_interval)
+    if args.assemble:
+        if not simulator.load_program(args.arquivo, strict=True):
+            print("Falha ao montar o programa.")
+            return 1
+        try:
+            size = simulator.save_image(args.assemble)
+        except ValueError as e:
+            print(f"Erro ao montar o programa: {e}")
+            return 1
+        print(f"Imagem gravada em '{args.assemble}': {size} bytes de {FLASH_SIZE} "
+              f"({size / FLASH_SIZE:.1%} da memória de programa)")
+        if size > FLASH_SIZE:
+            print("Atenção: o programa não cabe na memória de programa do ATmega328P.")
+            return 1
+        return 0
+
+    if args.arquivo.lower().endswith(('.hex', '.ihex', '.bin')):
+        loaded = simulator.load_image(args.arquivo)
     else:
+        loaded = simulator.load_program(args.arquivo)
+    if not loaded:
         print("Falha ao carregar o programa.")
-        sys.exit(1)
+        return 1
+    simulator.execute(resume=args.resume)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
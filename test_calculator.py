@@ -0,0 +1,196 @@
+"""
+Testes da calculadora RPN (python3 -m unittest ou python3 -m pytest).
+"""
+
+import io
+import os
+import tempfile
+import unittest
+
+from rpn_calculator import (BINARY_REPORT_HEADER, BINARY_REPORT_RECORD, ERROR_DIVISION_BY_ZERO,
+                            ERROR_INVALID, RESULT_TYPE_INT, RESULT_TYPE_LARGE_INT, TOKEN_LPAREN,
+                            TOKEN_NAME, TOKEN_NUMBER, TOKEN_OPERATOR, TOKEN_RES, TOKEN_RPAREN, OP_ADD,
+                            BinaryReportWriter, ErrorValue, IncrementalEvaluator, ResultCache,
+                            ResultHistory, RPNCalculator, _value_key, scan_expression)
+
+
+class DivisionByZeroTest(unittest.TestCase):
+    def evaluate(self, expression):
+        result, error = RPNCalculator()._evaluate(expression)
+        self.assertIs(result.__class__, ErrorValue)
+        return error
+
+    def test_fractional_divisor_below_one(self):
+        # O divisor de / e % é truncado para inteiro antes do teste de zero
+        for expression in ("(3.5 0.5 %)", "(3 0.5 /)", "(3 -0.9 /)", "((1 1 +) 0.25 %)"):
+            with self.subTest(expression=expression):
+                error = self.evaluate(expression)
+                self.assertEqual(error.code, ERROR_DIVISION_BY_ZERO)
+                self.assertEqual(error.message, "Erro: Divisão por zero.")
+
+    def test_position_of_fractional_divisor(self):
+        self.assertEqual(self.evaluate("(3.5 0.5 %)").position, 9)
+
+    def test_fractional_divisor_above_one(self):
+        result, error = RPNCalculator()._evaluate("(7 2.5 %)")
+        self.assertIsNone(error)
+        self.assertEqual(result, 1)
+    
+    def test_infinite_operand(self):
+        # 2 ^ 20 arredonda para infinito, que não pode ser truncado para inteiro
+        for expression in ("((2 20 ^) 3 %)", "((2 20 ^) 3 /)", "(3 (2 20 ^) /)"):
+            with self.subTest(expression=expression):
+                error = self.evaluate(expression)
+                self.assertEqual(error.code, ERROR_INVALID)
+                self.assertEqual(error.message, "Erro: Operando infinito em divisão inteira.")
+
+
+class OptimizerTest(unittest.TestCase):
+    def test_large_integer_constant(self):
+        # 9357 ^ 9357 não cabe em um float: o otimizador não pode convertê-lo
+        expression = "(((65504 7 /) (65504 7 /) ^) (-0.0 0.5 |) |)"
+        expected = RPNCalculator(optimize=False)._evaluate(expression)[1]
+        calculator = RPNCalculator(cache_size=0)
+        for _ in range(2):
+            # A segunda avaliação usa o programa otimizado
+            error = calculator._evaluate(expression)[1]
+            self.assertEqual((error.code, error.position), (expected.code, expected.position))
+
+
+class ScannerTest(unittest.TestCase):
+    def test_typed_tokens_with_positions(self):
+        self.assertEqual(scan_expression(" ((2 RES)\t1.5 +)x"),
+                         [(TOKEN_LPAREN, None, 1, '('), (TOKEN_LPAREN, None, 2, '('),
+                          (TOKEN_NUMBER, 2.0, 3, '2'), (TOKEN_RES, None, 5, 'RES'),
+                          (TOKEN_RPAREN, None, 8, ')'), (TOKEN_NUMBER, 1.5, 10, '1.5'),
+                          (TOKEN_OPERATOR, OP_ADD, 14, '+'), (TOKEN_RPAREN, None, 15, ')'),
+                          (TOKEN_NAME, None, 16, 'x')])
+    
+    def test_error_position_from_tokens(self):
+        _, error = RPNCalculator()._evaluate("(1  abc +)")
+        self.assertEqual((str(error), error.position), ("Token inválido: abc", 4))
+
+
+class ResultHistoryTest(unittest.TestCase):
+    def test_discarded_results(self):
+        # Janela de 8 resultados criada com os 2 últimos de um histórico de 12
+        history = ResultHistory(8, [11.0, 12.0], 10)
+        history.append(13.0)
+        self.assertEqual((len(history), history[-1], history[10]), (13, 13.0, 11.0))
+        self.assertEqual(list(history), [11.0, 12.0, 13.0])
+        for index in (9, 0, -4):
+            with self.subTest(index=index):
+                with self.assertRaises(IndexError):
+                    history[index]
+
+
+class IncrementalEvaluatorTest(unittest.TestCase):
+    def full_run(self, lines):
+        calculator = RPNCalculator()
+        return [(_value_key(result), str(error)) for _, _, result, error in calculator._evaluate_lines(lines)]
+    
+    def test_edits_match_full_run(self):
+        lines = ["(1.5 2 +)", "(2.5 MEM)", "(3 (MEM) *)", "((1 RES) (0 RES) -)", "(7 2 /)",
+                 "((2 RES) 4 ^)", "((0 RES) 0 /)", "((1 RES) 1 +)", "(-1 RES)"]
+        evaluator = IncrementalEvaluator()
+        evaluator.evaluate(lines)
+        edits = (("alteração", lambda lines: lines.__setitem__(1, "(4 MEM)")),
+                 ("inserção", lambda lines: lines.insert(3, "((MEM) 1 -)")),
+                 ("remoção", lambda lines: lines.__delitem__(0)))
+        for name, edit in edits:
+            with self.subTest(edit=name):
+                edit(lines)
+                evaluator.evaluate(lines)
+                self.assertEqual([(_value_key(result), str(error))
+                                  for result, error in zip(evaluator.results, evaluator.errors)],
+                                 self.full_run(lines))
+
+
+class ResultCacheTest(unittest.TestCase):
+    def test_cached_run_matches_uncached(self):
+        lines = ["(1.5 2 +)", "(2.5 MEM)", "((0 RES) (MEM) *)", "(7 2 /)", "((1 RES) 0 %)", "(-1 RES)"]
+        with tempfile.TemporaryDirectory() as directory:
+            filename = os.path.join(directory, "entrada.txt")
+            with open(filename, 'w') as file:
+                file.write("\n".join(lines * 3) + "\n")
+            cache = ResultCache(os.path.join(directory, "cache"))
+            reports = []
+            # Sem cache, preenchendo o cache e lendo do cache
+            for result_cache in (None, cache, cache):
+                calculator = RPNCalculator()
+                calculator.result_cache = result_cache
+                output = io.StringIO()
+                calculator.stream_file(filename, output=output)
+                reports.append((output.getvalue(), _value_key(calculator.memory)))
+            cache.close()
+        self.assertEqual(cache.hits, 1)
+        self.assertEqual(reports[1], reports[0])
+        self.assertEqual(reports[2], reports[0])
+
+
+class CheckpointTest(unittest.TestCase):
+    def run_file(self, filename, report, mode, **options):
+        calculator = RPNCalculator()
+        with open(report, mode) as output:
+            calculator.stream_file(filename, output=output, **options)
+        with open(report) as output:
+            return output.read(), _value_key(calculator.memory), calculator.error_summary.counts
+    
+    def test_resumed_report_matches_uninterrupted(self):
+        lines = ["(1.5 2 +)", "(2.5 MEM)", "((MEM) (1 RES) *)", "(7 2 /)", "((2 RES) 1 -)"]
+        lines = lines * 2 + ["((0 RES) 0 /)"] + lines * 2
+        with tempfile.TemporaryDirectory() as directory:
+            filename = os.path.join(directory, "entrada.txt")
+            with open(filename, 'w') as file:
+                file.write("\n".join(lines) + "\n")
+            report = os.path.join(directory, "relatorio.txt")
+            checkpoint = os.path.join(directory, "checkpoint")
+            expected = self.run_file(filename, report, 'w')
+            # A execução interrompida para na linha 11, com o checkpoint da linha 10
+            self.run_file(filename, report, 'w', checkpoint=checkpoint, checkpoint_interval=5,
+                          fail_fast=True)
+            self.assertTrue(os.path.exists(checkpoint))
+            resumed = self.run_file(filename, report, 'r+', checkpoint=checkpoint,
+                                    checkpoint_interval=5, resume=True)
+            self.assertFalse(os.path.exists(checkpoint))
+        self.assertEqual(resumed, expected)
+
+
+class BinaryReportTest(unittest.TestCase):
+    def test_int_outside_int32(self):
+        stream = io.BytesIO()
+        report = BinaryReportWriter(stream)
+        for line_no, result in enumerate((60000, 60000 * 60000, -(1 << 40)), 1):
+            report.write(line_no, "", result)
+        report.flush()
+        records = list(BINARY_REPORT_RECORD.iter_unpack(stream.getvalue()[BINARY_REPORT_HEADER.size:]))
+        self.assertEqual([record[1:3] for record in records],
+                         [(60000, RESULT_TYPE_INT), (1, RESULT_TYPE_LARGE_INT),
+                          (-1, RESULT_TYPE_LARGE_INT)])
+
+
+
+class BatchTest(unittest.TestCase):
+    def test_integer_columns_match_scalar(self):
+        # Os valores de uma coluna inteira são lidos como os números da expressão
+        try:
+            import numpy as np
+        except ImportError:
+            self.skipTest("numpy não instalado")
+        columns = {'A': np.array([3001, 70000, 7, -7, 2]), 'B': np.array([1, 2, 2, 3, 10])}
+        for expression in ("(A B +)", "(A B -)", "(A B *)", "(A B |)", "(A B /)", "(A B %)",
+                           "(B A ^)", "((A B /) (A B %) +)"):
+            with self.subTest(expression=expression):
+                results, errors = RPNCalculator().evaluate_batch(expression, columns)
+                for row in range(len(results)):
+                    line = expression.replace('A', str(columns['A'][row])).replace('B', str(columns['B'][row]))
+                    expected = RPNCalculator()._evaluate(line)[0]
+                    if expected.__class__ is ErrorValue:
+                        self.assertTrue(errors[row], line)
+                    else:
+                        self.assertFalse(errors[row], line)
+                        self.assertEqual(results[row].item(), expected, line)
+
+
+if __name__ == "__main__":
+    unittest.main()